@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from app.core.cities import list_cities, city_store
+
+router = APIRouter()
+
+@router.get("/cities")
+async def get_cities():
+    return {
+        "cities": [city.to_dict() for city in list_cities()],
+        "resident": city_store.resident(),
+        "budget_mb": city_store.budget_bytes // (1024 * 1024)
+    }
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from app.core.telemetry import DURATION_BUCKETS_MS, stage_metrics
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    """Per-stage latency histograms and byte counts of the opportunity pipeline."""
+    if format == "json":
+        return {"buckets_ms": list(DURATION_BUCKETS_MS), "stages": stage_metrics.snapshot()}
+    return PlainTextResponse(stage_metrics.prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,21 +1,409 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+import numpy as np
 from app.core.config import settings
-from app.core.data_processor import make_opportunity_geojson, get_cell_details
+from app.core.cities import City, get_city, city_store
+from app.core.data_processor import (
+    get_cell_details, get_feature_grid, get_metric_index,
+    get_snapshot, grid_key, grid_recommendations, opportunity_index, score_cells, score_schemes
+)
+from app.core.features import DEFAULT_WEIGHTS, DEFAULT_THRESHOLDS
+from app.core.index import INDEXED_METRICS
+from app.core.zonal import zonal_stats
+from app.core.surface import get_pixel_features, render_surface, raster_bounds
+from app.core.accessibility import accessibility, get_road_graph
+from app.core.hotspot import WEIGHT_SCHEMES, hotspots
+from app.core.regions import find_regions
+from app.core.export import stream_export
+from app.core.change import get_change_cube
+from app.core.telemetry import stage
 
 router = APIRouter()
 
+def resolve_city(city: str) -> City:
+    resolved = get_city(city)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail=f"Unknown city '{city}'")
+    return resolved
+
+def parse_bbox(bbox: Optional[str]) -> Optional[List[float]]:
+    """Parse a ``min_lon,min_lat,max_lon,max_lat`` query string."""
+    if bbox is None:
+        return None
+    try:
+        values = [float(v) for v in bbox.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if len(values) != 4 or values[0] > values[2] or values[1] > values[3]:
+        raise HTTPException(status_code=422, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    return values
+
+GridSize = Query(settings.default_grid_size, ge=1, le=settings.max_grid_size,
+                 description="Cells per side of the opportunity grid")
+
 @router.get("/opportunity_index")
-async def get_opportunity_index():
+def get_opportunity_index(
+    city: str,
+    grid_size: int = GridSize,
+    since: Optional[str] = Query(None, description="Version held by the client; only cells changed since are returned")
+):
+    resolved = resolve_city(city)
+    try:
+        city_data = city_store.get(resolved)
+        baked = city_data.derived.get(grid_key(city_data, "response", grid_size)) if since is None else None
+        if baked is not None:
+            # Pre-serialized by the bake; record its version so later ?since= requests can diff against it
+            get_snapshot(city_data, grid_size)
+            return FileResponse(baked, media_type="application/json")
+        geojson = opportunity_index(city_data, grid_size, since)
+        with stage("serialization") as span:
+            # Values are already plain Python, so the JSON encoder needs no jsonable_encoder pass
+            response = JSONResponse(geojson)
+            span.nbytes = len(response.body)
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/opportunity_index/score")
+def get_opportunity_scores(
+    city: str,
+    grid_size: int = GridSize,
+    w_food: float = Query(DEFAULT_WEIGHTS[0], ge=0, description="Weight of food access"),
+    w_transport: float = Query(DEFAULT_WEIGHTS[1], ge=0, description="Weight of transport access"),
+    w_housing: float = Query(DEFAULT_WEIGHTS[2], ge=0, description="Weight of housing availability"),
+    low: float = Query(DEFAULT_THRESHOLDS[0], ge=0, le=1, description="Scores below this are 'low'"),
+    high: float = Query(DEFAULT_THRESHOLDS[1], ge=0, le=1, description="Scores below this are 'medium'")
+):
+    """Rescore the cached feature matrix under custom weights and category thresholds."""
+    resolved = resolve_city(city)
     try:
-        geojson = make_opportunity_geojson(settings.dhaka_bounds)
-        return geojson
+        features = get_feature_grid(city_store.get(resolved), grid_size)
+        result = score_cells(features, (w_food, w_transport, w_housing), (low, high))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    result["city"] = resolved.key
+    return result
+
+@router.get("/opportunity_index/query")
+def query_opportunity_cells(
+    city: str,
+    metric: str = Query("opportunity_score", description=f"One of: {', '.join(INDEXED_METRICS)}"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="asc = lowest values first"),
+    k: int = Query(10, ge=1, le=settings.max_query_results),
+    min_value: Optional[float] = Query(None, description="Inclusive lower bound on the metric"),
+    max_value: Optional[float] = Query(None, description="Inclusive upper bound on the metric"),
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    grid_size: int = GridSize
+):
+    """Top-k / threshold-range / bbox queries over presorted metric indexes."""
+    resolved = resolve_city(city)
+    box = parse_bbox(bbox)
+    try:
+        index = get_metric_index(city_store.get(resolved), grid_size)
+        result = index.query(metric, k, order == "desc", min_value, max_value, box)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    cells = index.records(result["indices"])
+    return {
+        "city": resolved.key,
+        "grid_size": grid_size,
+        "metric": metric,
+        "order": order,
+        "matched": result["matched"],
+        "returned": len(cells),
+        "cells": cells
+    }
+
+@router.get("/opportunity_index/hotspots")
+def get_hotspots(
+    city: str,
+    metric: str = Query("opportunity_score", description=f"One of: {', '.join(INDEXED_METRICS)}"),
+    weights: str = Query("queen", pattern=f"^({'|'.join(WEIGHT_SCHEMES)})$", description="Spatial weights scheme"),
+    band_km: Optional[float] = Query(None, gt=0, description="Neighbour distance for distance-band weights"),
+    confidence: float = Query(0.95, description="0.9, 0.95 or 0.99"),
+    include_all: bool = Query(False, description="Return every cell instead of only significant ones"),
+    grid_size: int = GridSize
+):
+    """Getis-Ord Gi* hot and cold spots of a per-cell metric."""
+    resolved = resolve_city(city)
+    try:
+        features = get_feature_grid(city_store.get(resolved), grid_size)
+        result = hotspots(features, metric, weights, band_km, confidence)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    z, p, bins = result["z"], result["p"], result["bins"]
+    indices = np.arange(len(z)) if include_all else np.concatenate([result["hot"], result["cold"]])
+    return {
+        "city": resolved.key,
+        "grid_size": grid_size,
+        "metric": metric,
+        "confidence": confidence,
+        "weights": result["weights"],
+        "compute_ms": result["compute_ms"],
+        "summary": {"hot_spots": int(len(result["hot"])), "cold_spots": int(len(result["cold"]))},
+        "cells": [
+            {"cell_id": int(k) + 1, "z_score": round(float(z[k]), 4), "p_value": round(float(p[k]), 6), "bin": int(bins[k])}
+            for k in indices
+        ]
+    }
+
+@router.get("/opportunity_index/regions")
+def get_regions(
+    city: str,
+    category: str = Query("low", pattern="^(low|medium|high)$"),
+    connectivity: int = Query(4, description="4 = cells sharing an edge, 8 = edge or corner"),
+    min_cells: int = Query(1, ge=1, description="Drop regions smaller than this"),
+    limit: int = Query(100, ge=1, le=settings.max_query_results, description="Largest regions returned"),
+    include_cells: bool = False,
+    grid_size: int = GridSize
+):
+    """Contiguous regions of same-category cells with dissolved outlines and aggregates."""
+    resolved = resolve_city(city)
+    try:
+        features = get_feature_grid(city_store.get(resolved), grid_size)
+        result = find_regions(features, category, connectivity, min_cells, limit, include_cells)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    result["metadata"]["city"] = resolved.key
+    result["metadata"]["grid_size"] = grid_size
+    return result
+
+RASTER_MEDIA_TYPES = {"png": "image/png", "npz": "application/octet-stream"}
+
+@router.get("/opportunity_index/raster")
+def get_opportunity_raster(
+    city: str,
+    format: str = Query("png", pattern="^(png|npz)$", description="png = colorized, npz = compressed float32"),
+    w_food: float = Query(DEFAULT_WEIGHTS[0], ge=0),
+    w_transport: float = Query(DEFAULT_WEIGHTS[1], ge=0),
+    w_housing: float = Query(DEFAULT_WEIGHTS[2], ge=0)
+):
+    """Opportunity surface at native VNP46A3 pixel resolution (~500 m)."""
+    resolved = resolve_city(city)
+    try:
+        pixels = get_pixel_features(city_store.get(resolved))
+        content, cached = render_surface(pixels, (w_food, w_transport, w_housing), format)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    height, width = pixels.shape
+    headers = {
+        "X-Raster-Shape": f"{height},{width}",
+        "X-Raster-Bounds": ",".join(f"{v:.6f}" for v in raster_bounds(pixels.lats, pixels.lons)),
+        "X-Data-Fingerprint": pixels.fingerprint,
+        "X-Cache": "hit" if cached else "miss"
+    }
+    if format == "npz":
+        headers["Content-Disposition"] = f'attachment; filename="{resolved.key}_opportunity.npz"'
+    return Response(content=content, media_type=RASTER_MEDIA_TYPES[format], headers=headers)
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+@router.get("/opportunity_index/export")
+def export_opportunity_grid(
+    city: str,
+    format: str = Query("csv", pattern="^(csv|parquet)$", description="csv (WKT geometry) or parquet (GeoParquet, WKB)"),
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    w_food: float = Query(DEFAULT_WEIGHTS[0], ge=0),
+    w_transport: float = Query(DEFAULT_WEIGHTS[1], ge=0),
+    w_housing: float = Query(DEFAULT_WEIGHTS[2], ge=0),
+    low: float = Query(DEFAULT_THRESHOLDS[0], ge=0, le=1),
+    high: float = Query(DEFAULT_THRESHOLDS[1], ge=0, le=1),
+    grid_size: int = GridSize
+):
+    """Stream the grid as CSV or GeoParquet, one row group at a time."""
+    resolved = resolve_city(city)
+    box = parse_bbox(bbox)
+    try:
+        features = get_feature_grid(city_store.get(resolved), grid_size)
+        chunks = stream_export(features, format, box, (w_food, w_transport, w_housing), (low, high),
+                               settings.export_rows_per_group)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    filename = f"{resolved.key}_opportunity_{grid_size}.{format}"
+    return StreamingResponse(chunks, media_type=EXPORT_MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+class ZonalRequest(BaseModel):
+    geometry: Dict[str, Any] = Field(..., description="GeoJSON Point, Polygon or MultiPolygon (or a Feature)")
+    grid_size: int = Field(settings.default_grid_size, ge=1, le=settings.max_grid_size)
+    include_cells: bool = False
+
+@router.post("/opportunity_index/zonal")
+def zonal_opportunity(city: str, request: ZonalRequest):
+    """Area-weighted opportunity profile of a point or drawn zone."""
+    resolved = resolve_city(city)
+    geometry = request.geometry
+    if geometry.get("type") == "Feature":
+        geometry = geometry.get("geometry") or {}
+    try:
+        features = get_feature_grid(city_store.get(resolved), request.grid_size)
+        result = zonal_stats(features, geometry, request.include_cells)
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid zone geometry: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    result["city"] = resolved.key
+    result["grid_size"] = request.grid_size
+    return result
+
+class WeightScheme(BaseModel):
+    name: Optional[str] = None
+    food_access: float = Field(DEFAULT_WEIGHTS[0], ge=0)
+    transport_access: float = Field(DEFAULT_WEIGHTS[1], ge=0)
+    housing_availability: float = Field(DEFAULT_WEIGHTS[2], ge=0)
+
+class BatchScoreRequest(BaseModel):
+    schemes: List[WeightScheme] = Field(..., min_length=1, max_length=settings.max_weight_schemes)
+    grid_size: int = Field(settings.default_grid_size, ge=1, le=settings.max_grid_size)
+    top_n: int = Field(10, ge=1, le=1000)
+    bottom_fraction: float = Field(0.1, gt=0, le=1)
+
+@router.post("/opportunity_index/score/batch")
+def batch_score_opportunity(city: str, request: BatchScoreRequest):
+    """Score all cells under many weighting schemes and report rank stability across them."""
+    resolved = resolve_city(city)
+    weights = [(s.food_access, s.transport_access, s.housing_availability) for s in request.schemes]
+    names = [s.name or f"scheme_{k + 1}" for k, s in enumerate(request.schemes)]
+    try:
+        features = get_feature_grid(city_store.get(resolved), request.grid_size)
+        result = score_schemes(features, weights, names, request.top_n, request.bottom_fraction)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    result["city"] = resolved.key
+    return result
+
+def accessibility_response(resolved: City, grid_size: int, budget_min: float,
+                           destinations: Optional[List[List[float]]] = None,
+                           weights: Optional[List[float]] = None) -> Dict:
+    try:
+        city_data = city_store.get(resolved)
+        features = get_feature_grid(city_data, grid_size)
+        graph = get_road_graph(city_data)
+        result, cached = accessibility(graph, features, destinations, weights, budget_min)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    scores = result["score"]
+    return {
+        "city": resolved.key,
+        "grid_size": grid_size,
+        "budget_min": budget_min,
+        "network": {"version": graph.version, "nodes": graph.n_nodes, "edges": graph.n_edges},
+        "destinations": result["destinations"],
+        "cached": cached,
+        "compute_ms": result["compute_ms"],
+        "summary": {
+            "mean_score": round(float(scores.mean()), 4),
+            "cells_without_access": int(np.count_nonzero(result["reachable_weight"] == 0))
+        },
+        "cells": [
+            {"cell_id": int(k) + 1, "reachable_weight": round(float(w), 4), "score": round(float(v), 4)}
+            for k, (w, v) in enumerate(zip(result["reachable_weight"], scores))
+        ]
+    }
+
+@router.get("/opportunity_index/accessibility")
+def get_accessibility(
+    city: str,
+    grid_size: int = GridSize,
+    budget_min: float = Query(30.0, gt=0, le=180, description="Travel-time budget in minutes")
+):
+    """Share of activity centres (brightest cells) each cell reaches by road within the budget."""
+    return accessibility_response(resolve_city(city), grid_size, budget_min)
+
+class AccessibilityRequest(BaseModel):
+    destinations: List[List[float]] = Field(..., min_length=1, max_length=settings.max_destinations,
+                                            description="[lon, lat] of each destination")
+    weights: Optional[List[float]] = Field(None, description="Opportunity weight per destination (default 1)")
+    grid_size: int = Field(settings.default_grid_size, ge=1, le=settings.max_grid_size)
+    budget_min: float = Field(30.0, gt=0, le=180)
+
+@router.post("/opportunity_index/accessibility")
+def post_accessibility(city: str, request: AccessibilityRequest):
+    """Share of the given destinations each cell reaches by road within the budget."""
+    if any(len(point) != 2 for point in request.destinations):
+        raise HTTPException(status_code=422, detail="Destinations must be [lon, lat] pairs")
+    return accessibility_response(resolve_city(city), request.grid_size, request.budget_min,
+                                  request.destinations, request.weights)
+
+@router.get("/opportunity_index/recommendations")
+def get_grid_recommendations(
+    city: str,
+    grid_size: int = GridSize,
+    include_cells: bool = Query(True, description="Include the per-cell rule bitsets")
+):
+    """Recommendation rules evaluated over the whole grid in one pass."""
+    resolved = resolve_city(city)
+    try:
+        features = get_feature_grid(city_store.get(resolved), grid_size)
+        result = grid_recommendations(features, include_cells)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    result["city"] = resolved.key
+    return result
+
+@router.get("/ntl_change/brightening")
+def get_brightening_cells(
+    city: str,
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM; default the latest month"),
+    k: int = Query(10, ge=1, le=settings.max_query_results),
+    min_z: Optional[float] = Query(None, description="Only cells whose robust z-score of the change is at least this"),
+    grid_size: int = GridSize
+):
+    """Cells whose nighttime lights brightened most since the previous month."""
+    resolved = resolve_city(city)
+    try:
+        cube = get_change_cube(city_store.get(resolved), grid_size)
+        t, indices = cube.brightening(k, month, min_z)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "city": resolved.key,
+        "grid_size": grid_size,
+        "month": cube.months[t],
+        "previous_month": cube.months[t - 1],
+        "months": cube.months,
+        "rolling_window": cube.window,
+        "brightening_cells": int(np.sum(cube.delta[t] > 0)),
+        "compute_ms": cube.compute_ms,
+        "returned": len(indices),
+        "cells": cube.records(t, indices)
+    }
 
 @router.get("/opportunity_index/cell/{cell_id}")
-async def get_cell_info(cell_id: int):
+def get_cell_info(city: str, cell_id: int, grid_size: int = GridSize):
+    resolved = resolve_city(city)
+    if not 1 <= cell_id <= grid_size * grid_size:
+        raise HTTPException(status_code=404, detail="Cell not found")
     try:
-        details = get_cell_details(cell_id, settings.dhaka_bounds)
+        features = get_feature_grid(city_store.get(resolved), grid_size)
+        details = get_cell_details(cell_id, resolved.bounds, features=features)
         
         if "error" in details:
             raise HTTPException(status_code=404, detail="Cell not found")
@@ -29,4 +417,3 @@ async def get_cell_info(cell_id: int):
 @router.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "opportunity_service"}
-
@@ -0,0 +1,218 @@
+"""
+Baked artifact bundles: the opportunity pipeline's outputs precomputed offline.
+
+A bundle holds, per city, the raster cube plus for every baked grid size the
+feature arrays and per-cell totals, the presorted metric indexes, the served
+snapshot columns and the ``/opportunity_index`` response already serialized to
+JSON, all as plain ``.npy``/``.json`` files described by ``manifest.json``
+(with provenance: source granules, settings, code revision). Loading a bundle
+memory-maps the arrays, so start-up does no computation, and several worker
+processes serving the same bundle share its pages through the OS page cache.
+
+Bundles are written to ``<bake_dir>/<bundle_id>/`` and activated by naming them
+in ``<bake_dir>/CURRENT``, which is replaced atomically after the bundle is
+complete.
+"""
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .cities import City, CityData, city_store
+from .config import settings
+from .data_processor import get_feature_grid, get_metric_index, get_snapshot, grid_key, grid_version, opportunity_index
+from .features import FeatureGrid
+from .index import MetricIndex
+from .snapshots import GridSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the on-disk layout changes; bundles of another format are ignored
+BUNDLE_FORMAT = 1
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+RESPONSE_FILE = "opportunity_index.json"
+
+FEATURE_ARRAYS = (
+    "housing_pressure", "food_distance_km", "transport_score",
+    "population_density", "avg_nighttime_light", "matrix",
+)
+
+def serialize_response(payload: Dict) -> bytes:
+    """JSON bytes exactly as FastAPI's default JSONResponse renders ``payload``."""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def _save_arrays(directory: Path, arrays: Dict[str, np.ndarray]):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(array))
+
+def _load_arrays(directory: Path, names: Iterable[str]) -> Dict[str, np.ndarray]:
+    return {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in names}
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def bake_grid(city_data: CityData, grid_size: int, grid_dir: Path) -> Dict:
+    """Write one grid size's artifacts for a resident city; returns its manifest entry."""
+    features = get_feature_grid(city_data, grid_size)
+    index = get_metric_index(city_data, grid_size)
+    snapshot = get_snapshot(city_data, grid_size)
+    body = serialize_response(opportunity_index(city_data, grid_size))
+    _, amenity_version, population_version = grid_version(city_data)
+
+    _save_arrays(grid_dir / "features", {name: getattr(features, name) for name in FEATURE_ARRAYS})
+    _save_arrays(grid_dir / "sums", features.sums or {})
+    _save_arrays(grid_dir / "index", {f"{name}.order": order for name, order in index.order.items()})
+    _save_arrays(grid_dir / "index", {f"{name}.sorted": values for name, values in index.sorted_values.items()})
+    _save_arrays(grid_dir / "snapshot", snapshot.columns)
+    (grid_dir / RESPONSE_FILE).write_bytes(body)
+
+    return {
+        "version": snapshot.version,
+        "derived_from": features.derived_from,
+        "sources": features.sources,
+        # Amenity extract the grid was computed with (None without one)
+        "amenity_version": amenity_version,
+        # Population raster the grid was computed with (None without one)
+        "population_version": population_version,
+        "sums": sorted(features.sums or {}),
+        "indexed_metrics": sorted(index.order),
+        "snapshot_columns": sorted(snapshot.columns),
+        "response_bytes": len(body)
+    }
+
+def bake_city(city_data: CityData, grid_sizes: Iterable[int], city_dir: Path) -> Dict:
+    _save_arrays(city_dir / "cube", dict(city_data.rasters))
+    grids = {}
+    # Finest first, so coarser grids that nest in it are rolled up exactly as when served
+    for grid_size in sorted(set(grid_sizes), reverse=True):
+        grids[str(grid_size)] = bake_grid(city_data, grid_size, city_dir / f"g{grid_size}")
+        logger.info(f"Baked {city_data.city.key} {grid_size}x{grid_size}")
+    return {
+        "bounds": city_data.city.bounds,
+        "cube": {**city_data.meta, "rasters": sorted(city_data.rasters)},
+        "grids": grids
+    }
+
+def write_bundle(cities: List[City], grid_sizes: Iterable[int], bake_dir: Path, activate: bool = True) -> Path:
+    """Bake ``cities`` at ``grid_sizes`` into a new bundle under ``bake_dir``; returns its path."""
+    bake_dir = Path(bake_dir)
+    bake_dir.mkdir(parents=True, exist_ok=True)
+    baked_at = datetime.now(timezone.utc)
+    staging = bake_dir / f".staging-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    entries = {}
+    for city in cities:
+        entries[city.key] = bake_city(city_store.get(city), grid_sizes, staging / city.key)
+
+    versions = json.dumps({key: {g: e["version"] for g, e in entry["grids"].items()} for key, entry in entries.items()},
+                          sort_keys=True)
+    bundle_id = f"{baked_at:%Y%m%dT%H%M%SZ}-{hashlib.sha1(versions.encode()).hexdigest()[:8]}"
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "bundle_id": bundle_id,
+        "baked_at": baked_at.isoformat(),
+        "grid_sizes": sorted(set(grid_sizes)),
+        "cities": entries,
+        "provenance": {
+            "service": settings.app_name,
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "food_search_margin_km": settings.food_search_margin_km
+        }
+    }
+    (staging / MANIFEST).write_text(json.dumps(manifest, indent=2))
+
+    bundle_path = bake_dir / bundle_id
+    os.replace(staging, bundle_path)
+    if activate:
+        activate_bundle(bake_dir, bundle_id)
+    return bundle_path
+
+def activate_bundle(bake_dir: Path, bundle_id: str):
+    """Point ``CURRENT`` at ``bundle_id``; readers see either the old or the new name, never half of one."""
+    pointer = Path(bake_dir) / f".{CURRENT}.tmp"
+    pointer.write_text(bundle_id + "\n")
+    os.replace(pointer, Path(bake_dir) / CURRENT)
+
+class BakeBundle:
+    """A baked bundle on disk; ``load`` memory-maps one city into a ready CityData."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST).read_text())
+        if self.manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Bundle {self.path.name} has format {self.manifest.get('format')}, expected {BUNDLE_FORMAT}")
+
+    @property
+    def bundle_id(self) -> str:
+        return self.manifest["bundle_id"]
+
+    @property
+    def cities(self) -> List[str]:
+        return sorted(self.manifest["cities"])
+
+    def load(self, city: City) -> Optional[CityData]:
+        """Resident data for ``city`` with its baked grids pre-seeded, or None if not baked."""
+        entry = self.manifest["cities"].get(city.key)
+        if entry is None:
+            return None
+        if entry["bounds"] != city.bounds:
+            logger.warning(f"Bundle {self.bundle_id} was baked for other bounds of '{city.key}'; ignoring it")
+            return None
+
+        city_dir = self.path / city.key
+        rasters = _load_arrays(city_dir / "cube", entry["cube"]["rasters"])
+        data = CityData(city, rasters, {**entry["cube"], "bundle": self.bundle_id})
+        for key, grid in entry["grids"].items():
+            grid_size = int(key)
+            grid_dir = city_dir / f"g{grid_size}"
+            arrays = _load_arrays(grid_dir / "features", FEATURE_ARRAYS)
+            features = FeatureGrid(
+                city.bounds, grid_size,
+                sources=grid["sources"],
+                sums=_load_arrays(grid_dir / "sums", grid["sums"]) or None,
+                derived_from=grid["derived_from"],
+                **arrays
+            )
+            metrics = grid["indexed_metrics"]
+            index = MetricIndex.from_arrays(
+                features,
+                order={m: np.load(grid_dir / "index" / f"{m}.order.npy", mmap_mode="r") for m in metrics},
+                sorted_values={m: np.load(grid_dir / "index" / f"{m}.sorted.npy", mmap_mode="r") for m in metrics}
+            )
+            snapshot = GridSnapshot(features.cell_ids, _load_arrays(grid_dir / "snapshot", grid["snapshot_columns"]),
+                                    version=grid["version"], created_at=self.manifest["baked_at"])
+
+            # Keyed by the amenity extract and population raster they were baked with;
+            # different ones now supersede them
+            version = (data.signature, grid.get("amenity_version"), grid.get("population_version"))
+            data.derived[grid_key(data, "features", grid_size, True, version=version)] = features
+            data.derived[grid_key(data, "index", grid_size, version=version)] = index
+            data.derived[grid_key(data, "snapshot", grid_size, version=version)] = snapshot
+            data.derived[grid_key(data, "response", grid_size, version=version)] = grid_dir / RESPONSE_FILE
+        return data
+
+def load_current_bundle(bake_dir: Path) -> Optional[BakeBundle]:
+    """The bundle named in ``<bake_dir>/CURRENT``, or None if nothing has been baked."""
+    pointer = Path(bake_dir) / CURRENT
+    if not pointer.exists():
+        return None
+    return BakeBundle(Path(bake_dir) / pointer.read_text().strip())
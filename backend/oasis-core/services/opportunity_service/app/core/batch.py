@@ -0,0 +1,221 @@
+"""
+Batch precomputation of the opportunity pipeline over a (city, grid size, month) matrix.
+
+Each independent unit computes one city's grid from one month's VNP46A3 granule
+and writes the same artifacts as a baked grid (``bake.bake_grid``) under
+``<batch_dir>/<month>/<city>/g<grid_size>/``. Units run in a process pool in two
+stages: first the per-(city, month) raster cubes are built and saved as
+``.npy`` under ``<batch_dir>/<month>/cubes/``, then every grid unit
+memory-maps its cube read-only, so workers share the raster pages through
+the OS page cache instead of each holding a copy.
+
+A unit is written to a staging directory and renamed into place with its
+``unit.json`` (source granules, per-stage timings) inside, so an interrupted
+run leaves no half-written units and a rerun skips the ones already done for
+the same source granules. Every run also saves a JSON report of per-unit timings.
+"""
+import json
+import logging
+import os
+import resource
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .bake import bake_grid
+from .cities import City, CityData, CityStore, get_city
+from .config import settings
+from .data_processor import get_feature_grid, get_metric_index, get_snapshot
+
+logger = logging.getLogger(__name__)
+
+UNIT_FILE = "unit.json"
+REPORT_DIR = "reports"
+
+@dataclass(frozen=True)
+class BatchUnit:
+    city: str
+    # Acquisition month of the NTL granule, YYYY-MM
+    month: str
+    grid_size: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.city}/{self.month}/g{self.grid_size}"
+
+def month_date(month: str) -> date:
+    """First day of a ``YYYY-MM`` month (VNP46A3 granules are dated on it)."""
+    try:
+        return datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"Months must look like YYYY-MM, got '{month}'")
+
+def available_months(city: City) -> List[str]:
+    """Months with a catalogued VNP46A3 granule over the city, oldest first."""
+    from .nasa_data_reader import get_nasa_reader, vnp_tile
+    b = city.bounds
+    tile = vnp_tile((b["min_lat"] + b["max_lat"]) / 2, (b["min_lon"] + b["max_lon"]) / 2)
+    return sorted({g.acquired[:7] for g in get_nasa_reader().catalog.granules("VNP46A3", tile)})
+
+def expand_matrix(cities: Sequence[City], grid_sizes: Iterable[int],
+                  months: Optional[Sequence[str]] = None) -> List[BatchUnit]:
+    """
+    Every (city, month, grid size) unit. ``months`` of None takes each city's
+    catalogued months; months a city has no granule for are skipped.
+    """
+    grid_sizes = sorted(set(grid_sizes))
+    for month in months or []:
+        month_date(month)
+    units = []
+    for city in cities:
+        catalogued = available_months(city)
+        for month in (m for m in (months or catalogued) if m in catalogued):
+            units.extend(BatchUnit(city.key, month, g) for g in grid_sizes)
+    return units
+
+class BatchStore:
+    """Layout of a batch output directory."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def cube_store(self, month: str) -> CityStore:
+        return CityStore(self.root / month / "cubes", settings.city_cache_budget_mb, acquired=month_date(month))
+
+    def cube_meta(self, city: str, month: str) -> Optional[Dict]:
+        try:
+            return json.loads((self.root / month / "cubes" / city / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def unit_dir(self, unit: BatchUnit) -> Path:
+        return self.root / unit.month / unit.city / f"g{unit.grid_size}"
+
+    def unit_entry(self, unit: BatchUnit) -> Optional[Dict]:
+        try:
+            return json.loads((self.unit_dir(unit) / UNIT_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def is_done(self, unit: BatchUnit) -> bool:
+        """Whether the unit was written from the granules its cube is currently built from."""
+        entry = self.unit_entry(unit)
+        meta = self.cube_meta(unit.city, unit.month)
+        return entry is not None and meta is not None and entry.get("granules") == meta.get("sources")
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def prepare_cube(root: str, city_key: str, month: str) -> Dict:
+    """Build and save one (city, month) raster cube if it is not on disk yet."""
+    start = time.perf_counter()
+    store = BatchStore(Path(root))
+    built = store.cube_meta(city_key, month) is None
+    data = store.cube_store(month).get(get_city(city_key))
+    return {
+        "city": city_key,
+        "month": month,
+        "built": built,
+        "rasters": sorted(data.rasters),
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+def run_unit(root: str, unit: BatchUnit) -> Dict:
+    """Compute and write one unit; returns its report entry (status ``done`` or ``failed``)."""
+    store = BatchStore(Path(root))
+    report = {**asdict(unit), "pid": os.getpid()}
+    start = time.perf_counter()
+    stages = {}
+    try:
+        # A fresh CityData per unit: results never depend on which units shared a worker
+        t = time.perf_counter()
+        cached = store.cube_store(unit.month).get(get_city(unit.city))
+        data = CityData(cached.city, cached.rasters, cached.meta)
+        stages["load_ms"] = (time.perf_counter() - t) * 1000
+        for stage, step in (("features_ms", get_feature_grid), ("index_ms", get_metric_index),
+                            ("snapshot_ms", get_snapshot)):
+            t = time.perf_counter()
+            step(data, unit.grid_size)
+            stages[stage] = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        target = store.unit_dir(unit)
+        staging = target.with_name(f".{target.name}.tmp-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        entry = bake_grid(data, unit.grid_size, staging)
+        stages["write_ms"] = (time.perf_counter() - t) * 1000
+
+        report.update(status="done", granules=data.meta.get("sources", {}), version=entry["version"])
+        report["stages"] = {name: round(ms, 2) for name, ms in stages.items()}
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        report["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+        (staging / UNIT_FILE).write_text(json.dumps({
+            **report, **entry, "computed_at": datetime.now(timezone.utc).isoformat()
+        }, indent=2))
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+    except Exception as e:
+        logger.error(f"Batch unit {unit.key} failed: {e}")
+        report.update(status="failed", error=f"{type(e).__name__}: {e}",
+                      seconds=round(time.perf_counter() - start, 3))
+    return report
+
+def run_batch(units: Sequence[BatchUnit], root: Path, workers: Optional[int] = None,
+              force: bool = False, progress=None) -> Dict:
+    """
+    Run ``units`` into the batch store at ``root`` on ``workers`` processes (0 or None:
+    ``settings.batch_workers``, then one per CPU). Units already done are skipped
+    unless ``force``. ``progress`` is called with each unit's report entry.
+    Returns the run report, also saved under ``<root>/reports/``.
+    """
+    root = Path(root)
+    store = BatchStore(root)
+    workers = workers or settings.batch_workers or os.cpu_count() or 1
+    started = datetime.now(timezone.utc)
+    start = time.perf_counter()
+
+    pending = [u for u in units if force or not store.is_done(u)]
+    waiting = set(pending)
+    entries = [{**asdict(u), "status": "skipped", "seconds": 0.0} for u in units if u not in waiting]
+    for entry in entries:
+        if progress:
+            progress(entry)
+
+    cubes = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Stage 1: one process per missing (city, month) cube
+        needed = sorted({(u.city, u.month) for u in pending if store.cube_meta(u.city, u.month) is None})
+        futures = [pool.submit(prepare_cube, str(root), city, month) for city, month in needed]
+        for future in as_completed(futures):
+            cubes.append(future.result())
+
+        # Stage 2: grid units over the memory-mapped cubes, largest grids first to balance the pool
+        order = sorted(pending, key=lambda u: -u.grid_size)
+        futures = {pool.submit(run_unit, str(root), unit): unit for unit in order}
+        for future in as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            if progress:
+                progress(entry)
+
+    position = {u: k for k, u in enumerate(units)}
+    entries.sort(key=lambda e: position[BatchUnit(e["city"], e["month"], e["grid_size"])])
+    counts = {status: sum(e["status"] == status for e in entries) for status in ("done", "skipped", "failed")}
+    report = {
+        "run_id": f"{started:%Y%m%dT%H%M%SZ}-{os.getpid()}",
+        "started_at": started.isoformat(),
+        "workers": workers,
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "unit_seconds": round(sum(e["seconds"] for e in entries), 3),
+        **counts,
+        "cubes": sorted(cubes, key=lambda c: (c["city"], c["month"])),
+        "units": entries
+    }
+    report_dir = root / REPORT_DIR
+    report_dir.mkdir(parents=True, exist_ok=True)
+    (report_dir / f"{report['run_id']}.json").write_text(json.dumps(report, indent=2))
+    return report
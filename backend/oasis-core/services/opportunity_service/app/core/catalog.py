@@ -0,0 +1,249 @@
+"""
+Persistent catalog of the NASA granules on disk.
+
+Granule file names follow ``<PRODUCT>.A<YYYYDDD>.h<HH>v<VV>.<CCC>.<production>.<ext>``
+(e.g. ``VNP46A3.A2024001.h27v06.001.2024100000000.h5``). The catalog parses
+them once, probes each granule's main dataset for its shape, dtype and
+scale/offset/fill attributes, and saves everything to a JSON file next to the
+data. Lookups by (product, tile) and (product, tile, date) are dict accesses.
+
+Refreshes are incremental: a product directory is only re-listed when its
+mtime changes (files added, removed or renamed), and only granules whose
+size or mtime differ from the stored entry are re-probed.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FORMAT = 1
+
+GRANULE_NAME = re.compile(
+    r"^(?P<product>[A-Z0-9]+)\.A(?P<year>\d{4})(?P<doy>\d{3})\.(?P<tile>h\d{2}v\d{2})"
+    r"\.(?P<collection>\d{3})\.(?P<production>\d{13})\.(?P<ext>h5|hdf)$"
+)
+
+# Main dataset probed per product, and the file format it is stored in
+PRODUCT_DATASETS = {
+    "VNP46A3": ("HDFEOS/GRIDS/VIIRS_Grid_DNB_2d/Data Fields/AllAngle_Composite_Snow_Free", "hdf5"),
+    "MCD12Q1": ("LC_Type1", "hdf4"),
+}
+
+@dataclass
+class Granule:
+    path: str
+    product: str
+    tile: str
+    acquired: str           # ISO date of the acquisition period start
+    collection: str
+    production: str
+    size: int
+    mtime: float
+    shape: Optional[List[int]] = None
+    dtype: Optional[str] = None
+    scale_factor: float = 1.0
+    offset: float = 0.0
+    fill_value: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return Path(self.path).name
+
+    @property
+    def sort_key(self) -> Tuple[str, str, str]:
+        # Newest acquisition first wins, then the newest collection and reprocessing
+        return self.acquired, self.collection, self.production
+
+def parse_granule_name(name: str) -> Optional[Dict[str, str]]:
+    """Product, tile, acquisition date, collection and production stamp of a granule file name."""
+    match = GRANULE_NAME.match(name)
+    if match is None:
+        return None
+    fields = match.groupdict()
+    acquired = date(int(fields["year"]), 1, 1) + timedelta(days=int(fields["doy"]) - 1)
+    return {
+        "product": fields["product"],
+        "tile": fields["tile"],
+        "acquired": acquired.isoformat(),
+        "collection": fields["collection"],
+        "production": fields["production"],
+    }
+
+def _scalar(value, default):
+    """HDF attributes are often stored as 1-element arrays; unwrap them to a Python scalar."""
+    if value is None:
+        return default
+    return np.asarray(value).ravel()[0].item()
+
+def probe_granule(path: Path, product: str) -> Dict:
+    """Shape, dtype and scale attributes of the product's main dataset; {} if unreadable."""
+    dataset_name, fmt = PRODUCT_DATASETS.get(product, (None, None))
+    try:
+        if fmt == "hdf5":
+            import h5py
+            with h5py.File(path, "r") as f:
+                if dataset_name not in f:
+                    return {}
+                dataset = f[dataset_name]
+                attrs = dataset.attrs
+                return {
+                    "shape": list(dataset.shape),
+                    "dtype": dataset.dtype.str,
+                    "scale_factor": _scalar(attrs.get("scale_factor"), 1.0),
+                    "offset": _scalar(attrs.get("offset"), 0.0),
+                    "fill_value": _scalar(attrs.get("_FillValue"), None),
+                }
+        if fmt == "hdf4":
+            from pyhdf.SD import SD, SDC
+            hdf = SD(str(path), SDC.READ)
+            try:
+                sds = hdf.select(dataset_name)
+                _, _, dims, _, _ = sds.info()
+                attrs = sds.attributes()
+                return {
+                    "shape": list(np.atleast_1d(dims).tolist()),
+                    "scale_factor": _scalar(attrs.get("scale_factor"), 1.0),
+                    "offset": _scalar(attrs.get("add_offset"), 0.0),
+                    "fill_value": _scalar(attrs.get("_FillValue"), None),
+                }
+            finally:
+                hdf.end()
+    except Exception as e:
+        logger.info(f"Could not probe {path.name}: {e}")
+    return {}
+
+class GranuleCatalog:
+    """Granules of several product directories, persisted to ``path`` and refreshed on directory change."""
+
+    def __init__(self, directories: Dict[str, Path], path: Path):
+        self.directories = {product: Path(d).resolve() for product, d in directories.items()}
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._granules: Dict[str, Granule] = {}
+        self._dir_mtimes: Dict[str, float] = {}
+        self._latest: Dict[Tuple[str, str], Granule] = {}
+        self._by_date: Dict[Tuple[str, str, str], Granule] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            stored = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        if stored.get("format") != CATALOG_FORMAT:
+            return
+        # Entries of directories no longer configured are dropped
+        known = {str(d) for d in self.directories.values()}
+        self._dir_mtimes = {d: m for d, m in stored.get("directories", {}).items() if d in known}
+        self._granules = {g["path"]: Granule(**g) for g in stored.get("granules", [])
+                          if os.path.dirname(g["path"]) in self._dir_mtimes}
+        self._reindex()
+
+    def _save(self):
+        payload = {
+            "format": CATALOG_FORMAT,
+            "updated_at": datetime.now().isoformat(),
+            "directories": self._dir_mtimes,
+            "granules": [asdict(g) for g in sorted(self._granules.values(), key=lambda g: g.path)],
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(payload, indent=1))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save granule catalog to {self.path}: {e}")
+
+    def _reindex(self):
+        self._latest = {}
+        self._by_date = {}
+        for granule in sorted(self._granules.values(), key=lambda g: g.sort_key):
+            self._latest[(granule.product, granule.tile)] = granule
+            self._by_date[(granule.product, granule.tile, granule.acquired)] = granule
+
+    def _scan(self, product: str, directory: Path) -> bool:
+        """Re-list one directory; returns whether any entry changed."""
+        previous = {p: g for p, g in self._granules.items() if os.path.dirname(p) == str(directory)}
+        current: Dict[str, Granule] = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                fields = parse_granule_name(entry.name)
+                if fields is None or fields["product"] != product or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                known = previous.get(entry.path)
+                if known is not None and known.size == stat.st_size and known.mtime == stat.st_mtime:
+                    current[entry.path] = known
+                    continue
+                probe = probe_granule(Path(entry.path), product)
+                current[entry.path] = Granule(path=entry.path, size=stat.st_size, mtime=stat.st_mtime, **fields, **probe)
+                logger.info(f"Catalogued {entry.name}")
+
+        changed = current.keys() != previous.keys() or any(current[p] is not previous[p] for p in current)
+        for path in previous.keys() - current.keys():
+            del self._granules[path]
+        self._granules.update(current)
+        return changed
+
+    def refresh(self) -> bool:
+        """
+        Bring the catalog up to date with the directories; one stat per directory when
+        nothing changed. Returns whether any granule was added, removed or re-probed.
+        """
+        with self._lock:
+            changed = scanned = False
+            for product, directory in self.directories.items():
+                key = str(directory)
+                try:
+                    mtime = directory.stat().st_mtime
+                except OSError:
+                    mtime = None
+                if self._dir_mtimes.get(key) == mtime:
+                    continue
+                scanned = True
+                if mtime is None:
+                    # Directory gone: forget its granules
+                    stale = [p for p in self._granules if os.path.dirname(p) == key]
+                    for path in stale:
+                        del self._granules[path]
+                    changed |= bool(stale)
+                    self._dir_mtimes.pop(key, None)
+                    continue
+                changed |= self._scan(product, directory)
+                self._dir_mtimes[key] = mtime
+            if changed:
+                self._reindex()
+            if scanned:
+                self._save()
+            return changed
+
+    def latest(self, product: str, tile: Optional[str] = None) -> Optional[Granule]:
+        """Most recent granule of ``product`` for ``tile`` (or over all tiles)."""
+        self.refresh()
+        if tile is not None:
+            return self._latest.get((product, tile))
+        candidates = [g for (p, _), g in self._latest.items() if p == product]
+        return max(candidates, key=lambda g: g.sort_key, default=None)
+
+    def get(self, product: str, tile: str, acquired: date) -> Optional[Granule]:
+        """Granule of ``product`` for ``tile`` acquired on ``acquired`` (newest processing)."""
+        self.refresh()
+        return self._by_date.get((product, tile, acquired.isoformat()))
+
+    def granules(self, product: Optional[str] = None, tile: Optional[str] = None) -> List[Granule]:
+        """Catalogued granules, oldest acquisition first."""
+        self.refresh()
+        return sorted(
+            (g for g in self._granules.values()
+             if (product is None or g.product == product) and (tile is None or g.tile == tile)),
+            key=lambda g: g.sort_key
+        )
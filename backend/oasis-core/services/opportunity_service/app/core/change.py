@@ -0,0 +1,219 @@
+"""
+Month-over-month change detection on the VNP46A3 nighttime-lights stack.
+
+Every catalogued month of a city's NTL window is stacked into one
+(months x rows x cols) array, fill pixels as NaN. Deltas, trailing rolling
+means and robust z-scores are then whole-array operations along the month axis,
+at pixel level and, after ``bincount`` over (month, cell) labels, at cell
+level. A month's z-score compares each delta with that month's median
+delta over the city, scaled by the MAD (x1.4826, the normal-consistent
+constant). It is robust to the few very bright pixels a city always has and
+needs only two months of data.
+
+The change cube is cached on the resident city per grid size and is rebuilt
+when the set of catalogued granules changes.
+"""
+import logging
+import time
+import warnings
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import settings
+from .grid import cell_index, south_up
+
+logger = logging.getLogger(__name__)
+
+# MAD -> standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over ``window`` steps of axis 0, ignoring NaNs; NaN until the window is full."""
+    valid = ~np.isnan(values)
+    zero = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate([zero, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    counts = np.concatenate([zero, np.cumsum(valid, axis=0)])
+    window_sums = sums[window:] - sums[:-window]
+    window_counts = counts[window:] - counts[:-window]
+    out = np.full(values.shape, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[window - 1:] = np.where(window_counts > 0, window_sums / window_counts, np.nan)
+    return out
+
+def robust_z(values: np.ndarray) -> np.ndarray:
+    """
+    Robust z-score of every value against the others at the same step: axis 0 is
+    time, all remaining axes are pooled. NaN where the step has no spread.
+    """
+    flat = values.reshape(len(values), -1)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        # The first month has no delta: an all-NaN slice
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(flat, axis=1, keepdims=True)
+        mad = np.nanmedian(np.abs(flat - median), axis=1, keepdims=True) * MAD_SCALE
+        z = np.where(mad > 0, (flat - median) / mad, np.nan)
+    return z.reshape(values.shape)
+
+class NTLStack:
+    """Radiance of every catalogued month over a city window, south-up, fill pixels as NaN."""
+
+    def __init__(self, months: List[str], radiance: np.ndarray, granules: List[str]):
+        self.months = months
+        self.radiance = radiance
+        self.granules = granules
+
+    @property
+    def nbytes(self) -> int:
+        return self.radiance.nbytes
+
+def read_ntl_stack(bounds: Dict[str, float]) -> NTLStack:
+    """Read each month's VNP46A3 window for ``bounds`` into a stack, oldest month first."""
+    from .nasa_data_reader import get_nasa_reader, vnp_tile
+    b = bounds
+    tile = vnp_tile((b["min_lat"] + b["max_lat"]) / 2, (b["min_lon"] + b["max_lon"]) / 2)
+    nasa_reader = get_nasa_reader()
+    granules = nasa_reader.catalog.granules("VNP46A3", tile)
+    # One granule per month: the newest processing, as latest()/get() would pick
+    by_month = {g.acquired[:7]: g for g in granules}
+    months, layers, names = [], [], []
+    for month, granule in sorted(by_month.items()):
+        packed = nasa_reader.read_nighttime_lights_packed(b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"],
+                                                          acquired=date.fromisoformat(granule.acquired))
+        if packed is None:
+            continue
+        layer = packed.scaled()
+        layer[packed.data == packed.fill_value] = np.nan
+        if layers and layer.shape != layers[0].shape:
+            logger.warning(f"Skipping {packed.source}: window {layer.shape} differs from {layers[0].shape}")
+            continue
+        months.append(month)
+        layers.append(south_up(layer, packed.lats))
+        names.append(packed.source)
+    if not layers:
+        raise ValueError(f"No VNP46A3 granules for tile {tile}")
+    return NTLStack(months, np.stack(layers), names)
+
+class ChangeCube:
+    """Per-pixel and per-cell month-over-month change of one city's NTL stack on one grid."""
+
+    def __init__(self, stack: NTLStack, bounds: Dict[str, float], grid_size: int,
+                 window: Optional[int] = None, min_z: Optional[float] = None):
+        start = time.perf_counter()
+        self.months = stack.months
+        self.granules = stack.granules
+        self.bounds = bounds
+        self.grid_size = grid_size
+        self.window = window or settings.ntl_change_window
+        self.min_z = settings.ntl_change_min_z if min_z is None else min_z
+        radiance = stack.radiance.astype(np.float64)
+        n_months = len(self.months)
+        n_cells = grid_size * grid_size
+
+        # Pixel level: deltas against the previous month, and their robust z per month
+        pixel_delta = np.full(radiance.shape, np.nan)
+        pixel_delta[1:] = radiance[1:] - radiance[:-1]
+        pixel_z = robust_z(pixel_delta)
+
+        # Cell level: bincounts over shared (month, cell) labels give sums and counts of
+        # valid pixels and counts of significantly brightening pixels for all months at once
+        labels = cell_index(radiance.shape[1:], grid_size).ravel()
+        month_labels = (np.arange(n_months)[:, None] * n_cells + labels[None, :]).ravel()
+        flat = radiance.reshape(-1)
+        valid = ~np.isnan(flat)
+        length = n_months * n_cells
+        sums = np.bincount(month_labels[valid], weights=flat[valid], minlength=length).reshape(n_months, n_cells)
+        counts = np.bincount(month_labels[valid], minlength=length).reshape(n_months, n_cells)
+        bright = np.nan_to_num(pixel_z.reshape(-1), nan=-np.inf) >= self.min_z
+        bright_counts = np.bincount(month_labels[bright], minlength=length).reshape(n_months, n_cells)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.radiance = np.where(counts > 0, sums / counts, np.nan)
+            self.delta = np.full(self.radiance.shape, np.nan)
+            self.delta[1:] = self.radiance[1:] - self.radiance[:-1]
+            previous = np.full(self.radiance.shape, np.nan)
+            previous[1:] = self.radiance[:-1]
+            self.pct_change = np.where(previous > 0, self.delta / previous * 100, np.nan)
+            # Pixels with a delta (valid in this and the previous month) per cell
+            has_delta = ~np.isnan(pixel_delta.reshape(-1))
+            delta_counts = np.bincount(month_labels[has_delta], minlength=length).reshape(n_months, n_cells)
+            self.bright_fraction = np.where(delta_counts > 0, bright_counts / delta_counts, np.nan)
+        self.rolling_mean = rolling_mean(self.radiance, self.window)
+        self.z = robust_z(self.delta)
+        self.pixel_delta = pixel_delta
+        self.pixel_z = pixel_z
+        self.compute_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.radiance, self.delta, self.pct_change, self.bright_fraction,
+                                      self.rolling_mean, self.z, self.pixel_delta, self.pixel_z))
+
+    def month_index(self, month: Optional[str]) -> int:
+        if len(self.months) < 2:
+            raise ValueError(f"Change detection needs at least two months, only {', '.join(self.months)} catalogued")
+        if month is None:
+            return len(self.months) - 1
+        if month not in self.months or month == self.months[0]:
+            raise ValueError(f"No month-over-month change for '{month}'. Months with a change: {', '.join(self.months[1:])}")
+        return self.months.index(month)
+
+    def brightening(self, k: int = 10, month: Optional[str] = None,
+                    min_z: Optional[float] = None) -> Tuple[int, np.ndarray]:
+        """
+        Cells whose radiance rose most from the previous month, largest delta first,
+        optionally only those with z >= ``min_z``. Returns (month index, cell indices).
+        """
+        t = self.month_index(month)
+        delta = self.delta[t]
+        keep = delta > 0
+        if min_z is not None:
+            keep &= np.nan_to_num(self.z[t], nan=-np.inf) >= min_z
+        candidates = np.nonzero(keep)[0]
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-delta[candidates], k - 1)[:k]]
+        return t, candidates[np.argsort(-delta[candidates], kind="stable")]
+
+    def cell_bounds(self, index: int) -> List[float]:
+        b = self.bounds
+        lat_step = (b["max_lat"] - b["min_lat"]) / self.grid_size
+        lon_step = (b["max_lon"] - b["min_lon"]) / self.grid_size
+        i, j = divmod(int(index), self.grid_size)
+        return [b["min_lon"] + j * lon_step, b["min_lat"] + i * lat_step,
+                b["min_lon"] + (j + 1) * lon_step, b["min_lat"] + (i + 1) * lat_step]
+
+    def records(self, t: int, indices: np.ndarray) -> List[Dict]:
+        def value(array, k, month=t):
+            v = float(array[month, k])
+            return None if np.isnan(v) else round(v, 4)
+        return [
+            {
+                "cell_id": int(k) + 1,
+                "radiance": value(self.radiance, k),
+                "previous_radiance": value(self.radiance, k, t - 1),
+                "delta": value(self.delta, k),
+                "pct_change": value(self.pct_change, k),
+                "rolling_mean": value(self.rolling_mean, k),
+                "z_score": value(self.z, k),
+                "bright_pixel_fraction": value(self.bright_fraction, k),
+                "bounds": self.cell_bounds(k),
+            }
+            for k in indices.tolist()
+        ]
+
+def get_change_cube(city_data, grid_size: int) -> ChangeCube:
+    """Change cube of a resident city, cached until another granule is catalogued."""
+    from .nasa_data_reader import get_nasa_reader, vnp_tile
+    b = city_data.city.bounds
+    tile = vnp_tile((b["min_lat"] + b["max_lat"]) / 2, (b["min_lon"] + b["max_lon"]) / 2)
+    signature = tuple(g.path for g in get_nasa_reader().catalog.granules("VNP46A3", tile))
+
+    stack_key = ("ntl_stack", signature)
+    cube_key = ("ntl_change", grid_size, signature, settings.ntl_change_window, settings.ntl_change_min_z)
+    # Stacks and cubes of an older granule set (or other settings) are dropped, not kept alongside
+    city_data.discard(lambda key: isinstance(key, tuple) and (
+        (key[0] == "ntl_stack" and key != stack_key) or (key[:2] == ("ntl_change", grid_size) and key != cube_key)
+    ))
+    stack = city_data.derive(stack_key, lambda: read_ntl_stack(b))
+    return city_data.derive(cube_key, lambda: ChangeCube(stack, b, grid_size))
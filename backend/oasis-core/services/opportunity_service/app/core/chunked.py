@@ -0,0 +1,211 @@
+"""
+Out-of-core zonal statistics: per-cell sums, pixel counts and class histograms
+of a raster too large to hold in memory.
+
+The raster is walked in tiles of at most ``chunk_size`` x ``chunk_size`` pixels
+read straight from disk (an HDF5 hyperslab or a memory-mapped ``.npy``), so
+only the tile being reduced and the per-cell output arrays are resident.
+
+Tiles are grouped into vertical strips whose edges fall on cell edges, and each
+strip is walked from south to north. Every cell therefore lies in one strip and
+receives its pixels in the same row-major order as the in-memory
+``grid.block_sums``, accumulated sequentially, so the sums are bit-identical
+to it, not just close. Strips cover disjoint cells, which is what lets them be
+fanned out to a process pool and merged by plain assignment.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .config import settings
+from .grid import axis_cells, axis_edges
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RasterSource:
+    """
+    A 2-D raster window on disk that any process can reopen.
+
+    ``window`` is (row_min, row_max, col_min, col_max) in stored pixels (the whole
+    dataset when None). Rasters stored north-up are flipped on read so rows come
+    back south-up, like ``grid.south_up``. With ``scale_factor`` set the stored
+    values are packed integers decoded as ``PackedRaster.scaled`` does; class
+    histograms always look at the stored values.
+    """
+    path: str
+    # HDF5 dataset path; None for a .npy file
+    dataset: Optional[str] = None
+    window: Optional[Tuple[int, int, int, int]] = None
+    north_up: bool = True
+    scale_factor: Optional[float] = None
+    offset: float = 0.0
+    fill_value: Optional[float] = None
+
+    @contextmanager
+    def open(self) -> Iterator["RasterReader"]:
+        if self.dataset is None:
+            yield RasterReader(self, np.load(self.path, mmap_mode="r"))
+            return
+        import h5py
+        with h5py.File(self.path, "r") as f:
+            yield RasterReader(self, f[self.dataset])
+
+class RasterReader:
+    """South-up windowed reads from an opened RasterSource (or a plain south-up array)."""
+
+    def __init__(self, source: Optional[RasterSource], data):
+        self.source = source
+        self.data = data
+        if source is not None and source.window is not None:
+            self.row_min, self.row_max, self.col_min, self.col_max = source.window
+        else:
+            self.row_min, self.col_min = 0, 0
+            self.row_max, self.col_max = data.shape[:2]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.row_max - self.row_min, self.col_max - self.col_min
+
+    def read(self, rows: Tuple[int, int], cols: Tuple[int, int]) -> np.ndarray:
+        """Stored values of south-up rows ``[rows)`` and columns ``[cols)``."""
+        c0, c1 = self.col_min + cols[0], self.col_min + cols[1]
+        if self.source is not None and self.source.north_up:
+            r0, r1 = self.row_max - rows[1], self.row_max - rows[0]
+            return np.asarray(self.data[r0:r1, c0:c1])[::-1]
+        return np.asarray(self.data[self.row_min + rows[0]:self.row_min + rows[1], c0:c1])
+
+    def decode(self, raw: np.ndarray) -> np.ndarray:
+        """Physical values of a tile as float64, as summed by ``grid.block_sums``."""
+        source = self.source
+        if source is None or source.scale_factor is None:
+            return np.asarray(raw, dtype=np.float64)
+        from .nasa_data_reader import PackedRaster
+        fill = 65535 if source.fill_value is None else source.fill_value
+        return PackedRaster(raw, source.scale_factor, source.offset, fill).scaled().astype(np.float64)
+
+@dataclass
+class ZonalResult:
+    """Per-cell totals in cell-id order."""
+    sums: np.ndarray
+    counts: np.ndarray
+    # (cells x classes) pixel counts, when classes were requested
+    histogram: Optional[np.ndarray] = None
+    classes: Optional[List] = None
+
+def plan_strips(cols: int, grid_size: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Cell-column ranges ``[first, last)`` of the vertical strips: as many whole cell
+    columns as fit in ``chunk_size`` pixels, and at least one.
+    """
+    edges = axis_edges(cols, grid_size)
+    strips = []
+    first = 0
+    while first < grid_size:
+        last = first + 1
+        while last < grid_size and edges[last + 1] - edges[first] <= chunk_size:
+            last += 1
+        strips.append((first, last))
+        first = last
+    return strips
+
+def _reduce_strip(reader: RasterReader, grid_size: int, strip: Tuple[int, int], chunk_size: int,
+                  classes: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """(grid_size x strip cells) sums, counts and class histogram of one strip."""
+    rows, cols = reader.shape
+    col_edges = axis_edges(cols, grid_size)
+    first, last = strip
+    c0, c1 = int(col_edges[first]), int(col_edges[last])
+    width = last - first
+    local_cols = axis_cells(cols, grid_size)[c0:c1] - first
+    row_cell = axis_cells(rows, grid_size)
+    n_local = grid_size * width
+
+    sums = np.zeros(n_local, dtype=np.float64)
+    counts = np.zeros(n_local, dtype=np.int64)
+    histogram = np.zeros(n_local * len(classes), dtype=np.int64) if classes is not None else None
+
+    # Rows per tile, keeping a tile near chunk_size^2 pixels even when one cell is wider
+    step = max(1, (chunk_size * chunk_size) // max(c1 - c0, 1))
+    for r0 in range(0, rows, step):
+        r1 = min(r0 + step, rows)
+        raw = reader.read((r0, r1), (c0, c1))
+        labels = (row_cell[r0:r1, None] * width + local_cols[None, :]).ravel()
+        # Unbuffered, in pixel order: continues each cell's running sum exactly where the
+        # previous tile left it, as one bincount over the whole raster would
+        np.add.at(sums, labels, reader.decode(raw).ravel())
+        counts += np.bincount(labels, minlength=n_local)
+        if classes is not None:
+            flat = raw.ravel()
+            pos = np.minimum(np.searchsorted(classes, flat), len(classes) - 1)
+            known = classes[pos] == flat
+            histogram += np.bincount(labels[known] * len(classes) + pos[known], minlength=len(histogram))
+
+    shape = (grid_size, width)
+    return (sums.reshape(shape), counts.reshape(shape),
+            histogram.reshape(shape + (len(classes),)) if histogram is not None else None)
+
+def _strip_task(source: RasterSource, grid_size: int, strip: Tuple[int, int], chunk_size: int,
+                classes: Optional[np.ndarray]):
+    with source.open() as reader:
+        return strip, _reduce_strip(reader, grid_size, strip, chunk_size, classes)
+
+def zonal_stats(source: Union[RasterSource, np.ndarray], grid_size: int,
+                chunk_size: Optional[int] = None, classes: Optional[Sequence] = None,
+                workers: Optional[int] = None) -> ZonalResult:
+    """
+    Per-cell sums and pixel counts of ``source`` (plus a histogram over ``classes``)
+    on a ``grid_size`` x ``grid_size`` grid, reading at most ``chunk_size``^2 pixels
+    at a time. A plain array is taken as already south-up. With ``workers`` > 1,
+    strips of an on-disk source are reduced in that many processes.
+    """
+    chunk_size = chunk_size or settings.zonal_chunk_size
+    workers = settings.zonal_workers if workers is None else workers
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1 pixel")
+    class_values = np.unique(np.asarray(classes)) if classes is not None else None
+    if class_values is not None and len(class_values) == 0:
+        raise ValueError("classes must not be empty")
+
+    n_classes = len(class_values) if class_values is not None else 0
+    sums = np.zeros((grid_size, grid_size), dtype=np.float64)
+    counts = np.zeros((grid_size, grid_size), dtype=np.int64)
+    histogram = np.zeros((grid_size, grid_size, n_classes), dtype=np.int64) if n_classes else None
+
+    def merge(strip, result):
+        first, last = strip
+        sums[:, first:last], counts[:, first:last] = result[0], result[1]
+        if histogram is not None:
+            histogram[:, first:last] = result[2]
+
+    if isinstance(source, np.ndarray):
+        if workers and workers > 1:
+            raise ValueError("A process pool needs an on-disk RasterSource, not an in-memory array")
+        reader = RasterReader(None, source)
+        for strip in plan_strips(reader.shape[1], grid_size, chunk_size):
+            merge(strip, _reduce_strip(reader, grid_size, strip, chunk_size, class_values))
+    else:
+        with source.open() as reader:
+            strips = plan_strips(reader.shape[1], grid_size, chunk_size)
+            if not workers or workers <= 1:
+                for strip in strips:
+                    merge(strip, _reduce_strip(reader, grid_size, strip, chunk_size, class_values))
+        if workers and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Each worker reopens the file and returns only its strip's totals
+                futures = [pool.submit(_strip_task, source, grid_size, strip, chunk_size, class_values)
+                           for strip in strips]
+                for future in futures:
+                    merge(*future.result())
+        logger.info(f"Zonal stats of {source.path}: {len(strips)} strips on a {grid_size}x{grid_size} grid")
+
+    return ZonalResult(
+        sums=sums.ravel(),
+        counts=counts.ravel(),
+        histogram=histogram.reshape(grid_size * grid_size, n_classes) if histogram is not None else None,
+        classes=class_values.tolist() if class_values is not None else None
+    )
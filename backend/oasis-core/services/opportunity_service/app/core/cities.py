@@ -0,0 +1,277 @@
+"""
+City registry and in-memory residency of per-city data cubes.
+
+Each registered city owns a directory under ``settings.cube_dir`` holding its
+precomputed raster cubes (``<name>.npy``) and a ``meta.json`` describing them.
+Cubes are built from the NASA granules on first use and memory-mapped on every
+later load, so a process only pays for the cities it is actually serving.
+Resident cities are kept in an LRU bounded by ``settings.city_cache_budget_mb``.
+"""
+import json
+import logging
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import settings
+from .telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class City:
+    key: str
+    name: str
+    min_lat: float
+    max_lat: float
+    min_lon: float
+    max_lon: float
+
+    @property
+    def bounds(self) -> Dict[str, float]:
+        return {
+            "min_lat": self.min_lat,
+            "max_lat": self.max_lat,
+            "min_lon": self.min_lon,
+            "max_lon": self.max_lon
+        }
+
+    def to_dict(self) -> Dict:
+        return {"key": self.key, "name": self.name, "bounds": self.bounds}
+
+def load_registry(config: Dict[str, Dict]) -> Dict[str, City]:
+    registry = {}
+    for key, entry in config.items():
+        registry[key.lower()] = City(
+            key=key.lower(),
+            name=entry.get("name", key.title()),
+            min_lat=float(entry["min_lat"]),
+            max_lat=float(entry["max_lat"]),
+            min_lon=float(entry["min_lon"]),
+            max_lon=float(entry["max_lon"])
+        )
+    return registry
+
+CITY_REGISTRY = load_registry(settings.cities)
+
+def get_city(key: str) -> Optional[City]:
+    return CITY_REGISTRY.get(key.lower())
+
+def list_cities() -> List[City]:
+    return list(CITY_REGISTRY.values())
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return int(getattr(value, "nbytes", 0) or 0)
+
+class CityData:
+    """Resident state for one city: its raster cubes plus products derived from them."""
+
+    def __init__(self, city: City, rasters: Dict[str, np.ndarray], meta: Dict):
+        self.city = city
+        self.rasters = rasters
+        self.meta = meta
+        self.derived: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def signature(self) -> Tuple:
+        """Source granules of the cube, as a hashable part of derived-product keys."""
+        return tuple(sorted((self.meta.get("sources") or {}).items()))
+
+    def raster(self, name: str) -> Optional[np.ndarray]:
+        return self.rasters.get(name)
+
+    def derive(self, key: Any, factory: Callable[[], Any]) -> Any:
+        """Return the derived product stored under ``key``, building it on first use."""
+        with self._lock:
+            if key not in self.derived:
+                self.derived[key] = factory()
+            return self.derived[key]
+
+    def discard(self, predicate: Callable[[Any], bool]):
+        """Drop the derived products whose key matches ``predicate``."""
+        with self._lock:
+            for key in [k for k in self.derived if predicate(k)]:
+                del self.derived[key]
+
+    @property
+    def nbytes(self) -> int:
+        total = sum(_nbytes(a) for a in self.rasters.values())
+        total += sum(_nbytes(v) for v in list(self.derived.values()))
+        return total
+
+class CityStore:
+    """LRU of resident cities, evicting the coldest ones once the memory budget is exceeded."""
+
+    def __init__(self, root: str, budget_mb: int, acquired: Optional[date] = None):
+        self.root = Path(root)
+        self.budget_bytes = budget_mb * 1024 * 1024
+        # Month whose NTL granule cubes are built from; None follows the latest granule,
+        # rebuilding a city's cube when a newer one is catalogued
+        self.acquired = acquired
+        self._resident: "OrderedDict[str, CityData]" = OrderedDict()
+        # Guards the LRU only; never held while a city is loaded
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        # Baked bundle (app.core.bake.BakeBundle) consulted before the raster cubes
+        self.bundle = None
+
+    def get(self, city: City) -> CityData:
+        data = self._resident_entry(city)
+        if data is not None and not self._stale(data.meta, city):
+            return data
+        # Cities are built under their own lock: other cities stay served meanwhile, and
+        # concurrent requests for this one wait for a single build
+        with self._city_lock(city):
+            data = self._resident_entry(city)
+            if data is not None and not self._stale(data.meta, city):
+                return data
+            if data is not None:
+                logger.info(f"New NTL granule for '{city.key}' - rebuilding its cube")
+            data = self._load(city)
+            with self._lock:
+                self._resident[city.key] = data
+                self._resident.move_to_end(city.key)
+                self._enforce_budget()
+            return data
+
+    def _resident_entry(self, city: City) -> Optional[CityData]:
+        with self._lock:
+            data = self._resident.get(city.key)
+            if data is not None:
+                self._resident.move_to_end(city.key)
+            return data
+
+    def _city_lock(self, city: City) -> threading.Lock:
+        with self._lock:
+            return self._loading.setdefault(city.key, threading.Lock())
+
+    def resident(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {"city": key, "nbytes": data.nbytes, "rasters": sorted(data.rasters)}
+                for key, data in self._resident.items()
+            ]
+
+    def invalidate(self, city: City, remove_cube: bool = False):
+        with self._lock:
+            self._resident.pop(city.key, None)
+        if remove_cube:
+            shutil.rmtree(self.root / city.key, ignore_errors=True)
+
+    def _enforce_budget(self):
+        total = sum(d.nbytes for d in self._resident.values())
+        # The most recently used city is never evicted, even if it alone exceeds the budget
+        while total > self.budget_bytes and len(self._resident) > 1:
+            key, evicted = self._resident.popitem(last=False)
+            total -= evicted.nbytes
+            logger.info(f"Evicted city '{key}' from memory ({evicted.nbytes / 1e6:.1f} MB)")
+
+    def _load(self, city: City) -> CityData:
+        if self.bundle is not None:
+            data = self.bundle.load(city)
+            if data is not None:
+                logger.info(f"Mapped '{city.key}' from bake bundle {self.bundle.bundle_id}")
+                return data
+
+        cube_dir = self.root / city.key
+        meta_path = cube_dir / "meta.json"
+
+        if not meta_path.exists() or self._stale(json.loads(meta_path.read_text()), city):
+            rasters, meta = self._build(city)
+            if not rasters:
+                # Nothing to persist - keep an empty, in-memory entry so we retry next process
+                return CityData(city, rasters, meta)
+            self._save(cube_dir, rasters, meta)
+
+        with stage("cube_load") as span:
+            meta = json.loads(meta_path.read_text())
+            rasters = {
+                name: np.load(cube_dir / f"{name}.npy", mmap_mode="r")
+                for name in meta.get("rasters", [])
+                if (cube_dir / f"{name}.npy").exists()
+            }
+            span.nbytes = sum(a.nbytes for a in rasters.values())
+        logger.info(f"Loaded cube for '{city.key}': {sorted(rasters)}")
+        return CityData(city, rasters, meta)
+
+    def current_granule(self, city: City) -> Optional[str]:
+        """File name of the VNP46A3 granule a cube of ``city`` should be built from now."""
+        try:
+            from .nasa_data_reader import get_nasa_reader, vnp_tile
+        except Exception:
+            return None
+        b = city.bounds
+        tile = vnp_tile((b["min_lat"] + b["max_lat"]) / 2, (b["min_lon"] + b["max_lon"]) / 2)
+        catalog = get_nasa_reader().catalog
+        if self.acquired is None:
+            granule = catalog.latest("VNP46A3", tile)
+        else:
+            granule = catalog.get("VNP46A3", tile, self.acquired)
+        return granule.name if granule is not None else None
+
+    def _stale(self, meta: Dict, city: City) -> bool:
+        """Whether a cube was built from another NTL granule than the catalog now selects."""
+        if "bundle" in meta:
+            # Baked bundles are fixed snapshots, replaced by baking a new one
+            return False
+        with stage("catalog_lookup"):
+            expected = self.current_granule(city)
+        return expected is not None and expected != (meta.get("sources") or {}).get("ntl")
+
+    def _build(self, city: City):
+        rasters: Dict[str, np.ndarray] = {}
+        meta = {
+            "city": city.key,
+            "bounds": city.bounds,
+            "built_at": datetime.now(timezone.utc).isoformat()
+        }
+        if self.acquired is not None:
+            meta["acquired"] = self.acquired.isoformat()
+
+        try:
+            from .nasa_data_reader import get_nasa_reader
+        except Exception as e:
+            logger.warning(f"Cannot build cube for '{city.key}': NASA data reader unavailable ({e})")
+            meta["rasters"] = []
+            return rasters, meta
+
+        b = city.bounds
+        rasters, sources = get_nasa_reader().read_city_rasters(
+            b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"],
+            margin_km=settings.food_search_margin_km,
+            acquired=self.acquired
+        )
+        meta["sources"] = sources
+
+        meta["rasters"] = sorted(rasters)
+        meta["shapes"] = {name: list(a.shape) for name, a in rasters.items()}
+        return rasters, meta
+
+    def _save(self, cube_dir: Path, rasters: Dict[str, np.ndarray], meta: Dict):
+        # Written beside the live cube and swapped in: a rebuilt cube never truncates
+        # files an older resident copy still has memory-mapped
+        staging = cube_dir.with_name(f".{cube_dir.name}.staging")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        for name, array in rasters.items():
+            np.save(staging / f"{name}.npy", np.ascontiguousarray(array))
+        # meta.json is written last so a half-written cube is never picked up
+        (staging / "meta.json").write_text(json.dumps(meta, indent=2))
+        retired = cube_dir.with_name(f".{cube_dir.name}.retired")
+        shutil.rmtree(retired, ignore_errors=True)
+        if cube_dir.exists():
+            cube_dir.rename(retired)
+        staging.rename(cube_dir)
+        shutil.rmtree(retired, ignore_errors=True)
+        logger.info(f"Saved cube for '{meta['city']}' to {cube_dir}")
+
+city_store = CityStore(settings.cube_dir, settings.city_cache_budget_mb)
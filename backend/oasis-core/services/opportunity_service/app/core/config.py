@@ -4,16 +4,129 @@ class Settings(BaseSettings):
     app_name: str = "Opportunity Service"
     port: int = 8002
     host: str = "0.0.0.0"
-    
+
     dhaka_bounds: dict = {
         "min_lat": 23.7,
         "max_lat": 23.9,
         "min_lon": 90.3,
         "max_lon": 90.5
     }
-    
+
+    # City registry: key -> display name + bounding box
+    cities: dict = {
+        "dhaka": {
+            "name": "Dhaka",
+            "min_lat": 23.7,
+            "max_lat": 23.9,
+            "min_lon": 90.3,
+            "max_lon": 90.5
+        },
+        "chattogram": {
+            "name": "Chattogram",
+            "min_lat": 22.25,
+            "max_lat": 22.45,
+            "min_lon": 91.75,
+            "max_lon": 91.95
+        },
+        "khulna": {
+            "name": "Khulna",
+            "min_lat": 22.75,
+            "max_lat": 22.9,
+            "min_lon": 89.5,
+            "max_lon": 89.6
+        }
+    }
+
+    # Per-city precomputed raster cubes live under <cube_dir>/<city>/
+    cube_dir: str = "../../data/cubes"
+
+    # Opportunity grid resolution (cells per side)
+    default_grid_size: int = 10
+    max_grid_size: int = 500
+
+    # Upper bound on weighting schemes accepted by the batch scoring endpoint
+    max_weight_schemes: int = 256
+
+    # Upper bound on cells returned by the index query endpoint
+    max_query_results: int = 1000
+
+    # Rasterized zone masks kept for repeated polygon queries
+    zone_mask_cache_size: int = 256
+
+    # Encoded native-resolution rasters kept per data fingerprint/weights/format
+    raster_cache_size: int = 64
+
+    # Land cover around each city searched for the nearest cropland, and the
+    # distance-to-cropland rasters kept per land-cover version
+    food_search_margin_km: float = 10.0
+    distance_cache_size: int = 32
+
+    # Travel-time accessibility: cached results, walk speed to/from the road network,
+    # and sources per Dijkstra call (each returns a sources x nodes distance block)
+    accessibility_cache_size: int = 32
+    walking_speed_kph: float = 4.8
+    dijkstra_chunk_size: int = 64
+    max_destinations: int = 5000
+
+    # Sparse spatial weights kept for hotspot analysis, per grid spec and scheme
+    hotspot_weights_cache_size: int = 16
+
+    # Served grid versions kept per city and grid size for since= delta responses
+    snapshot_history: int = 8
+
+    # Cells encoded per row group when streaming CSV/GeoParquet exports
+    export_rows_per_group: int = 65536
+
+    # JSON rule table for recommendations ([{rule_id, metric, comparator, threshold, text,
+    # priority}, ...]); empty uses the built-in rules in app/core/recommendations.py
+    recommendation_rules_file: str = ""
+
+    # Baked artifact bundles (bake_bundle.py) live under <bake_dir>/<bundle_id>/; the one
+    # named in <bake_dir>/CURRENT is memory-mapped at startup unless use_bake is off
+    bake_dir: str = "../../data/bakes"
+    bake_grid_sizes: list = [10, 50, 100]
+    use_bake: bool = True
+
+    # Batch precomputation (batch_precompute.py) over cities x grid sizes x months writes
+    # under <batch_dir>/<YYYY-MM>/; 0 workers uses one process per CPU
+    batch_dir: str = "../../data/batch"
+    batch_workers: int = 0
+
+    # NTL change detection: trailing months in the rolling mean, and the robust z-score
+    # from which a pixel's month-over-month brightening counts as significant
+    ntl_change_window: int = 3
+    ntl_change_min_z: float = 2.0
+
+    # Gravity-model amenity access (app/core/gravity.py): a GeoJSON/CSV extract of OSM shops,
+    # markets and stops (empty keeps the cropland/road estimates), the metrics it replaces,
+    # the reach and distance decay (km), the gravity counting as full access, cells per
+    # neighbour query, and access results kept per amenity version and grid spec
+    amenities_file: str = ""
+    amenity_replaces: list = ["food"]
+    amenity_radius_km: float = 3.0
+    amenity_decay_km: float = 1.0
+    amenity_full_access: float = 5.0
+    amenity_chunk_size: int = 4096
+    amenity_cache_size: int = 32
+
+    # GeoTIFF of people per pixel in lat/lon (GPW v4 population count or WorldPop) for exact
+    # per-cell population; empty, or rasterio not installed, keeps the nighttime-lights estimate
+    population_file: str = ""
+
+    # Out-of-core zonal statistics (app/core/chunked.py): tile side in pixels, and processes
+    # reducing strips of a raster in parallel (0 or 1 reduces them in-process)
+    zonal_chunk_size: int = 1024
+    zonal_workers: int = 0
+
+    # Slowest modules of the service import listed at startup (0 turns the report off), and
+    # the import-time budget test_import_budget.py enforces for a fresh interpreter
+    import_report_top: int = 10
+    import_budget_ms: float = 1500.0
+
+    # Memory budget for cities kept resident in the in-process LRU
+    city_cache_budget_mb: int = 256
+
     class Config:
         env_file = ".env"
 
 settings = Settings()
-
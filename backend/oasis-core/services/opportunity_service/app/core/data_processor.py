@@ -1,88 +1,198 @@
 import json
 import random
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional, Sequence, Tuple
 import logging
 
+import numpy as np
+
+from .gravity import get_amenities, with_amenity_access
+from .population import population_version
+from .index import MetricIndex
+from .recommendations import RuleSet, get_rule_set, rule_summary
+from .snapshots import GridSnapshot, diff_snapshots, snapshot_store
+from .telemetry import stage
+from .features import (
+    FeatureGrid, FEATURE_NAMES, DEFAULT_WEIGHTS, DEFAULT_THRESHOLDS,
+    categorize, normalize_weights, validate_thresholds
+)
+
 logger = logging.getLogger(__name__)
 
 try:
-    from .nasa_data_reader import nasa_reader
+    from .nasa_data_reader import get_nasa_reader
     NASA_DATA_AVAILABLE = True
     logger.info("NASA data reader loaded successfully")
 except Exception as e:
     NASA_DATA_AVAILABLE = False
     logger.warning(f"NASA data reader not available: {e}")
 
-def make_grid_cells(bounds: dict, grid_size: int = 10, use_real_data: bool = True) -> List[Dict]:
-    cells = []
-    
-    lat_step = (bounds["max_lat"] - bounds["min_lat"]) / grid_size
-    lon_step = (bounds["max_lon"] - bounds["min_lon"]) / grid_size
-    
+def build_feature_grid(bounds: dict, grid_size: int = 10, use_real_data: bool = True,
+                       rasters: Optional[Dict] = None) -> FeatureGrid:
     nasa_metrics = {}
     if use_real_data and NASA_DATA_AVAILABLE:
         try:
-            print("=" * 80)
-            print("🛰️  LOADING REAL NASA SATELLITE DATA")
-            print("=" * 80)
             logger.info("Loading real NASA data...")
-            nasa_metrics = nasa_reader.calculate_grid_metrics(
+            nasa_metrics = get_nasa_reader().calculate_grid_metrics(
                 bounds["min_lat"], bounds["max_lat"],
                 bounds["min_lon"], bounds["max_lon"],
-                grid_size
+                grid_size,
+                rasters=rasters
             )
-            print(f"✅ Successfully loaded real NASA data for {len(nasa_metrics)} cells")
-            print("=" * 80)
             logger.info(f"✅ Loaded real NASA metrics for {len(nasa_metrics)} cells")
         except Exception as e:
-            print(f"❌ Error loading NASA data: {e}")
-            print("⚠️  Falling back to simulated data")
-            logger.error(f"Error loading NASA data: {e}")
+            logger.error(f"Error loading NASA data, falling back to simulated data: {e}")
             nasa_metrics = {}
     else:
         if not NASA_DATA_AVAILABLE:
-            print("⚠️  NASA data reader not available - using simulated data")
-            logger.warning("NASA data reader not available")
-    
-    cell_id = 1
-    for i in range(grid_size):
-        for j in range(grid_size):
-            min_lat = bounds["min_lat"] + (i * lat_step)
-            max_lat = min_lat + lat_step
-            min_lon = bounds["min_lon"] + (j * lon_step)
-            max_lon = min_lon + lon_step
-            
-            center_lat = (min_lat + max_lat) / 2
-            center_lon = (min_lon + max_lon) / 2
-            
-            if cell_id in nasa_metrics:
-                metrics = nasa_metrics[cell_id]
-                housing_pressure = metrics['housing_pressure']
-                food_distance = metrics['food_distance_km']
-                transport_score = metrics.get('transport_score', 0.5 + (housing_pressure * 0.4))
-                pop_density = int(15000 + (housing_pressure * 15000))
-            else:
-                pop_density = random.randint(5000, 30000)
-                food_distance = random.uniform(0.5, 8.0)
-                transport_score = random.uniform(0.2, 0.9)
-                housing_pressure = random.uniform(0.3, 0.95)
-            
-            food_score = max(0, 1 - (food_distance / 8.0))
-            
-            opportunity_score = (food_score * 0.3) + (transport_score * 0.35) + ((1 - housing_pressure) * 0.35)
-            
+            logger.warning("NASA data reader not available - using simulated data")
+    
+    if '_sums' in nasa_metrics:
+        features = FeatureGrid.from_sums(bounds, grid_size, nasa_metrics['_sums'], nasa_metrics.get('_metadata', {}))
+        return with_amenity_access(features)
+    
+    n_cells = grid_size * grid_size
+    housing = np.empty(n_cells)
+    food = np.empty(n_cells)
+    transport = np.empty(n_cells)
+    population = np.empty(n_cells, dtype=np.int64)
+    ntl = np.zeros(n_cells)
+    
+    for k in range(n_cells):
+        population[k] = random.randint(5000, 30000)
+        food[k] = random.uniform(0.5, 8.0)
+        transport[k] = random.uniform(0.2, 0.9)
+        housing[k] = random.uniform(0.3, 0.95)
+    
+    return FeatureGrid(
+        bounds, grid_size,
+        housing_pressure=housing,
+        food_distance_km=food,
+        transport_score=transport,
+        population_density=population,
+        avg_nighttime_light=ntl,
+        sources=nasa_metrics.get('_metadata', {})
+    )
+
+def grid_version(city_data) -> Tuple:
+    """
+    What a city's grids are computed from: the source granules of its cube, the
+    amenity extract and the population raster.
+    """
+    amenities = get_amenities()
+    return city_data.signature, amenities.version if amenities is not None else None, population_version()
+
+def grid_key(city_data, *key, version: Optional[Tuple] = None) -> Tuple:
+    """
+    Derived-product key of a city grid (``"features"``, ``"index"``, ...) at ``version``
+    (default: the current grid version); entries of the same product left from other
+    versions are dropped.
+    """
+    versioned = key + (grid_version(city_data) if version is None else version,)
+    city_data.discard(lambda k: isinstance(k, tuple) and k[:len(key)] == key and k != versioned)
+    return versioned
+
+def finest_nesting_grid(city_data, grid_size: int, use_real_data: bool = True) -> Optional[FeatureGrid]:
+    """Smallest cached feature grid with per-cell totals whose cells nest exactly in ``grid_size``."""
+    version = grid_version(city_data)
+    candidates = [
+        features for key, features in list(city_data.derived.items())
+        if isinstance(key, tuple) and key[0] == "features" and key[2:] == (use_real_data, version)
+        and key[1] > grid_size and key[1] % grid_size == 0 and features.sums is not None
+    ]
+    return min(candidates, key=lambda f: f.grid_size, default=None)
+
+def get_feature_grid(city_data, grid_size: int = 10, use_real_data: bool = True) -> FeatureGrid:
+    """
+    Feature grid for a resident city, built once per grid size and cached on the city.
+    Coarser grids are rolled up from a cached finer grid when its cells nest exactly.
+    """
+    def build() -> FeatureGrid:
+        finer = finest_nesting_grid(city_data, grid_size, use_real_data)
+        if finer is not None:
+            logger.info(f"Rolling up {finer.grid_size}x{finer.grid_size} grid into {grid_size}x{grid_size}")
+            # Totals roll up; amenity access is recomputed at the coarser centroids
+            return with_amenity_access(finer.rollup(grid_size))
+        return build_feature_grid(city_data.city.bounds, grid_size, use_real_data, city_data.rasters)
+    
+    return city_data.derive(grid_key(city_data, "features", grid_size, use_real_data), build)
+
+def get_metric_index(city_data, grid_size: int = 10) -> MetricIndex:
+    """Presorted metric index over a city's feature grid, cached alongside it."""
+    return city_data.derive(
+        grid_key(city_data, "index", grid_size),
+        lambda: MetricIndex(get_feature_grid(city_data, grid_size))
+    )
+
+def get_snapshot(city_data, grid_size: int = 10) -> GridSnapshot:
+    """
+    Versioned snapshot of the grid as currently served, recorded in the city's history;
+    a cube rebuilt from a new granule gives a new snapshot to diff against the old one.
+    """
+    snapshot = city_data.derive(
+        grid_key(city_data, "snapshot", grid_size),
+        lambda: GridSnapshot(*_snapshot_columns(get_feature_grid(city_data, grid_size)))
+    )
+    return snapshot_store.record((city_data.city.key, grid_size), snapshot)
+
+def _snapshot_columns(features: FeatureGrid):
+    return features.cell_ids, cell_properties(features)
+
+def cell_properties(features: FeatureGrid,
+                    weights: Sequence[float] = DEFAULT_WEIGHTS,
+                    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+                    indices: Optional[Sequence[int]] = None) -> Dict[str, np.ndarray]:
+    """
+    Per-cell GeoJSON properties as arrays, rounded exactly as they are served; only
+    for the rows ``indices`` (cell_id - 1) when given.
+    """
+    rows = slice(None) if indices is None else np.asarray(indices, dtype=np.int64)
+    matrix = features.matrix[rows]
+    with stage("scoring", nbytes=matrix.nbytes):
+        scores = matrix @ np.asarray(weights, dtype=np.float64)
+        return {
+            "opportunity_score": np.round(scores, 2),
+            "population_density": features.population_density[rows],
+            "food_access_distance_km": np.round(features.food_distance_km[rows], 2),
+            "transport_access_score": np.round(features.transport_score[rows], 2),
+            "housing_pressure_score": np.round(features.housing_pressure[rows], 2),
+            "category": categorize(scores, thresholds)
+        }
+
+def served_properties(props: Dict[str, np.ndarray], k: int) -> Dict:
+    """Row ``k`` of ``cell_properties`` output as the plain values served for one cell."""
+    return {
+        "opportunity_score": float(props["opportunity_score"][k]),
+        "population_density": int(props["population_density"][k]),
+        "food_access_distance_km": float(props["food_access_distance_km"][k]),
+        "transport_access_score": float(props["transport_access_score"][k]),
+        "housing_pressure_score": float(props["housing_pressure_score"][k]),
+        "category": str(props["category"][k])
+    }
+
+def make_grid_cells(bounds: dict, grid_size: int = 10, use_real_data: bool = True,
+                    rasters: Optional[Dict] = None,
+                    features: Optional[FeatureGrid] = None,
+                    weights: Sequence[float] = DEFAULT_WEIGHTS,
+                    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+                    indices: Optional[Sequence[int]] = None) -> List[Dict]:
+    """GeoJSON features for every cell, or only for ``indices`` (cell_id - 1) when given."""
+    if features is None:
+        features = build_feature_grid(bounds, grid_size, use_real_data, rasters)
+    
+    props = cell_properties(features, weights, thresholds)
+    
+    with stage("geojson_build"):
+        cells = []
+        for k in (range(features.n_cells) if indices is None else indices):
+            k = int(k)
+            cell_id = k + 1
+            min_lon, min_lat, max_lon, max_lat = features.cell_bounds(k)
+        
             cell = {
                 "type": "Feature",
                 "id": cell_id,
-                "properties": {
-                    "cell_id": cell_id,
-                    "opportunity_score": round(opportunity_score, 2),
-                    "population_density": pop_density,
-                    "food_access_distance_km": round(food_distance, 2),
-                    "transport_access_score": round(transport_score, 2),
-                    "housing_pressure_score": round(housing_pressure, 2),
-                    "category": "low" if opportunity_score < 0.4 else "medium" if opportunity_score < 0.7 else "high"
-                },
+                "properties": {"cell_id": cell_id, **served_properties(props, k)},
                 "geometry": {
                     "type": "Polygon",
                     "coordinates": [[
@@ -94,34 +204,26 @@ def make_grid_cells(bounds: dict, grid_size: int = 10, use_real_data: bool = Tru
                     ]]
                 }
             }
-            
+        
             cells.append(cell)
-            cell_id += 1
     
     return cells
 
-def make_opportunity_geojson(bounds: dict, use_real_data: bool = True) -> dict:
-    cells = make_grid_cells(bounds, use_real_data=use_real_data)
-    
-    # Check metadata from nasa_reader
-    metadata_info = cells[-1] if cells and isinstance(cells[-1], dict) and '_metadata' in str(cells[-1]) else {}
+def make_opportunity_geojson(bounds: dict, use_real_data: bool = True,
+                             rasters: Optional[Dict] = None,
+                             features: Optional[FeatureGrid] = None,
+                             weights: Sequence[float] = DEFAULT_WEIGHTS,
+                             thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+                             indices: Optional[Sequence[int]] = None) -> dict:
+    if features is None:
+        features = build_feature_grid(bounds, use_real_data=use_real_data, rasters=rasters)
+    cells = make_grid_cells(bounds, features=features, weights=weights, thresholds=thresholds, indices=indices)
     
     if use_real_data and NASA_DATA_AVAILABLE:
-        # Try to detect what data sources were loaded
-        try:
-            from .nasa_data_reader import nasa_reader
-            test_metrics = nasa_reader.calculate_grid_metrics(
-                bounds["min_lat"], bounds["max_lat"],
-                bounds["min_lon"], bounds["max_lon"],
-                grid_size=2  # Small test
-            )
-            modis_loaded = test_metrics.get('_metadata', {}).get('lc_loaded', False)
-            ntl_loaded = test_metrics.get('_metadata', {}).get('ntl_loaded', False)
-            transport_loaded = test_metrics.get('_metadata', {}).get('transport_loaded', False)
-        except:
-            modis_loaded = False
-            ntl_loaded = True
-            transport_loaded = False
+        # The feature grid records which data sources were actually loaded
+        modis_loaded = features.sources.get('lc_loaded', False)
+        ntl_loaded = features.sources.get('ntl_loaded', False)
+        transport_loaded = features.sources.get('transport_loaded', False)
         
         # Build status based on what's loaded
         data_sources = []
@@ -129,16 +231,31 @@ def make_opportunity_geojson(bounds: dict, use_real_data: bool = True) -> dict:
         
         if ntl_loaded:
             data_sources.append("NASA VNP46A3 - Black Marble Nighttime Lights (Housing Pressure) ✓")
-            data_sources.append("Derived Population Density from Infrastructure ✓")
             status_parts.append("VNP46A3")
         
-        if modis_loaded:
+        if features.sources.get('population_source'):
+            data_sources.append(f"{population_source(features)} (Population Density) ✓")
+            status_parts.append("Population")
+        elif ntl_loaded:
+            data_sources.append("Derived Population Density from Infrastructure ✓")
+        
+        food_amenities = features.sources.get('food_source')
+        transport_amenities = features.sources.get('transport_source')
+        
+        if food_amenities:
+            data_sources.append("OpenStreetMap Shops and Markets - Gravity Model (Food Access) ✓")
+            status_parts.append("OSM Amenities")
+        elif modis_loaded:
             data_sources.append("NASA MODIS MCD12Q1 - Land Cover Classification (Food Access) ✓")
             status_parts.append("MODIS")
         else:
             data_sources.append("Food Access estimated from Urban Density")
         
-        if transport_loaded:
+        if transport_amenities:
+            data_sources.append("OpenStreetMap Stops and Stations - Gravity Model (Transport Access) ✓")
+            if not food_amenities:
+                status_parts.append("OSM Amenities")
+        elif transport_loaded:
             data_sources.append("OpenStreetMap Road Network (Transport Access) ✓")
             status_parts.append("OSM")
         else:
@@ -162,10 +279,10 @@ def make_opportunity_geojson(bounds: dict, use_real_data: bool = True) -> dict:
         "type": "FeatureCollection",
         "features": cells,
         "metadata": {
-            "total_cells": len(cells),
+            "total_cells": features.n_cells,
             "data_status": data_status,
             "data_sources": data_sources,
-            "calculation_method": "Weighted average: Food Access (30%), Transport Access (35%), Housing Availability (35%)",
+            "calculation_method": describe_weights(weights),
             "nasa_data_available": NASA_DATA_AVAILABLE,
             "note": note
         }
@@ -173,57 +290,217 @@ def make_opportunity_geojson(bounds: dict, use_real_data: bool = True) -> dict:
     
     return geojson
 
-def get_cell_details(cell_id: int, bounds: dict) -> dict:
-    cells = make_grid_cells(bounds)
-    
-    for cell in cells:
-        if cell["id"] == cell_id:
-            props = cell["properties"]
-            return {
-                "cell_id": cell_id,
-                "opportunity_score": props["opportunity_score"],
-                "category": props["category"],
-                "metrics": {
-                    "population_density": {
-                        "value": props["population_density"],
-                        "unit": "people/km²",
-                        "source": "NASA SEDAC"
-                    },
-                    "food_access": {
-                        "distance_km": props["food_access_distance_km"],
-                        "status": "Poor" if props["food_access_distance_km"] > 5 else "Good",
-                        "source": "NASA MODIS Land Cover"
-                    },
-                    "transport_access": {
-                        "score": props["transport_access_score"],
-                        "status": "Poor" if props["transport_access_score"] < 0.4 else "Good",
-                        "source": "OpenStreetMap"
-                    },
-                    "housing_pressure": {
-                        "score": props["housing_pressure_score"],
-                        "status": "High Pressure" if props["housing_pressure_score"] > 0.7 else "Normal",
-                        "source": "NASA Black Marble"
-                    }
-                },
-                "recommendations": get_recommendations(props)
-            }
+def opportunity_index(city_data, grid_size: int = 10, since: Optional[str] = None) -> dict:
+    """
+    The ``/opportunity_index`` response for a resident city: the full grid, or only the
+    cells changed since version ``since`` when that version is still in the history.
+    """
+    features = get_feature_grid(city_data, grid_size)
+    snapshot = get_snapshot(city_data, grid_size)
+    
+    # Unknown or expired versions fall back to the full grid (delta = false)
+    base = snapshot_store.get((city_data.city.key, grid_size), since) if since else None
+    indices, tombstones = diff_snapshots(base, snapshot) if base is not None else (None, None)
     
-    return {"error": "Cell not found"}
+    geojson = make_opportunity_geojson(city_data.city.bounds, features=features, indices=indices)
+    geojson["metadata"]["city"] = city_data.city.key
+    geojson["metadata"]["grid_size"] = grid_size
+    geojson["metadata"]["derived_from_grid"] = features.derived_from
+    geojson["metadata"]["version"] = snapshot.version
+    if since is not None:
+        geojson["metadata"]["since"] = since
+        geojson["metadata"]["delta"] = base is not None
+        geojson["metadata"]["changed_cells"] = len(geojson["features"])
+        geojson["metadata"]["tombstones"] = [] if tombstones is None else tombstones.tolist()
+    return geojson
+
+def describe_weights(weights: Sequence[float]) -> str:
+    food, transport, housing = weights
+    return (f"Weighted average: Food Access ({food:.0%}), Transport Access ({transport:.0%}), "
+            f"Housing Availability ({housing:.0%})")
 
-def get_recommendations(props: dict) -> List[str]:
-    recs = []
+def score_cells(features: FeatureGrid,
+                weights: Sequence[float] = DEFAULT_WEIGHTS,
+                thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> dict:
+    """Rescore a cached feature grid under custom weights without rebuilding any cells."""
+    w = normalize_weights(weights)
+    low, high = validate_thresholds(thresholds)
     
-    if props["food_access_distance_km"] > 5:
-        recs.append("Establish community food markets within 3km radius")
+    started = time.perf_counter()
+    with stage("scoring", nbytes=features.matrix.nbytes):
+        scores = features.score(w)
+        categories = categorize(scores, (low, high))
+    elapsed_ms = (time.perf_counter() - started) * 1000
     
-    if props["transport_access_score"] < 0.4:
-        recs.append("Improve road connectivity and public transport routes")
+    counts = {c: int(n) for c, n in zip(*np.unique(categories, return_counts=True))}
+    return {
+        "grid_size": features.grid_size,
+        "weights": dict(zip(FEATURE_NAMES, np.round(w, 4).tolist())),
+        "thresholds": {"low": low, "high": high},
+        "calculation_method": describe_weights(w),
+        "cell_ids": features.cell_ids.tolist(),
+        "opportunity_scores": np.round(scores, 4).tolist(),
+        "categories": categories.tolist(),
+        "category_counts": {c: counts.get(c, 0) for c in ("low", "medium", "high")},
+        "mean_score": round(float(scores.mean()), 4),
+        "compute_ms": round(elapsed_ms, 3)
+    }
+
+def score_schemes(features: FeatureGrid,
+                  weight_matrix: Sequence[Sequence[float]],
+                  names: Optional[List[str]] = None,
+                  top_n: int = 10,
+                  bottom_fraction: float = 0.1) -> dict:
+    """
+    Score every cell under K weighting schemes with one matrix multiply.
+
+    Returns the ``top_n`` priority (lowest-scoring) cells per scheme and, per cell,
+    how often it falls in the bottom ``bottom_fraction`` of cells across schemes.
+    """
+    W = np.vstack([normalize_weights(w) for w in weight_matrix])
+    n_schemes = W.shape[0]
+    n_cells = features.n_cells
+    names = names or [f"scheme_{k + 1}" for k in range(n_schemes)]
+    top_n = max(1, min(top_n, n_cells))
     
-    if props["housing_pressure_score"] > 0.7:
-        recs.append("Develop affordable housing projects to reduce density pressure")
+    started = time.perf_counter()
+    with stage("scoring", nbytes=features.matrix.nbytes):
+        S = features.score_batch(W)                       # (cells, K)
     
-    if props["opportunity_score"] < 0.4:
-        recs.append("Priority zone for integrated development intervention")
+    # Rank 0 = lowest score = highest priority, per scheme
+    order = np.argsort(S, axis=0, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(n_cells)[:, None], axis=0)
     
-    return recs
+    bottom_count = max(1, int(np.ceil(bottom_fraction * n_cells)))
+    in_bottom = ranks < bottom_count
+    bottom_frequency = in_bottom.mean(axis=1)
+    percentile = ranks / max(n_cells - 1, 1)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    cell_ids = features.cell_ids
+    schemes = []
+    for k in range(n_schemes):
+        top = order[:top_n, k]
+        schemes.append({
+            "name": names[k],
+            "weights": dict(zip(FEATURE_NAMES, np.round(W[k], 4).tolist())),
+            "mean_score": round(float(S[:, k].mean()), 4),
+            "priority_cells": [
+                {"cell_id": int(cell_ids[c]), "opportunity_score": round(float(S[c, k]), 4)}
+                for c in top
+            ]
+        })
+    
+    return {
+        "grid_size": features.grid_size,
+        "n_schemes": n_schemes,
+        "top_n": top_n,
+        "schemes": schemes,
+        "rank_stability": {
+            "bottom_fraction": bottom_fraction,
+            "bottom_cells_per_scheme": bottom_count,
+            "cell_ids": cell_ids.tolist(),
+            "bottom_frequency": np.round(bottom_frequency, 4).tolist(),
+            "mean_percentile_rank": np.round(percentile.mean(axis=1), 4).tolist(),
+            "percentile_rank_std": np.round(percentile.std(axis=1), 4).tolist(),
+            "always_bottom": cell_ids[bottom_frequency == 1.0].tolist()
+        },
+        "compute_ms": round(elapsed_ms, 3)
+    }
+
+def population_source(features: FeatureGrid) -> str:
+    """Where a feature grid's population density comes from, as shown to clients."""
+    source = features.sources.get('population_source')
+    if source:
+        return f"Gridded population counts: {source}"
+    if features.sums is not None:
+        return "Estimated from nighttime lights"
+    return "Simulated"
 
+def food_source(features: FeatureGrid) -> str:
+    """Where a feature grid's food access comes from, as shown to clients."""
+    if features.sources.get('food_source') == "osm_amenities":
+        return "OpenStreetMap amenities (gravity model)"
+    if features.sources.get('lc_loaded'):
+        return "NASA MODIS Land Cover"
+    if features.sums is not None:
+        return "Estimated from urban density"
+    return "Simulated"
+
+def transport_source(features: FeatureGrid) -> str:
+    """Where a feature grid's transport access comes from, as shown to clients."""
+    if features.sources.get('transport_source') == "osm_amenities":
+        return "OpenStreetMap amenities (gravity model)"
+    if features.sources.get('transport_loaded'):
+        return "OpenStreetMap"
+    if features.sums is not None:
+        return "Estimated from infrastructure"
+    return "Simulated"
+
+def get_cell_details(cell_id: int, bounds: dict, rasters: Optional[Dict] = None,
+                     features: Optional[FeatureGrid] = None) -> dict:
+    """Metrics, sources and recommendations of one cell, read from its row of the grid."""
+    if features is None:
+        features = build_feature_grid(bounds, rasters=rasters)
+    if not 1 <= cell_id <= features.n_cells:
+        return {"error": "Cell not found"}
+    
+    props = served_properties(cell_properties(features, indices=[cell_id - 1]), 0)
+    return {
+        "cell_id": cell_id,
+        "opportunity_score": props["opportunity_score"],
+        "category": props["category"],
+        "metrics": {
+            "population_density": {
+                "value": props["population_density"],
+                "unit": "people/km²",
+                "people_in_cell": int(round(float(features.population[cell_id - 1]))),
+                "source": population_source(features)
+            },
+            "food_access": {
+                "distance_km": props["food_access_distance_km"],
+                "status": "Poor" if props["food_access_distance_km"] > 5 else "Good",
+                "source": food_source(features)
+            },
+            "transport_access": {
+                "score": props["transport_access_score"],
+                "status": "Poor" if props["transport_access_score"] < 0.4 else "Good",
+                "source": transport_source(features)
+            },
+            "housing_pressure": {
+                "score": props["housing_pressure_score"],
+                "status": "High Pressure" if props["housing_pressure_score"] > 0.7 else "Normal",
+                "source": "NASA Black Marble"
+            }
+        },
+        "recommendations": get_recommendations(props)
+    }
+
+def get_recommendations(props: dict, rule_set: Optional[RuleSet] = None) -> List[str]:
+    """Recommendation texts for one cell's served properties, in rule priority order."""
+    rule_set = rule_set or get_rule_set()
+    columns = {rule.metric: np.asarray([props[rule.metric]]) for rule in rule_set.rules}
+    return rule_set.texts(rule_set.evaluate(columns)[0])
+
+def grid_recommendations(features: FeatureGrid, include_cells: bool = True,
+                         rule_set: Optional[RuleSet] = None) -> dict:
+    """Every rule evaluated over every cell: per-rule hit counts and per-cell rule bitsets."""
+    rule_set = rule_set or get_rule_set()
+    started = time.perf_counter()
+    hits = rule_set.evaluate(cell_properties(features))
+    bitsets = rule_set.bitsets(hits)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    rules, cells_hit = rule_summary(rule_set, hits, features.population)
+    result = {
+        "grid_size": features.grid_size,
+        "rules": rules,
+        "cells_with_recommendations": cells_hit,
+        "total_cells": features.n_cells,
+        "compute_ms": round(elapsed_ms, 3)
+    }
+    if include_cells:
+        # bitsets[k] belongs to cell_id k + 1; bit b is rules[b]
+        result["bitsets"] = bitsets.tolist()
+    return result
@@ -0,0 +1,64 @@
+"""
+Distance to the nearest food source (cropland) on the NTL pixel grid.
+
+Computed with scipy's exact Euclidean distance transform, which is linear in
+the number of pixels, over land cover that extends ``food_search_margin_km``
+beyond the city window so cropland just outside the bounds still counts.
+Results are cached per land-cover version (content hash of the aligned array).
+"""
+import hashlib
+from typing import Dict, Optional
+
+import numpy as np
+
+from .cache import LRUCache
+from .config import settings
+from .grid import KM_PER_DEGREE, extend_coords, pixel_coords, pixel_steps
+
+# IGBP classes treated as food sources: 12 = croplands, 14 = cropland/natural vegetation mosaic
+CROPLAND_CLASSES = (12, 14)
+
+# Distance used where no cropland exists anywhere in the padded window
+NO_CROPLAND_DISTANCE_KM = 8.0
+
+# Distance rasters per land-cover version and window
+distance_cache = LRUCache(settings.distance_cache_size)
+
+def is_cropland(lc: np.ndarray) -> np.ndarray:
+    return np.isin(lc, CROPLAND_CLASSES)
+
+def cropland_distance_km(lc: np.ndarray, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Exact distance (km) from every pixel to the nearest cropland pixel."""
+    from scipy import ndimage
+    cropland = is_cropland(lc)
+    if not cropland.any():
+        return np.full(lc.shape, NO_CROPLAND_DISTANCE_KM, dtype=np.float32)
+    dlat, dlon = pixel_steps(lats, lons)
+    mean_lat = float(np.mean(lats))
+    sampling = (dlat * KM_PER_DEGREE, dlon * KM_PER_DEGREE * np.cos(np.radians(mean_lat)))
+    return ndimage.distance_transform_edt(~cropland, sampling=sampling).astype(np.float32)
+
+def food_distance_km(rasters: Dict[str, np.ndarray], bounds: Dict[str, float]) -> Optional[np.ndarray]:
+    """
+    Distance-to-cropland raster aligned with a cube's NTL window (north-up), or
+    None when the cube has no aligned land cover. ``lc_aligned`` may extend past
+    the NTL window by the same number of pixels on every side.
+    """
+    lc = rasters.get("lc_aligned")
+    ntl = rasters.get("ntl")
+    if lc is None or ntl is None:
+        return None
+    pad = (lc.shape[0] - ntl.shape[0]) // 2
+    lats, lons = pixel_coords(rasters, bounds)
+
+    digest = hashlib.sha1(np.ascontiguousarray(lc).tobytes()).hexdigest()
+    key = (digest, lc.shape, pad, round(float(lats[0]), 6), round(float(lons[0]), 6))
+
+    def compute() -> np.ndarray:
+        distance = cropland_distance_km(np.asarray(lc), extend_coords(lats, pad), extend_coords(lons, pad))
+        if pad > 0:
+            distance = distance[pad:-pad, pad:-pad]
+        return np.ascontiguousarray(distance)
+
+    distance, _ = distance_cache.get_or_create(key, compute)
+    return distance
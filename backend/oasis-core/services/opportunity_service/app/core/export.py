@@ -0,0 +1,204 @@
+"""
+Streaming export of opportunity grids to CSV or GeoParquet.
+
+Rows are produced in row groups straight from the FeatureGrid arrays: each
+group's cell indices, scores and polygon geometries are computed, encoded and
+handed to the caller before the next group is built, so memory stays bounded
+by the row-group size however many cells are exported. GeoParquet geometry is
+WKB packed with a numpy structured dtype; CSV geometry is WKT.
+"""
+import csv
+import importlib.util
+import io
+import json
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .features import (
+    DEFAULT_THRESHOLDS, DEFAULT_WEIGHTS, FeatureGrid, categorize, normalize_weights, validate_thresholds
+)
+
+def pyarrow_available() -> bool:
+    """Whether pyarrow is installed, without importing it (it is only needed for GeoParquet)."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Exported columns in order, with their Arrow types (geometry is appended last)
+EXPORT_COLUMNS = (
+    ("cell_id", "int64"),
+    ("opportunity_score", "float64"),
+    ("category", "string"),
+    ("population_density", "int64"),
+    ("food_access_distance_km", "float64"),
+    ("transport_access_score", "float64"),
+    ("housing_pressure_score", "float64"),
+    ("avg_nighttime_light", "float64"),
+)
+
+# Little-endian WKB Polygon with one closed 5-point ring: 93 bytes per cell
+WKB_POLYGON = np.dtype([
+    ("byte_order", "u1"),
+    ("geometry_type", "<u4"),
+    ("rings", "<u4"),
+    ("points", "<u4"),
+    ("coords", "<f8", (5, 2)),
+])
+
+def export_window(features: FeatureGrid, bbox: Optional[Sequence[float]] = None) -> Optional[Tuple[int, int, int, int]]:
+    if bbox is None:
+        g = features.grid_size
+        return 0, g - 1, 0, g - 1
+    return features.bbox_window(bbox)
+
+def index_chunks(window: Tuple[int, int, int, int], grid_size: int, rows_per_group: int) -> Iterator[np.ndarray]:
+    """Cell indices of a row/col window, row-major, ``rows_per_group`` at a time."""
+    row_min, row_max, col_min, col_max = window
+    width = col_max - col_min + 1
+    total = (row_max - row_min + 1) * width
+    for start in range(0, total, rows_per_group):
+        position = np.arange(start, min(start + rows_per_group, total), dtype=np.int64)
+        yield (row_min + position // width) * grid_size + (col_min + position % width)
+
+def cell_corners(features: FeatureGrid, idx: np.ndarray) -> np.ndarray:
+    """(n, 5, 2) closed counter-clockwise rings of the cells at ``idx``."""
+    lat_step, lon_step = features.steps
+    rows, cols = np.divmod(idx, features.grid_size)
+    min_lon = features.bounds["min_lon"] + cols * lon_step
+    min_lat = features.bounds["min_lat"] + rows * lat_step
+    max_lon, max_lat = min_lon + lon_step, min_lat + lat_step
+    xs = np.column_stack([min_lon, max_lon, max_lon, min_lon, min_lon])
+    ys = np.column_stack([min_lat, min_lat, max_lat, max_lat, min_lat])
+    return np.stack([xs, ys], axis=2)
+
+def polygon_wkb(corners: np.ndarray) -> np.ndarray:
+    records = np.empty(len(corners), dtype=WKB_POLYGON)
+    records["byte_order"] = 1
+    records["geometry_type"] = 3
+    records["rings"] = 1
+    records["points"] = 5
+    records["coords"] = corners
+    return records
+
+def polygon_wkt(corners: np.ndarray) -> list:
+    return [
+        "POLYGON ((" + ", ".join(f"{x:.7f} {y:.7f}" for x, y in ring) + "))"
+        for ring in corners
+    ]
+
+def chunk_columns(features: FeatureGrid, idx: np.ndarray, weights: np.ndarray,
+                  thresholds: Sequence[float]) -> Dict[str, np.ndarray]:
+    """Exported values of the cells at ``idx``, rounded as the API serves them."""
+    scores = features.matrix[idx] @ weights
+    return {
+        "cell_id": idx + 1,
+        "opportunity_score": np.round(scores, 2),
+        "category": categorize(scores, thresholds),
+        "population_density": features.population_density[idx],
+        "food_access_distance_km": np.round(features.food_distance_km[idx], 2),
+        "transport_access_score": np.round(features.transport_score[idx], 2),
+        "housing_pressure_score": np.round(features.housing_pressure[idx], 2),
+        "avg_nighttime_light": np.round(features.avg_nighttime_light[idx], 2),
+    }
+
+def stream_csv(features: FeatureGrid, window, weights: np.ndarray, thresholds: Sequence[float],
+               rows_per_group: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([name for name, _ in EXPORT_COLUMNS] + ["geometry"])
+    if window is not None:
+        for idx in index_chunks(window, features.grid_size, rows_per_group):
+            columns = chunk_columns(features, idx, weights, thresholds)
+            values = [columns[name].tolist() for name, _ in EXPORT_COLUMNS]
+            writer.writerows(zip(*values, polygon_wkt(cell_corners(features, idx))))
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def geoparquet_schema(features: FeatureGrid, window) -> "pa.Schema":
+    import pyarrow as pa
+    fields = [pa.field(name, pa.string() if kind == "string" else getattr(pa, kind)()) for name, kind in EXPORT_COLUMNS]
+    fields.append(pa.field("geometry", pa.binary()))
+    geo = {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Polygon"]}}
+    }
+    if window is not None:
+        row_min, row_max, col_min, col_max = window
+        lat_step, lon_step = features.steps
+        b = features.bounds
+        geo["columns"]["geometry"]["bbox"] = [
+            b["min_lon"] + col_min * lon_step, b["min_lat"] + row_min * lat_step,
+            b["min_lon"] + (col_max + 1) * lon_step, b["min_lat"] + (row_max + 1) * lat_step
+        ]
+    return pa.schema(fields, metadata={b"geo": json.dumps(geo).encode()})
+
+def stream_parquet(features: FeatureGrid, window, weights: np.ndarray, thresholds: Sequence[float],
+                   rows_per_group: int) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = geoparquet_schema(features, window)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        if window is not None:
+            for idx in index_chunks(window, features.grid_size, rows_per_group):
+                columns = chunk_columns(features, idx, weights, thresholds)
+                wkb = polygon_wkb(cell_corners(features, idx))
+                offsets = np.arange(len(idx) + 1, dtype=np.int32) * WKB_POLYGON.itemsize
+                geometry = pa.Array.from_buffers(pa.binary(), len(idx), [None, pa.py_buffer(offsets), pa.py_buffer(wkb.tobytes())])
+                arrays = [pa.array(columns[name], type=schema.field(name).type) for name, _ in EXPORT_COLUMNS]
+                writer.write_table(pa.Table.from_arrays(arrays + [geometry], schema=schema), row_group_size=len(idx))
+                yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def stream_export(features: FeatureGrid, fmt: str = "csv", bbox: Optional[Sequence[float]] = None,
+                  weights: Sequence[float] = DEFAULT_WEIGHTS,
+                  thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+                  rows_per_group: int = 65536) -> Iterator[bytes]:
+    """
+    Encoded export of the grid (cells overlapping ``bbox`` if given), one chunk per
+    row group. Arguments are validated before the first chunk is produced.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and not pyarrow_available():
+        raise ValueError("GeoParquet export requires pyarrow (pip install pyarrow)")
+    if rows_per_group < 1:
+        raise ValueError("rows_per_group must be positive")
+    w = normalize_weights(weights)
+    thresholds = validate_thresholds(thresholds)
+    window = export_window(features, bbox)
+    stream = stream_parquet if fmt == "parquet" else stream_csv
+    return stream(features, window, w, thresholds, rows_per_group)
@@ -0,0 +1,253 @@
+"""
+Per-cell feature matrix for opportunity scoring.
+
+The satellite pipeline produces raw metrics per grid cell once; scoring is then a
+single matrix-vector product over the cached matrix, so re-weighting never touches
+the rasters again.
+"""
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .grid import cell_areas_m2
+
+# Columns of FeatureGrid.matrix, in order
+FEATURE_NAMES = ("food_access", "transport_access", "housing_availability")
+
+# Food Access (30%), Transport Access (35%), Housing Availability (35%)
+DEFAULT_WEIGHTS = (0.30, 0.35, 0.35)
+
+# Scores below the first threshold are "low", below the second "medium", else "high"
+DEFAULT_THRESHOLDS = (0.4, 0.7)
+
+# Distance at which food access drops to zero
+FOOD_DISTANCE_CUTOFF_KM = 8.0
+
+# Road density (m of road per m^2) that maps to a transport score of 1
+ROAD_DENSITY_FULL_SCORE = 0.008
+
+# Additive per-cell totals a FeatureGrid can carry. Every metric is a ratio of these,
+# so a coarser grid whose cells nest exactly is the sum of the finer cells' totals.
+SUM_FIELDS = (
+    "ntl_sum", "ntl_pixels",            # nighttime light radiance
+    "food_sum", "food_pixels",          # distance to cropland (km)
+    "cropland_pixels", "lc_pixels",     # unaligned land cover fallback
+    "road_m", "area_m2",                # clipped road length and cell area
+    "population",                       # people, from the gridded population raster
+)
+
+def normalize_weights(weights: Sequence[float]) -> np.ndarray:
+    """Validate weights and rescale them to sum to 1 so scores stay in [0, 1]."""
+    w = np.asarray(weights, dtype=np.float64)
+    if w.shape != (len(FEATURE_NAMES),):
+        raise ValueError(f"Expected {len(FEATURE_NAMES)} weights ({', '.join(FEATURE_NAMES)}), got {w.shape}")
+    if np.any(w < 0) or not np.all(np.isfinite(w)):
+        raise ValueError("Weights must be finite and non-negative")
+    total = w.sum()
+    if total <= 0:
+        raise ValueError("At least one weight must be positive")
+    return w / total
+
+def validate_thresholds(thresholds: Sequence[float]) -> Tuple[float, float]:
+    low, high = float(thresholds[0]), float(thresholds[1])
+    if not 0.0 <= low <= high <= 1.0:
+        raise ValueError("Thresholds must satisfy 0 <= low <= high <= 1")
+    return low, high
+
+def categorize(scores: np.ndarray, thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> np.ndarray:
+    low, high = thresholds
+    return np.where(scores < low, "low", np.where(scores < high, "medium", "high"))
+
+def metrics_from_sums(sums: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Per-cell metrics from additive totals; fields missing from ``sums`` fall back to
+    the estimates used when a data source is not loaded.
+    """
+    def ratio(numerator: str, denominator: str) -> np.ndarray:
+        den = sums[denominator]
+        return np.divide(sums[numerator], den, out=np.zeros(len(den)), where=den > 0)
+
+    n = len(sums["area_m2"])
+    if "ntl_sum" in sums:
+        avg_ntl = ratio("ntl_sum", "ntl_pixels")
+        housing = np.minimum(1.0, avg_ntl / 100.0)
+    else:
+        avg_ntl = np.zeros(n)
+        housing = np.full(n, 0.5)
+
+    # Urban areas are typically farther from food sources: 3-7 km estimate
+    food = 3.0 + housing * 4.0
+    if "cropland_pixels" in sums:
+        food = FOOD_DISTANCE_CUTOFF_KM * (1 - ratio("cropland_pixels", "lc_pixels"))
+    if "food_sum" in sums:
+        # Block mean of the exact distance-to-cropland raster
+        food = np.where(sums["food_pixels"] > 0, ratio("food_sum", "food_pixels"), food)
+
+    if "road_m" in sums:
+        transport = np.minimum(1.0, ratio("road_m", "area_m2") / ROAD_DENSITY_FULL_SCORE)
+    else:
+        # Higher infrastructure = better transport
+        transport = 0.5 + housing * 0.4
+
+    if "population" in sums:
+        # People per km²
+        density = np.round(ratio("population", "area_m2") * 1e6)
+    else:
+        # Placeholder density scaled from housing pressure
+        density = 15000 + housing * 15000
+
+    return {
+        "housing_pressure": np.round(housing, 3),
+        "food_distance_km": np.round(food, 2),
+        "transport_score": np.round(transport, 3),
+        "avg_nighttime_light": np.round(avg_ntl, 2),
+        "population_density": density.astype(np.int64)
+    }
+
+def rollup_sums(sums: Dict[str, np.ndarray], grid_size: int, target_size: int) -> Dict[str, np.ndarray]:
+    """Totals of a ``grid_size`` grid summed into the ``target_size`` grid it nests in."""
+    if target_size > grid_size or grid_size % target_size:
+        raise ValueError(f"A {grid_size}x{grid_size} grid does not nest in {target_size}x{target_size}")
+    k = grid_size // target_size
+    return {
+        name: values.reshape(target_size, k, target_size, k).sum(axis=(1, 3)).ravel()
+        for name, values in sums.items()
+    }
+
+class FeatureGrid:
+    """
+    Raw per-cell metrics for one (bounds, grid_size) plus the contiguous feature matrix.
+
+    Cells are stored row-major from the south-west corner, so index ``k`` is
+    ``cell_id - 1`` and lies in grid row ``k // grid_size``, column ``k % grid_size``.
+    """
+
+    def __init__(self, bounds: dict, grid_size: int,
+                 housing_pressure: np.ndarray,
+                 food_distance_km: np.ndarray,
+                 transport_score: np.ndarray,
+                 population_density: np.ndarray,
+                 avg_nighttime_light: np.ndarray,
+                 sources: Optional[Dict] = None,
+                 sums: Optional[Dict[str, np.ndarray]] = None,
+                 derived_from: Optional[int] = None,
+                 matrix: Optional[np.ndarray] = None):
+        self.bounds = dict(bounds)
+        self.grid_size = grid_size
+        self.housing_pressure = np.asarray(housing_pressure, dtype=np.float64)
+        self.food_distance_km = np.asarray(food_distance_km, dtype=np.float64)
+        self.transport_score = np.asarray(transport_score, dtype=np.float64)
+        self.population_density = np.asarray(population_density, dtype=np.int64)
+        self.avg_nighttime_light = np.asarray(avg_nighttime_light, dtype=np.float64)
+        self.sources = dict(sources or {})
+        self.sums = sums
+        # Grid size this grid was rolled up from, None if computed from the rasters
+        self.derived_from = derived_from
+
+        if matrix is not None:
+            # Precomputed (e.g. memory-mapped from a bake bundle)
+            self.matrix = matrix
+            return
+        food_access = np.maximum(0.0, 1.0 - self.food_distance_km / FOOD_DISTANCE_CUTOFF_KM)
+        self.matrix = np.ascontiguousarray(
+            np.column_stack([food_access, self.transport_score, 1.0 - self.housing_pressure])
+        )
+
+    @classmethod
+    def from_sums(cls, bounds: dict, grid_size: int, sums: Dict[str, np.ndarray],
+                  sources: Optional[Dict] = None, derived_from: Optional[int] = None) -> "FeatureGrid":
+        metrics = metrics_from_sums(sums)
+        return cls(
+            bounds, grid_size,
+            housing_pressure=metrics["housing_pressure"],
+            food_distance_km=metrics["food_distance_km"],
+            transport_score=metrics["transport_score"],
+            population_density=metrics["population_density"],
+            avg_nighttime_light=metrics["avg_nighttime_light"],
+            sources=sources,
+            sums=sums,
+            derived_from=derived_from
+        )
+
+    def rollup(self, grid_size: int) -> "FeatureGrid":
+        """Coarser grid whose cells are exact unions of this grid's cells, from the carried totals."""
+        if self.sums is None:
+            raise ValueError("Feature grid carries no per-cell totals to roll up")
+        sums = rollup_sums(self.sums, self.grid_size, grid_size)
+        return FeatureGrid.from_sums(self.bounds, grid_size, sums, self.sources, derived_from=self.grid_size)
+
+    @property
+    def n_cells(self) -> int:
+        return self.grid_size * self.grid_size
+
+    @property
+    def cell_ids(self) -> np.ndarray:
+        return np.arange(1, self.n_cells + 1)
+
+    @property
+    def population(self) -> np.ndarray:
+        """People per cell: the raster totals when loaded, else density times cell area."""
+        if self.sums is not None and "population" in self.sums:
+            return self.sums["population"]
+        return self.population_density * cell_areas_m2(self.bounds, self.grid_size) / 1e6
+
+    @property
+    def nbytes(self) -> int:
+        total = sum(a.nbytes for a in (
+            self.housing_pressure, self.food_distance_km, self.transport_score,
+            self.population_density, self.avg_nighttime_light, self.matrix
+        ))
+        return total + sum(a.nbytes for a in (self.sums or {}).values())
+
+    @property
+    def steps(self) -> Tuple[float, float]:
+        lat_step = (self.bounds["max_lat"] - self.bounds["min_lat"]) / self.grid_size
+        lon_step = (self.bounds["max_lon"] - self.bounds["min_lon"]) / self.grid_size
+        return lat_step, lon_step
+
+    def cell_bounds(self, index: int) -> Tuple[float, float, float, float]:
+        """(min_lon, min_lat, max_lon, max_lat) of the cell at ``index``."""
+        lat_step, lon_step = self.steps
+        i, j = divmod(index, self.grid_size)
+        min_lat = self.bounds["min_lat"] + (i * lat_step)
+        min_lon = self.bounds["min_lon"] + (j * lon_step)
+        return min_lon, min_lat, min_lon + lon_step, min_lat + lat_step
+
+    def bbox_window(self, bbox: Sequence[float]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Inclusive (row_min, row_max, col_min, col_max) of cells overlapping ``bbox``
+        given as (min_lon, min_lat, max_lon, max_lat); None if it misses the grid.
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        lat_step, lon_step = self.steps
+        g = self.grid_size
+        # Cells that only touch the bbox edge are excluded; eps absorbs float round-off
+        eps = 1e-9
+        row_min = int(np.floor((min_lat - self.bounds["min_lat"]) / lat_step + eps))
+        row_max = int(np.ceil((max_lat - self.bounds["min_lat"]) / lat_step - eps)) - 1
+        col_min = int(np.floor((min_lon - self.bounds["min_lon"]) / lon_step + eps))
+        col_max = int(np.ceil((max_lon - self.bounds["min_lon"]) / lon_step - eps)) - 1
+        # A zero-width bbox (a point) still selects the cell containing it
+        row_max, col_max = max(row_max, row_min), max(col_max, col_min)
+        row_min, col_min = max(row_min, 0), max(col_min, 0)
+        row_max, col_max = min(row_max, g - 1), min(col_max, g - 1)
+        if row_min > row_max or col_min > col_max:
+            return None
+        return row_min, row_max, col_min, col_max
+
+    def cells_in_bbox(self, bbox: Sequence[float]) -> np.ndarray:
+        """Indices (cell_id - 1) of cells overlapping ``bbox``, in row-major order."""
+        window = self.bbox_window(bbox)
+        if window is None:
+            return np.empty(0, dtype=np.int64)
+        row_min, row_max, col_min, col_max = window
+        rows = np.arange(row_min, row_max + 1)
+        cols = np.arange(col_min, col_max + 1)
+        return (rows[:, None] * self.grid_size + cols[None, :]).ravel()
+
+    def score(self, weights: Sequence[float] = DEFAULT_WEIGHTS) -> np.ndarray:
+        return self.matrix @ np.asarray(weights, dtype=np.float64)
+
+    def score_batch(self, weight_matrix: np.ndarray) -> np.ndarray:
+        """Scores under K weight vectors at once: (cells x 3) @ (3 x K) -> (cells x K)."""
+        return self.matrix @ np.asarray(weight_matrix, dtype=np.float64).T
@@ -0,0 +1,243 @@
+"""
+Gravity-model access to amenities from a local OpenStreetMap extract.
+
+Every amenity within ``amenity_radius_km`` of a cell centroid contributes its
+weight times ``exp(-d / amenity_decay_km)``, so a cell's gravity counts all the
+shops or stops within reach, nearer ones more. Access is gravity relative to
+``amenity_full_access`` (capped at 1): one supermarket next door or several
+small shops a kilometre away can both give full access.
+
+Amenities and centroids are placed on a sphere of the Earth's radius in 3-D,
+where straight-line (chord) distance is within a metre of the great-circle
+distance at city scale, so one KD-tree per amenity kind serves every city in
+the extract. Neighbour pairs come from bounded-radius tree-vs-tree queries
+against chunks of centroids; gravity is a ``bincount`` over the pairs.
+
+Access replaces ``food_distance_km`` (as the distance giving the same food
+access score) and/or ``transport_score`` of a feature grid, per
+``settings.amenity_replaces``. Results are cached per amenity version.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .accessibility import cell_centroids
+from .cache import LRUCache
+from .config import settings
+from .features import FOOD_DISTANCE_CUTOFF_KM, FeatureGrid
+from .grid import KM_PER_DEGREE
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = KM_PER_DEGREE * 180 / np.pi
+
+# OSM tag -> (amenity kind, default weight); the first matching tag of a feature wins
+AMENITY_TAGS = {
+    ("amenity", "marketplace"): ("food", 3.0),
+    ("shop", "supermarket"): ("food", 3.0),
+    ("shop", "greengrocer"): ("food", 1.0),
+    ("shop", "grocery"): ("food", 1.0),
+    ("shop", "convenience"): ("food", 1.0),
+    ("shop", "general"): ("food", 1.0),
+    ("shop", "butcher"): ("food", 1.0),
+    ("shop", "bakery"): ("food", 0.5),
+    ("railway", "station"): ("transport", 5.0),
+    ("amenity", "bus_station"): ("transport", 3.0),
+    ("amenity", "ferry_terminal"): ("transport", 2.0),
+    ("railway", "halt"): ("transport", 2.0),
+    ("public_transport", "station"): ("transport", 2.0),
+    ("highway", "bus_stop"): ("transport", 1.0),
+}
+AMENITY_KINDS = ("food", "transport")
+
+# Access per grid spec, amenity version, kind and model parameters
+access_cache = LRUCache(settings.amenity_cache_size)
+
+def sphere_xyz(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Points on a sphere of the Earth's radius (km); chord ~ great-circle distance nearby."""
+    lat, lon = np.radians(lats), np.radians(lons)
+    return EARTH_RADIUS_KM * np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def classify(tags: Dict) -> Optional[Tuple[str, float]]:
+    """(kind, weight) of an OSM feature from its tags; an explicit ``weight`` tag overrides the default."""
+    if tags.get("kind") in AMENITY_KINDS:
+        match = (tags["kind"], 1.0)
+    else:
+        match = next((AMENITY_TAGS[(key, value)] for key, value in AMENITY_TAGS if tags.get(key) == value), None)
+    if match is None:
+        return None
+    try:
+        return match[0], float(tags.get("weight", match[1]))
+    except (TypeError, ValueError):
+        return match
+
+def _geojson_points(path: str) -> Iterator[Tuple[float, float, Dict]]:
+    with open(path) as f:
+        collection = json.load(f)
+    for feature in collection.get("features", []):
+        geometry = feature.get("geometry") or {}
+        props = feature.get("properties") or {}
+        # Overpass exports nest the OSM tags; plain exports keep them flat
+        tags = {**props, **props.get("tags", {})} if isinstance(props.get("tags"), dict) else props
+        coords = np.asarray(_flatten(geometry.get("coordinates", [])), dtype=np.float64).reshape(-1, 2)
+        if len(coords) == 0:
+            continue
+        # Shops and markets mapped as areas count at the mean of their vertices
+        lon, lat = coords.mean(axis=0)
+        yield float(lat), float(lon), tags
+
+def _flatten(coords) -> list:
+    if coords and isinstance(coords[0], (int, float)):
+        return list(coords[:2])
+    return [x for c in coords for x in _flatten(c)]
+
+def _csv_points(path: str) -> Iterator[Tuple[float, float, Dict]]:
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield float(row["lat"]), float(row["lon"]), row
+
+class AmenitySet:
+    """Weighted amenity points per kind, each with a KD-tree built once on first use."""
+
+    def __init__(self, points: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]], version: str, source: str):
+        self.points = points
+        self.version = version
+        self.source = source
+        self._trees: Dict[str, object] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> "AmenitySet":
+        """Read a GeoJSON export of OSM features (Overpass or ogr2ogr) or a CSV of lat,lon,kind[,weight]."""
+        with open(path, "rb") as f:
+            version = hashlib.sha1(f.read()).hexdigest()[:16]
+        reader = _csv_points if path.lower().endswith(".csv") else _geojson_points
+        rows = {kind: [] for kind in AMENITY_KINDS}
+        for lat, lon, tags in reader(path):
+            match = classify(tags)
+            if match is not None and match[1] > 0:
+                rows[match[0]].append((lat, lon, match[1]))
+        points = {
+            kind: tuple(np.array(column, dtype=np.float64) for column in zip(*values))
+            for kind, values in rows.items() if values
+        }
+        return cls(points, version, os.path.basename(path))
+
+    def count(self, kind: str) -> int:
+        return len(self.points[kind][0]) if kind in self.points else 0
+
+    def tree(self, kind: str):
+        if kind not in self._trees:
+            from scipy.spatial import cKDTree
+            lats, lons, _ = self.points[kind]
+            self._trees[kind] = cKDTree(sphere_xyz(lats, lons))
+        return self._trees[kind]
+
+    def gravity(self, kind: str, lats: np.ndarray, lons: np.ndarray,
+                radius_km: float, decay_km: float, chunk_size: int = 4096) -> np.ndarray:
+        """Sum of weight * exp(-d / decay_km) over the amenities within ``radius_km`` of each point."""
+        from scipy.spatial import cKDTree
+        out = np.zeros(len(lats), dtype=np.float64)
+        if self.count(kind) == 0:
+            return out
+        weights = self.points[kind][2]
+        tree = self.tree(kind)
+        # A chord is shorter than its arc, so the radius as a chord keeps every pair in reach
+        chord = 2 * EARTH_RADIUS_KM * np.sin(min(radius_km / (2 * EARTH_RADIUS_KM), np.pi / 2))
+        xyz = sphere_xyz(lats, lons)
+        # Points in chunks bound the (point, amenity) pairs held at once
+        for start in range(0, len(xyz), chunk_size):
+            pairs = cKDTree(xyz[start:start + chunk_size]).sparse_distance_matrix(tree, chord, output_type="ndarray")
+            arc = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(pairs["v"] / (2 * EARTH_RADIUS_KM), 1.0))
+            keep = arc <= radius_km
+            out[start:start + chunk_size] = np.bincount(
+                pairs["i"][keep], weights=weights[pairs["j"][keep]] * np.exp(-arc[keep] / decay_km),
+                minlength=min(chunk_size, len(xyz) - start)
+            )
+        return out
+
+@lru_cache(maxsize=4)
+def _load(path: str, mtime_ns: int, size: int) -> AmenitySet:
+    amenities = AmenitySet.from_file(path)
+    logger.info(f"Amenities from {path} (version {amenities.version}): "
+                + ", ".join(f"{amenities.count(kind)} {kind}" for kind in AMENITY_KINDS))
+    return amenities
+
+def get_amenities(path: Optional[str] = None) -> Optional[AmenitySet]:
+    """The configured amenity extract, re-read when the file changes; None when none is configured."""
+    path = settings.amenities_file if path is None else path
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return _load(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def amenity_access(amenities: AmenitySet, kind: str, features: FeatureGrid,
+                   radius_km: Optional[float] = None, decay_km: Optional[float] = None,
+                   full_access: Optional[float] = None) -> Tuple[Dict, bool]:
+    """Gravity and access (0-1) of every cell to ``kind`` amenities, and whether it was cached."""
+    radius_km = settings.amenity_radius_km if radius_km is None else radius_km
+    decay_km = settings.amenity_decay_km if decay_km is None else decay_km
+    full_access = settings.amenity_full_access if full_access is None else full_access
+    if kind not in AMENITY_KINDS:
+        raise ValueError(f"Unknown amenity kind '{kind}'. Use one of: {', '.join(AMENITY_KINDS)}")
+    if radius_km <= 0 or decay_km <= 0 or full_access <= 0:
+        raise ValueError("Amenity radius, decay and full-access gravity must be positive")
+
+    b = features.bounds
+    key = (amenities.version, kind, b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"],
+           features.grid_size, radius_km, decay_km, full_access)
+
+    def compute() -> Dict:
+        start = time.perf_counter()
+        lats, lons = cell_centroids(features)
+        gravity = amenities.gravity(kind, lats, lons, radius_km, decay_km, settings.amenity_chunk_size)
+        return {
+            "gravity": gravity,
+            "access": np.minimum(1.0, gravity / full_access),
+            "compute_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    return access_cache.get_or_create(key, compute)
+
+def with_amenity_access(features: FeatureGrid, amenities: Optional[AmenitySet] = None) -> FeatureGrid:
+    """
+    ``features`` with food distance and/or transport score (``settings.amenity_replaces``)
+    taken from amenity access; unchanged when no extract is configured or it has
+    no amenities of a kind.
+    """
+    amenities = get_amenities() if amenities is None else amenities
+    if amenities is None:
+        return features
+    food, transport = features.food_distance_km, features.transport_score
+    sources = dict(features.sources)
+    for kind in settings.amenity_replaces:
+        if amenities.count(kind) == 0:
+            logger.warning(f"No {kind} amenities in {amenities.source}; keeping the {kind} estimate")
+            continue
+        access = amenity_access(amenities, kind, features)[0]["access"]
+        if kind == "food":
+            # The distance at which the cropland-based score would give the same food access
+            food = np.round(FOOD_DISTANCE_CUTOFF_KM * (1.0 - access), 2)
+        else:
+            transport = np.round(access, 3)
+        sources[f"{kind}_source"] = "osm_amenities"
+        sources["amenity_version"] = amenities.version
+    if food is features.food_distance_km and transport is features.transport_score:
+        return features
+    return FeatureGrid(
+        features.bounds, features.grid_size,
+        housing_pressure=features.housing_pressure,
+        food_distance_km=food,
+        transport_score=transport,
+        population_density=features.population_density,
+        avg_nighttime_light=features.avg_nighttime_light,
+        sources=sources,
+        sums=features.sums,
+        derived_from=features.derived_from
+    )
@@ -0,0 +1,79 @@
+"""
+Shared helpers for the NTL pixel grid of a city cube and its partition into cells.
+
+Cube rasters are stored north-up (row 0 is the northernmost pixel row) while
+opportunity cells are numbered from the south-west corner, so every cell
+aggregation flips the rows first.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+KM_PER_DEGREE = 111.32
+M_PER_DEGREE = KM_PER_DEGREE * 1000
+
+def pixel_coords(rasters: Dict[str, np.ndarray], bounds: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pixel-center latitudes/longitudes of a cube's NTL window."""
+    lats = rasters.get("ntl_lat")
+    lons = rasters.get("ntl_lon")
+    if lats is not None and lons is not None:
+        return np.asarray(lats), np.asarray(lons)
+    # Older cubes without coordinates: assume the window spans the city bounds, north-up
+    b = bounds
+    h, w = rasters["ntl"].shape
+    dlat = (b["max_lat"] - b["min_lat"]) / h
+    dlon = (b["max_lon"] - b["min_lon"]) / w
+    return b["max_lat"] - (np.arange(h) + 0.5) * dlat, b["min_lon"] + (np.arange(w) + 0.5) * dlon
+
+def pixel_steps(lats: np.ndarray, lons: np.ndarray) -> Tuple[float, float]:
+    """Absolute pixel size in degrees (lat, lon)."""
+    dlat = abs(float(lats[-1] - lats[0])) / (len(lats) - 1) if len(lats) > 1 else 1 / 240
+    dlon = abs(float(lons[-1] - lons[0])) / (len(lons) - 1) if len(lons) > 1 else 1 / 240
+    return dlat, dlon
+
+def extend_coords(coords: np.ndarray, pad: int) -> np.ndarray:
+    """Continue an evenly spaced coordinate vector by ``pad`` samples on both ends."""
+    if pad <= 0:
+        return np.asarray(coords)
+    step = (coords[-1] - coords[0]) / (len(coords) - 1) if len(coords) > 1 else 1 / 240
+    return coords[0] + np.arange(-pad, len(coords) + pad) * step
+
+def south_up(array: np.ndarray, lats: np.ndarray = None) -> np.ndarray:
+    """View of a raster with row 0 at the south, given its pixel-center latitudes."""
+    if lats is None or len(lats) < 2 or lats[0] > lats[-1]:
+        return array[::-1]
+    return array
+
+def axis_edges(n: int, grid_size: int) -> np.ndarray:
+    """First pixel of every cell along one axis of ``n`` pixels, plus ``n``."""
+    return (np.arange(grid_size + 1) * n / grid_size).astype(np.int64)
+
+def axis_cells(n: int, grid_size: int) -> np.ndarray:
+    """Cell row (or column) of every pixel along one axis of ``n`` pixels."""
+    return np.searchsorted(axis_edges(n, grid_size), np.arange(n), side="right") - 1
+
+def cell_index(shape: Tuple[int, int], grid_size: int) -> np.ndarray:
+    """
+    Cell index (cell_id - 1) of every pixel of a south-up raster.
+
+    Pixel rows/cols are split at ``int(i * rows / grid_size)``, the same partition
+    the per-cell slicing has always used.
+    """
+    rows, cols = shape
+    return axis_cells(rows, grid_size)[:, None] * grid_size + axis_cells(cols, grid_size)[None, :]
+
+def block_sums(values: np.ndarray, grid_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-cell (sum, pixel count) of a south-up raster, in cell-id order."""
+    labels = cell_index(values.shape, grid_size).ravel()
+    n_cells = grid_size * grid_size
+    sums = np.bincount(labels, weights=np.asarray(values, dtype=np.float64).ravel(), minlength=n_cells)
+    counts = np.bincount(labels, minlength=n_cells)
+    return sums, counts
+
+def cell_areas_m2(bounds: Dict[str, float], grid_size: int) -> np.ndarray:
+    """Area of every opportunity cell in cell-id order (equirectangular at the row's centre)."""
+    lat_step = (bounds["max_lat"] - bounds["min_lat"]) / grid_size
+    lon_step = (bounds["max_lon"] - bounds["min_lon"]) / grid_size
+    center_lat = bounds["min_lat"] + (np.arange(grid_size) + 0.5) * lat_step
+    row_area = (lat_step * M_PER_DEGREE) * (lon_step * M_PER_DEGREE * np.cos(np.radians(center_lat)))
+    return np.repeat(row_area, grid_size)
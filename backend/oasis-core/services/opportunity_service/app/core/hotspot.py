@@ -0,0 +1,143 @@
+"""
+Getis-Ord Gi* hotspot analysis over opportunity cells.
+
+Spatial weights (queen, rook or distance band, each cell counting itself as Gi*
+requires) are built once per grid spec as a sparse binary matrix and cached
+together with their row sums. A Gi* pass for any metric is then one sparse
+matrix-vector product plus a few whole-array operations.
+"""
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+
+from .cache import LRUCache
+from .config import settings
+from .features import FeatureGrid
+from .grid import KM_PER_DEGREE
+from .index import INDEXED_METRICS, metric_columns
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+WEIGHT_SCHEMES = ("queen", "rook", "distance")
+
+# |z| needed for 90/95/99% confidence; the bin is the sign times the highest level reached
+CONFIDENCE_Z = ((0.90, 1.645), (0.95, 1.960), (0.99, 2.576))
+
+# Weights keyed by grid spec and scheme
+weights_cache = LRUCache(settings.hotspot_weights_cache_size)
+
+class SpatialWeights:
+    """Binary sparse weights including the diagonal, with Gi* denominators precomputed."""
+
+    def __init__(self, matrix: "csr_matrix", scheme: str):
+        self.matrix = matrix
+        self.scheme = scheme
+        n = matrix.shape[0]
+        # Binary weights: sum of w_ij equals sum of w_ij^2
+        self.row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+        self.variance_factor = np.sqrt(np.maximum(n * self.row_sums - self.row_sums ** 2, 0.0) / max(n - 1, 1))
+
+    @property
+    def nbytes(self) -> int:
+        m = self.matrix
+        return m.data.nbytes + m.indices.nbytes + m.indptr.nbytes + self.row_sums.nbytes + self.variance_factor.nbytes
+
+    @property
+    def mean_neighbors(self) -> float:
+        return float(self.row_sums.mean() - 1)
+
+def contiguity_weights(grid_size: int, queen: bool = True) -> "csr_matrix":
+    """Rook (shared edge) or queen (shared edge or corner) adjacency of a square grid, plus self."""
+    from scipy.sparse import coo_matrix
+    g = grid_size
+    rows, cols = np.divmod(np.arange(g * g), g)
+    offsets = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if queen or dr == 0 or dc == 0]
+    src, dst = [], []
+    for dr, dc in offsets:
+        r, c = rows + dr, cols + dc
+        valid = (r >= 0) & (r < g) & (c >= 0) & (c < g)
+        src.append(np.nonzero(valid)[0])
+        dst.append(r[valid] * g + c[valid])
+    src, dst = np.concatenate(src), np.concatenate(dst)
+    return coo_matrix((np.ones(len(src)), (src, dst)), shape=(g * g, g * g)).tocsr()
+
+def distance_band_weights(features: FeatureGrid, band_km: float) -> "csr_matrix":
+    """Cells whose centroids lie within ``band_km`` of each other (including self)."""
+    from scipy.sparse import coo_matrix
+    from scipy.spatial import cKDTree
+    lat_step, lon_step = features.steps
+    g = features.grid_size
+    rows, cols = np.divmod(np.arange(g * g), g)
+    mid_lat = (features.bounds["min_lat"] + features.bounds["max_lat"]) / 2
+    xy = np.column_stack([
+        (cols + 0.5) * lon_step * KM_PER_DEGREE * np.cos(np.radians(mid_lat)),
+        (rows + 0.5) * lat_step * KM_PER_DEGREE
+    ])
+    pairs = cKDTree(xy).query_pairs(band_km, output_type="ndarray")
+    n = g * g
+    src = np.concatenate([pairs[:, 0], pairs[:, 1], np.arange(n)])
+    dst = np.concatenate([pairs[:, 1], pairs[:, 0], np.arange(n)])
+    return coo_matrix((np.ones(len(src)), (src, dst)), shape=(n, n)).tocsr()
+
+def get_weights(features: FeatureGrid, scheme: str = "queen", band_km: Optional[float] = None) -> Tuple[SpatialWeights, bool]:
+    """Cached spatial weights for the grid; the flag tells whether they were a cache hit."""
+    if scheme not in WEIGHT_SCHEMES:
+        raise ValueError(f"Unknown weights '{scheme}'. Use one of: {', '.join(WEIGHT_SCHEMES)}")
+    b = features.bounds
+    if scheme == "distance":
+        if band_km is None or band_km <= 0:
+            raise ValueError("Distance-band weights need a positive band_km")
+        key = (b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"], features.grid_size, scheme, round(band_km, 6))
+        return weights_cache.get_or_create(key, lambda: SpatialWeights(distance_band_weights(features, band_km), scheme))
+    # Contiguity depends only on the grid shape
+    key = (features.grid_size, scheme)
+    return weights_cache.get_or_create(
+        key, lambda: SpatialWeights(contiguity_weights(features.grid_size, scheme == "queen"), scheme)
+    )
+
+def gi_star(values: np.ndarray, weights: SpatialWeights) -> np.ndarray:
+    """Gi* z-score of every cell (0 where the metric has no variance)."""
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    mean = x.mean()
+    s = np.sqrt(max((x ** 2).mean() - mean ** 2, 0.0))
+    denominator = s * weights.variance_factor
+    numerator = weights.matrix @ x - mean * weights.row_sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(denominator > 0, numerator / denominator, 0.0)
+    return z if n > 1 else np.zeros(n)
+
+def confidence_bins(z: np.ndarray) -> np.ndarray:
+    """-3..3: cold/hot spot at 99/95/90% confidence, 0 = not significant."""
+    level = np.zeros(len(z), dtype=np.int8)
+    for k, (_, threshold) in enumerate(CONFIDENCE_Z, start=1):
+        level[np.abs(z) >= threshold] = k
+    return np.sign(z).astype(np.int8) * level
+
+def hotspots(features: FeatureGrid, metric: str = "opportunity_score", scheme: str = "queen",
+             band_km: Optional[float] = None, confidence: float = 0.95) -> Dict:
+    columns = metric_columns(features)
+    if metric not in columns:
+        raise ValueError(f"Unknown metric '{metric}'. Available: {', '.join(INDEXED_METRICS)}")
+    levels = {c: k for k, (c, _) in enumerate(CONFIDENCE_Z, start=1)}
+    if confidence not in levels:
+        raise ValueError(f"Confidence must be one of: {', '.join(str(c) for c in levels)}")
+
+    start = time.perf_counter()
+    weights, cached = get_weights(features, scheme, band_km)
+    z = gi_star(columns[metric], weights)
+    from scipy.special import ndtr
+    p = 2 * ndtr(-np.abs(z))
+    bins = confidence_bins(z)
+    level = levels[confidence]
+    return {
+        "z": z,
+        "p": p,
+        "bins": bins,
+        "hot": np.nonzero(bins >= level)[0],
+        "cold": np.nonzero(bins <= -level)[0],
+        "weights": {"scheme": scheme, "band_km": band_km, "mean_neighbors": round(weights.mean_neighbors, 2), "cached": cached},
+        "compute_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
@@ -0,0 +1,102 @@
+"""
+In-process import-time profile, the per-module numbers of ``python -X importtime``.
+
+While started, a finder at the front of ``sys.meta_path`` wraps the loader of
+every module imported for the first time and times its execution. Nested
+imports run inside their importer's execution, so each module gets a
+cumulative time (itself plus everything it imported first) and a self time.
+The real loader is restored on the module before it executes, so nothing
+imported under the profiler keeps a trace of it.
+
+This module must stay free of heavy imports itself: it is imported first.
+"""
+import sys
+import time
+from importlib.abc import MetaPathFinder
+from typing import Dict, List, Optional
+
+class _TimedLoader:
+    """Delegates to a module's real loader, timing ``exec_module``."""
+
+    def __init__(self, loader, name: str, profiler: "ImportProfiler"):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        self._profiler._enter()
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(self._name, time.perf_counter() - start)
+
+class ImportProfiler(MetaPathFinder):
+    def __init__(self):
+        # module -> (cumulative seconds, self seconds)
+        self.timings: Dict[str, tuple] = {}
+        self.total_s = 0.0
+        self._children: List[float] = []
+        self._started: Optional[float] = None
+        self._resolving = False
+
+    def start(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+            self._started = time.perf_counter()
+
+    def stop(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+            self.total_s += time.perf_counter() - self._started
+
+    def find_spec(self, name, path, target=None):
+        if self._resolving:
+            return None
+        # Let the remaining finders resolve the module, then wrap whatever loader they chose
+        self._resolving = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._resolving = False
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(spec.loader, name, self)
+        return spec
+
+    def _enter(self):
+        self._children.append(0.0)
+
+    def _exit(self, name: str, elapsed: float):
+        children = self._children.pop()
+        self.timings[name] = (elapsed, max(elapsed - children, 0.0))
+        if self._children:
+            self._children[-1] += elapsed
+
+    def report(self, top: int = 10, prefix: Optional[str] = None) -> List[Dict]:
+        """Slowest modules by cumulative time (ms), optionally only those under ``prefix``."""
+        rows = [
+            {"module": name, "cumulative_ms": round(cum * 1000, 1), "self_ms": round(own * 1000, 1)}
+            for name, (cum, own) in self.timings.items()
+            if prefix is None or name == prefix or name.startswith(prefix + ".")
+        ]
+        rows.sort(key=lambda r: -r["cumulative_ms"])
+        return rows[:top]
+
+import_profiler = ImportProfiler()
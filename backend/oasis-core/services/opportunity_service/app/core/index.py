@@ -0,0 +1,109 @@
+"""
+Presorted indexes over per-cell opportunity metrics.
+
+Each indexed metric keeps its cell order (argsort) and the values in that order,
+so bounded top-k and threshold-range queries are binary searches plus a slice
+instead of a scan over the whole grid.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .features import FeatureGrid, DEFAULT_WEIGHTS
+
+# Metric name (as exposed in the GeoJSON properties) -> FeatureGrid column
+INDEXED_METRICS = (
+    "opportunity_score",
+    "housing_pressure_score",
+    "transport_access_score",
+    "food_access_distance_km",
+)
+
+def metric_columns(features: FeatureGrid) -> Dict[str, np.ndarray]:
+    return {
+        "opportunity_score": features.score(DEFAULT_WEIGHTS),
+        "housing_pressure_score": features.housing_pressure,
+        "transport_access_score": features.transport_score,
+        "food_access_distance_km": features.food_distance_km,
+    }
+
+class MetricIndex:
+    def __init__(self, features: FeatureGrid):
+        self.features = features
+        self.values = metric_columns(features)
+        dtype = np.int32 if features.n_cells < 2 ** 31 else np.int64
+        self.order: Dict[str, np.ndarray] = {}
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        for name, column in self.values.items():
+            order = np.argsort(column, kind="stable").astype(dtype)
+            self.order[name] = order
+            self.sorted_values[name] = column[order]
+
+    @classmethod
+    def from_arrays(cls, features: FeatureGrid, order: Dict[str, np.ndarray],
+                    sorted_values: Dict[str, np.ndarray]) -> "MetricIndex":
+        """Index over ``features`` from previously computed sort orders, without re-sorting."""
+        index = cls.__new__(cls)
+        index.features = features
+        index.values = metric_columns(features)
+        index.order = dict(order)
+        index.sorted_values = dict(sorted_values)
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.order.values()) + \
+            sum(a.nbytes for a in self.sorted_values.values()) + \
+            self.values["opportunity_score"].nbytes
+
+    def query(self, metric: str, k: int = 10, descending: bool = False,
+              min_value: Optional[float] = None, max_value: Optional[float] = None,
+              bbox: Optional[Sequence[float]] = None) -> Dict:
+        """
+        Up to ``k`` cells ordered by ``metric`` with ``min_value <= value <= max_value``,
+        optionally restricted to cells overlapping ``bbox``.
+        """
+        if metric not in self.order:
+            raise ValueError(f"Unknown metric '{metric}'. Indexed metrics: {', '.join(INDEXED_METRICS)}")
+        
+        sorted_values = self.sorted_values[metric]
+        lo = 0 if min_value is None else int(np.searchsorted(sorted_values, min_value, side="left"))
+        hi = len(sorted_values) if max_value is None else int(np.searchsorted(sorted_values, max_value, side="right"))
+        in_range = max(hi - lo, 0)
+        
+        if bbox is None:
+            positions = np.arange(hi - 1, hi - 1 - min(k, in_range), -1) if descending else np.arange(lo, lo + min(k, in_range))
+            return {"indices": self.order[metric][positions], "matched": in_range}
+        
+        window_cells = self.features.cells_in_bbox(bbox)
+        if len(window_cells) <= in_range:
+            # Small bbox: rank only the cells inside it
+            values = self.values[metric][window_cells]
+            mask = np.ones(len(window_cells), dtype=bool)
+            if min_value is not None:
+                mask &= values >= min_value
+            if max_value is not None:
+                mask &= values <= max_value
+            candidates, values = window_cells[mask], values[mask]
+            order = np.argsort(-values if descending else values, kind="stable")[:k]
+            return {"indices": candidates[order], "matched": int(mask.sum())}
+        
+        # Large bbox: filter the presorted range by position, which keeps it in order
+        row_min, row_max, col_min, col_max = self.features.bbox_window(bbox)
+        ordered = self.order[metric][lo:hi]
+        if descending:
+            ordered = ordered[::-1]
+        rows, cols = np.divmod(ordered, self.features.grid_size)
+        inside = (rows >= row_min) & (rows <= row_max) & (cols >= col_min) & (cols <= col_max)
+        return {"indices": ordered[inside][:k], "matched": int(inside.sum())}
+
+    def records(self, indices: np.ndarray) -> List[Dict]:
+        g = self.features.grid_size
+        records = []
+        for idx in indices.tolist():
+            record = {"cell_id": idx + 1, "row": idx // g, "col": idx % g}
+            for name in INDEXED_METRICS:
+                record[name] = round(float(self.values[name][idx]), 4)
+            record["bounds"] = list(self.features.cell_bounds(idx))
+            records.append(record)
+        return records
@@ -1,28 +1,127 @@
-import h5py
+import importlib.util
 import numpy as np
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Tuple, Optional
 import logging
 
+from .catalog import Granule, GranuleCatalog
+from .chunked import RasterSource, zonal_stats
+from .distance import food_distance_km
+from .features import SUM_FIELDS, metrics_from_sums
+from .grid import KM_PER_DEGREE, block_sums, cell_areas_m2, extend_coords, pixel_steps, south_up
+from .population import get_population
+from .telemetry import stage
+
 logger = logging.getLogger(__name__)
 
-# Try to import OSMnx for transport network analysis
-try:
-    import osmnx as ox
-    import geopandas as gpd
-    from shapely.geometry import box
-    OSMNX_AVAILABLE = True
-except ImportError:
-    OSMNX_AVAILABLE = False
-    logger.warning("OSMnx not available - transport network analysis will use estimates")
+@lru_cache(maxsize=None)
+def osmnx():
+    """
+    The osmnx module, imported on first use: it pulls in geopandas, shapely and
+    networkx, which requests that never touch OSM should not pay for. None if
+    it is not installed.
+    """
+    try:
+        import osmnx as ox
+        return ox
+    except ImportError:
+        logger.warning("OSMnx not available - transport network analysis will use estimates")
+        return None
+
+def osmnx_available() -> bool:
+    """Whether osmnx is installed, without importing it."""
+    return importlib.util.find_spec("osmnx") is not None
+
+# MODIS sinusoidal grid (MCD12Q1 500 m product)
+MODIS_EARTH_RADIUS = 6371007.181
+MODIS_TILE_SIZE_M = 1111950.5197665
+MODIS_TILE_PIXELS = 2400
+MODIS_X_MIN = -20015109.354
+MODIS_Y_MAX = 10007554.677
+
+def modis_sinusoidal_index(lat: np.ndarray, lon: np.ndarray):
+    """(h, v, row, col) of the MODIS 500 m pixel containing each lat/lon."""
+    lat_rad = np.radians(lat)
+    x = MODIS_EARTH_RADIUS * np.radians(lon) * np.cos(lat_rad)
+    y = MODIS_EARTH_RADIUS * lat_rad
+    pixel = MODIS_TILE_SIZE_M / MODIS_TILE_PIXELS
+    gx = (x - MODIS_X_MIN) / pixel
+    gy = (MODIS_Y_MAX - y) / pixel
+    h, col = np.divmod(np.floor(gx).astype(np.int64), MODIS_TILE_PIXELS)
+    v, row = np.divmod(np.floor(gy).astype(np.int64), MODIS_TILE_PIXELS)
+    return h, v, row, col
+
+# Catalog of the granules under data_dir, kept next to them
+CATALOG_FILE = "granule_catalog.json"
+
+def vnp_tile(lat: float, lon: float) -> str:
+    """Black Marble (VNP46) 10-degree tile name containing a point, e.g. h27v06 for Dhaka."""
+    return f"h{int((lon + 180) // 10):02d}v{int((90 - lat) // 10):02d}"
+
+class PackedRaster:
+    """
+    Integer-packed raster window with its scale/offset/fill metadata.
+
+    Physical values are ``data * scale_factor + offset``; fill pixels and negative
+    results count as 0, matching the previous float64 pipeline.
+    """
+
+    def __init__(self, data: np.ndarray, scale_factor: float = 1.0,
+                 offset: float = 0.0, fill_value: float = 65535,
+                 lats: Optional[np.ndarray] = None, lons: Optional[np.ndarray] = None,
+                 source: Optional[str] = None):
+        self.data = data
+        self.scale_factor = scale_factor
+        self.offset = offset
+        self.fill_value = fill_value
+        # Pixel-center coordinates of the window rows/columns, when known
+        self.lats = lats
+        self.lons = lons
+        self.source = source
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.data.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def scaled(self, rows: slice = slice(None), cols: slice = slice(None)) -> np.ndarray:
+        """Materialize physical values for ``data[rows, cols]`` as float32, in place where possible."""
+        raw = self.data[rows, cols]
+        out = np.empty(raw.shape, dtype=np.float32)
+        np.multiply(raw, np.float32(self.scale_factor), out=out, casting='unsafe')
+        if self.offset:
+            out += np.float32(self.offset)
+        out[raw == self.fill_value] = 0.0
+        if raw.dtype.kind == 'f':
+            np.nan_to_num(out, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        np.maximum(out, 0.0, out=out)
+        return out
 
 class NASADataReader:
     def __init__(self, data_dir: str = "../../data"):
         self.data_dir = Path(data_dir)
         self.modis_dir = self.data_dir / "MODIS"
         self.vnp_dir = self.data_dir / "VNP46A3"
-        self._osm_network_cache = None  # Cache for road network
-        self._osm_cache_bounds = None   # Store bounds used for caching
+        self._osm_graph_cache = {}  # Raw OSM drive graph per bounds
+        self._osm_network_cache = {}  # Projected road network per bounds
+        self._road_segment_cache = {}  # Road pieces (midpoint, length) per bounds
+        self._catalog = None
+        self._catalog_dirs = None
+    
+    @property
+    def catalog(self) -> GranuleCatalog:
+        """Granule catalog of the current product directories (rebuilt if they are repointed)."""
+        directories = (self.vnp_dir, self.modis_dir, self.data_dir)
+        if self._catalog is None or self._catalog_dirs != directories:
+            self._catalog = GranuleCatalog({"VNP46A3": self.vnp_dir, "MCD12Q1": self.modis_dir},
+                                           self.data_dir / CATALOG_FILE)
+            self._catalog_dirs = directories
+        return self._catalog
         
     def get_dhaka_bounds_in_tile(self, lat_min: float, lat_max: float, 
                                   lon_min: float, lon_max: float) -> Dict:
@@ -48,339 +147,494 @@ class NASADataReader:
             "col_max": col_max
         }
     
-    def read_nighttime_lights(self, lat_min: float, lat_max: float, 
-                              lon_min: float, lon_max: float) -> Optional[np.ndarray]:
+    # VNP46A3 uses AllAngle_Composite_Snow_Free for tropical regions like Bangladesh
+    NTL_DATASET = 'HDFEOS/GRIDS/VIIRS_Grid_DNB_2d/Data Fields/AllAngle_Composite_Snow_Free'
+    NTL_LAT = 'HDFEOS/GRIDS/VIIRS_Grid_DNB_2d/Data Fields/lat'
+    NTL_LON = 'HDFEOS/GRIDS/VIIRS_Grid_DNB_2d/Data Fields/lon'
+    
+    def _ntl_window(self, f: "h5py.File", lat_min: float, lat_max: float,
+                    lon_min: float, lon_max: float) -> Tuple[Tuple[int, int, int, int], np.ndarray, np.ndarray]:
+        """Stored (row_min, row_max, col_min, col_max) of the bounds in an open VNP46A3 file, and the tile's lats/lons."""
+        dataset = f[self.NTL_DATASET]
+        lats = f[self.NTL_LAT][:] if self.NTL_LAT in f else None
+        lons = f[self.NTL_LON][:] if self.NTL_LON in f else None
+        
+        # Find indices for the region using lat/lon arrays if available
+        if lats is not None and lons is not None:
+            lat_indices = np.where((lats >= lat_min) & (lats <= lat_max))[0]
+            lon_indices = np.where((lons >= lon_min) & (lons <= lon_max))[0]
+            
+            if len(lat_indices) > 0 and len(lon_indices) > 0:
+                row_min, row_max = lat_indices[0], lat_indices[-1] + 1
+                col_min, col_max = lon_indices[0], lon_indices[-1] + 1
+                logger.info(f"Using lat/lon arrays: rows {row_min}-{row_max}, cols {col_min}-{col_max}")
+            else:
+                logger.warning("Region coordinates not found in lat/lon arrays, using full tile")
+                row_min, row_max = 0, dataset.shape[0]
+                col_min, col_max = 0, dataset.shape[1]
+        else:
+            # Fallback to estimated bounds
+            bounds = self.get_dhaka_bounds_in_tile(lat_min, lat_max, lon_min, lon_max)
+            row_min, row_max = bounds["row_min"], bounds["row_max"]
+            col_min, col_max = bounds["col_min"], bounds["col_max"]
+            lats = 30.0 - (np.arange(dataset.shape[0]) + 0.5) * 0.00416667
+            lons = 80.0 + (np.arange(dataset.shape[1]) + 0.5) * 0.00416667
+        
+        return (int(row_min), int(row_max), int(col_min), int(col_max)), lats, lons
+    
+    def ntl_granule(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                    acquired: Optional[date] = None) -> Optional[Granule]:
+        """VNP46A3 granule covering the bounds: the month starting ``acquired``, or the latest."""
+        tile = vnp_tile((lat_min + lat_max) / 2, (lon_min + lon_max) / 2)
+        with stage("catalog_lookup"):
+            if acquired is None:
+                granule = self.catalog.latest("VNP46A3", tile)
+            else:
+                granule = self.catalog.get("VNP46A3", tile, acquired)
+        if granule is None:
+            logger.warning(f"No VNP46A3 granule found for tile {tile}" + (f" acquired {acquired}" if acquired else ""))
+        return granule
+    
+    def read_nighttime_lights_packed(self, lat_min: float, lat_max: float,
+                                     lon_min: float, lon_max: float,
+                                     acquired: Optional[date] = None) -> Optional["PackedRaster"]:
+        """
+        Read the VNP46A3 radiance for the bounds as packed integers, from the latest
+        granule or the one acquired on ``acquired``.
+
+        Only the bounding-box window is read from the HDF5 dataset; the values stay
+        in their stored dtype (uint16) together with scale, offset and fill value.
+        """
         try:
-            vnp_files = sorted(self.vnp_dir.glob("VNP46A3.A2024*.h5")) + sorted(self.vnp_dir.glob("VNP46A3.A2025*.h5"))
-            if not vnp_files:
-                logger.warning("No VNP46A3 files found")
+            granule = self.ntl_granule(lat_min, lat_max, lon_min, lon_max, acquired)
+            if granule is None:
                 return None
             
-            latest_file = vnp_files[-1]
+            latest_file = Path(granule.path)
             logger.info(f"Reading nighttime lights from {latest_file.name}")
             
+            import h5py
             with h5py.File(latest_file, 'r') as f:
-                # VNP46A3 uses AllAngle_Composite_Snow_Free for tropical regions like Bangladesh
-                dataset_path = 'HDFEOS/GRIDS/VIIRS_Grid_DNB_2d/Data Fields/AllAngle_Composite_Snow_Free'
-                lat_path = 'HDFEOS/GRIDS/VIIRS_Grid_DNB_2d/Data Fields/lat'
-                lon_path = 'HDFEOS/GRIDS/VIIRS_Grid_DNB_2d/Data Fields/lon'
-                
-                if dataset_path not in f:
-                    logger.error(f"Dataset {dataset_path} not found in {latest_file.name}")
+                if self.NTL_DATASET not in f:
+                    logger.error(f"Dataset {self.NTL_DATASET} not found in {latest_file.name}")
                     return None
                 
-                dataset = f[dataset_path]
-                lats = f[lat_path][:] if lat_path in f else None
-                lons = f[lon_path][:] if lon_path in f else None
-                
-                # Read the raw data
-                raw_data = dataset[:]
-                
-                # Apply scale factor and offset if available
-                scale_factor = dataset.attrs.get('scale_factor', 1.0)
-                offset = dataset.attrs.get('offset', 0.0)
-                fill_value = dataset.attrs.get('_FillValue', 65535)
+                with stage("subset"):
+                    (row_min, row_max, col_min, col_max), lats, lons = self._ntl_window(f, lat_min, lat_max, lon_min, lon_max)
                 
-                # Convert to float and apply scaling
-                data = raw_data.astype(float)
-                data[raw_data == fill_value] = np.nan
-                data = data * scale_factor + offset
-                
-                logger.info(f"Successfully read nighttime lights data - Shape: {data.shape}")
-                
-                # Find indices for Dhaka region using lat/lon arrays if available
-                if lats is not None and lons is not None:
-                    lat_indices = np.where((lats >= lat_min) & (lats <= lat_max))[0]
-                    lon_indices = np.where((lons >= lon_min) & (lons <= lon_max))[0]
-                    
-                    if len(lat_indices) > 0 and len(lon_indices) > 0:
-                        row_min, row_max = lat_indices[0], lat_indices[-1] + 1
-                        col_min, col_max = lon_indices[0], lon_indices[-1] + 1
-                        logger.info(f"Using lat/lon arrays: rows {row_min}-{row_max}, cols {col_min}-{col_max}")
-                    else:
-                        logger.warning("Dhaka coordinates not found in lat/lon arrays, using full tile")
-                        row_min, row_max = 0, data.shape[0]
-                        col_min, col_max = 0, data.shape[1]
-                else:
-                    # Fallback to estimated bounds
-                    bounds = self.get_dhaka_bounds_in_tile(lat_min, lat_max, lon_min, lon_max)
-                    row_min, row_max = bounds["row_min"], bounds["row_max"]
-                    col_min, col_max = bounds["col_min"], bounds["col_max"]
-                
-                subset = data[row_min:row_max, col_min:col_max]
-                
-                # Replace negative values and NaN with 0
-                subset = np.nan_to_num(subset, nan=0.0, posinf=0.0, neginf=0.0)
-                subset = np.where(subset < 0, 0, subset)
-                
-                logger.info(f"Extracted Dhaka subset - Shape: {subset.shape}, Min: {subset.min():.2f}, Max: {subset.max():.2f}, Mean: {subset.mean():.2f}")
+                # Hyperslab read: only the window leaves the file, in its packed dtype
+                with stage("hdf_read") as span:
+                    data = f[self.NTL_DATASET][row_min:row_max, col_min:col_max]
+                    span.nbytes = data.nbytes
+                packed = PackedRaster(
+                    data=data,
+                    scale_factor=granule.scale_factor,
+                    offset=granule.offset,
+                    fill_value=65535 if granule.fill_value is None else granule.fill_value,
+                    lats=np.asarray(lats[row_min:row_max], dtype=np.float64),
+                    lons=np.asarray(lons[col_min:col_max], dtype=np.float64),
+                    source=latest_file.name
+                )
                 
-                return subset
+                logger.info(f"Read nighttime lights window - Shape: {packed.shape}, dtype: {packed.data.dtype}")
+                return packed
                 
         except Exception as e:
             logger.error(f"Error reading nighttime lights: {e}")
             return None
     
+    def nighttime_lights_source(self, lat_min: float, lat_max: float,
+                                lon_min: float, lon_max: float,
+                                acquired: Optional[date] = None) -> Optional[RasterSource]:
+        """
+        The VNP46A3 window for the bounds as an on-disk RasterSource, without reading
+        any pixels; the out-of-core counterpart of ``read_nighttime_lights_packed``.
+        """
+        try:
+            granule = self.ntl_granule(lat_min, lat_max, lon_min, lon_max, acquired)
+            if granule is None:
+                return None
+            import h5py
+            with h5py.File(granule.path, 'r') as f:
+                if self.NTL_DATASET not in f:
+                    logger.error(f"Dataset {self.NTL_DATASET} not found in {Path(granule.path).name}")
+                    return None
+                window, lats, _ = self._ntl_window(f, lat_min, lat_max, lon_min, lon_max)
+            return RasterSource(
+                path=granule.path,
+                dataset=self.NTL_DATASET,
+                window=window,
+                north_up=len(lats) < 2 or bool(lats[0] > lats[-1]),
+                scale_factor=granule.scale_factor,
+                offset=granule.offset,
+                fill_value=granule.fill_value
+            )
+        except Exception as e:
+            logger.error(f"Error locating nighttime lights: {e}")
+            return None
+    
+    def regional_ntl_sums(self, lat_min: float, lat_max: float,
+                          lon_min: float, lon_max: float, grid_size: int,
+                          chunk_size: Optional[int] = None,
+                          workers: Optional[int] = None,
+                          acquired: Optional[date] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Per-cell NTL totals (``ntl_sum``/``ntl_pixels``, as in ``calculate_grid_metrics``)
+        for bounds of any size, reduced tile by tile straight from the granule.
+        """
+        source = self.nighttime_lights_source(lat_min, lat_max, lon_min, lon_max, acquired)
+        if source is None:
+            return None
+        result = zonal_stats(source, grid_size, chunk_size=chunk_size, workers=workers)
+        return {"ntl_sum": result.sums, "ntl_pixels": result.counts}
+    
+    def read_nighttime_lights(self, lat_min: float, lat_max: float, 
+                              lon_min: float, lon_max: float) -> Optional[np.ndarray]:
+        packed = self.read_nighttime_lights_packed(lat_min, lat_max, lon_min, lon_max)
+        if packed is None:
+            return None
+        
+        subset = packed.scaled()
+        if subset.size > 0:
+            logger.info(f"Extracted subset - Shape: {subset.shape}, Min: {subset.min():.2f}, Max: {subset.max():.2f}, Mean: {subset.mean():.2f}")
+        return subset
+    
     def read_land_cover(self, lat_min: float, lat_max: float,
                         lon_min: float, lon_max: float) -> Optional[np.ndarray]:
+        """
+        MODIS LC_Type1 over the bounds on a north-up lat/lon grid of roughly the
+        MODIS 500 m pixel size, or None when no tile covering them is available.
+
+        Used when there is no NTL window to align land cover with; pixels are looked
+        up through the same sinusoidal mapping as ``read_land_cover_aligned``.
+        """
+        step = np.degrees(MODIS_TILE_SIZE_M / MODIS_TILE_PIXELS / MODIS_EARTH_RADIUS)
+        n_rows = max(1, int(np.ceil((lat_max - lat_min) / step)))
+        n_cols = max(1, int(np.ceil((lon_max - lon_min) / step)))
+        lats = lat_max - (np.arange(n_rows) + 0.5) * (lat_max - lat_min) / n_rows
+        lons = lon_min + (np.arange(n_cols) + 0.5) * (lon_max - lon_min) / n_cols
+        
+        data = self.read_land_cover_aligned(lats, lons)
+        if data is None or np.all(data == 255):
+            logger.info("No MODIS land cover tile covers the bounds (this is OK)")
+            return None
+        logger.debug(f"Read MODIS land cover - Shape: {data.shape}")
+        return data
+    
+    def read_land_cover_aligned(self, lats: np.ndarray, lons: np.ndarray) -> Optional[np.ndarray]:
+        """
+        MODIS LC_Type1 resampled (nearest neighbour) onto a lat/lon pixel grid.
+
+        Pixel centers are projected into the MODIS sinusoidal grid, so the result is
+        aligned with e.g. the VNP46A3 window given by ``lats``/``lons``. Pixels outside
+        the available tiles are set to 255 (MODIS fill).
+        """
         try:
             from pyhdf.SD import SD, SDC
-            print("   Attempting to load MODIS land cover with pyhdf...")
-            
-            modis_files = list(self.modis_dir.glob("MCD12Q1.A2024*.hdf"))
-            if not modis_files:
-                print("   ⚠️  No MODIS files found in", self.modis_dir)
-                logger.info("No MODIS land cover files found (this is OK)")
-                return None
-            
-            print(f"   Found {len(modis_files)} MODIS files:")
-            for f in modis_files:
-                print(f"      - {f.name}")
-            
-            h26_file = [f for f in modis_files if 'h26v06' in f.name]
-            if not h26_file:
-                print("   ⚠️  h26v06 tile not found (need this tile for Dhaka)")
-                logger.info("h26v06 tile not found (this is OK)")
-                return None
-            
-            file_path = h26_file[0]
-            print(f"   Opening: {file_path.name}")
-            logger.info(f"Reading land cover from {file_path.name}")
-            
-            hdf = SD(str(file_path), SDC.READ)
-            
-            lc_dataset = hdf.select('LC_Type1')
-            data = lc_dataset[:, :]
-            print(f"   Successfully read MODIS data - Shape: {data.shape}")
-            
-            # MODIS h26v06 tile in sinusoidal projection
-            # Covers roughly 80-90°E, 20-30°N
-            # Dhaka (23.8°N, 90.4°E) is in the SE portion
-            # Extract a region that covers Bangladesh
-            tile_h, tile_w = data.shape
-            
-            # Extract SE quadrant (covers Dhaka region reliably)
-            row_min = tile_h // 2  # Middle to bottom
-            row_max = tile_h
-            col_min = tile_w // 2  # Middle to right
-            col_max = tile_w
-            
-            subset = data[row_min:row_max, col_min:col_max]
-            
-            print(f"   Extracted SE quadrant - Shape: {subset.shape}")
-            
-            hdf.end()
-            
-            return subset
-            
-        except ImportError as e:
-            print(f"   ⚠️  pyhdf not available: {e}")
-            logger.info("pyhdf not installed - MODIS land cover skipped (this is OK, nighttime lights will still work!)")
+        except ImportError:
+            logger.info("pyhdf not installed - aligned land cover skipped")
             return None
         
+        lon_grid, lat_grid = np.meshgrid(lons, lats)
+        h, v, row, col = modis_sinusoidal_index(lat_grid, lon_grid)
+        out = np.full(lat_grid.shape, 255, dtype=np.uint8)
+        
+        try:
+            for tile_h, tile_v in sorted(set(zip(h.ravel().tolist(), v.ravel().tolist()))):
+                tile = f"h{tile_h:02d}v{tile_v:02d}"
+                with stage("catalog_lookup"):
+                    granule = self.catalog.latest("MCD12Q1", tile)
+                if granule is None:
+                    logger.info(f"MODIS tile {tile} not found - pixels left as fill")
+                    continue
+                with stage("hdf_read") as span:
+                    hdf = SD(granule.path, SDC.READ)
+                    try:
+                        data = hdf.select('LC_Type1')[:, :]
+                    finally:
+                        hdf.end()
+                    span.nbytes = data.nbytes
+                sel = (h == tile_h) & (v == tile_v)
+                r = np.clip(row[sel], 0, data.shape[0] - 1)
+                c = np.clip(col[sel], 0, data.shape[1] - 1)
+                out[sel] = data[r, c]
         except Exception as e:
-            print(f"   ⚠️  Error reading MODIS: {e}")
-            logger.info(f"Could not read MODIS land cover (this is OK): {e}")
+            logger.info(f"Could not read aligned MODIS land cover: {e}")
             return None
+        
+        return out
     
-    def read_transport_network(self, lat_min: float, lat_max: float,
-                              lon_min: float, lon_max: float,
-                              grid_size: int = 10) -> Optional[Dict]:
+    def road_segments(self, lat_min: float, lat_max: float,
+                      lon_min: float, lon_max: float) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
         """
-        Download and analyze OpenStreetMap road network for transport access.
-        Returns a dict mapping cell_id to transport_score (0-1).
+        (mid_lat, mid_lon, length_m) of the road network split into <=25 m pieces.
+
+        Binning the pieces by midpoint clips road length to any grid in one pass;
+        computed once per bounds.
         """
-        if not OSMNX_AVAILABLE:
-            print("   ⚠️  OSMnx not available")
-            logger.info("OSMnx not available - using estimated transport access")
+        current_bounds = (lon_min, lat_min, lon_max, lat_max)
+        if current_bounds in self._road_segment_cache:
+            return self._road_segment_cache[current_bounds]
+        if osmnx() is None:
             return None
         
-        try:
-            # Check if we have cached network for the same bounds
-            current_bounds = (lon_min, lat_min, lon_max, lat_max)
+        edges_utm = self.get_road_edges(lat_min, lat_max, lon_min, lon_max)
+        if edges_utm is None or len(edges_utm) == 0:
+            return None
+        
+        import shapely
+        from pyproj import Transformer
+        
+        with stage("osm_overlay") as span:
+            pieces = shapely.segmentize(edges_utm.geometry.values, max_segment_length=25.0)
+            coords, owner = shapely.get_coordinates(pieces, return_index=True)
+            same_line = owner[1:] == owner[:-1]
+            start, end = coords[:-1][same_line], coords[1:][same_line]
+            lengths = np.hypot(end[:, 0] - start[:, 0], end[:, 1] - start[:, 1])
+            mid = (start + end) / 2
             
-            if self._osm_network_cache is None or self._osm_cache_bounds != current_bounds:
-                print("   Downloading OpenStreetMap road network for Dhaka...")
-                logger.info("Fetching OSM road network")
-                
-                # Download all roads (drive network) for the bounding box
-                # OSMnx expects bbox as a single tuple: (left, bottom, right, top)
-                bbox = (lon_min, lat_min, lon_max, lat_max)
+            to_wgs84 = Transformer.from_crs('EPSG:32646', 'EPSG:4326', always_xy=True)
+            mid_lon, mid_lat = to_wgs84.transform(mid[:, 0], mid[:, 1])
+            span.nbytes = coords.nbytes
+        self._road_segment_cache[current_bounds] = (np.asarray(mid_lat), np.asarray(mid_lon), lengths)
+        
+        return self._road_segment_cache[current_bounds]
+    
+    def road_length_raster(self, lat_min: float, lat_max: float,
+                           lon_min: float, lon_max: float,
+                           lats: np.ndarray, lons: np.ndarray) -> Optional[np.ndarray]:
+        """Metres of road per pixel on a regular lat/lon grid (pixel centers ``lats``/``lons``)."""
+        segments = self.road_segments(lat_min, lat_max, lon_min, lon_max)
+        if segments is None:
+            return None
+        mid_lat, mid_lon, lengths = segments
+        
+        dlat = (lats[-1] - lats[0]) / max(len(lats) - 1, 1) if len(lats) > 1 else -0.00416667
+        dlon = (lons[-1] - lons[0]) / max(len(lons) - 1, 1) if len(lons) > 1 else 0.00416667
+        rows = np.floor((mid_lat - lats[0]) / dlat + 0.5).astype(np.int64)
+        cols = np.floor((mid_lon - lons[0]) / dlon + 0.5).astype(np.int64)
+        inside = (rows >= 0) & (rows < len(lats)) & (cols >= 0) & (cols < len(lons))
+        
+        flat = rows[inside] * len(lons) + cols[inside]
+        raster = np.bincount(flat, weights=lengths[inside], minlength=len(lats) * len(lons))
+        return raster.reshape(len(lats), len(lons)).astype(np.float32)
+    
+    def road_length_cells(self, lat_min: float, lat_max: float,
+                          lon_min: float, lon_max: float,
+                          grid_size: int = 10) -> Optional[np.ndarray]:
+        """Metres of road inside every opportunity cell, in cell-id order."""
+        segments = self.road_segments(lat_min, lat_max, lon_min, lon_max)
+        if segments is None:
+            return None
+        mid_lat, mid_lon, lengths = segments
+        
+        with stage("osm_overlay", nbytes=lengths.nbytes):
+            rows = np.floor((mid_lat - lat_min) / ((lat_max - lat_min) / grid_size)).astype(np.int64)
+            cols = np.floor((mid_lon - lon_min) / ((lon_max - lon_min) / grid_size)).astype(np.int64)
+            inside = (rows >= 0) & (rows < grid_size) & (cols >= 0) & (cols < grid_size)
+            return np.bincount(rows[inside] * grid_size + cols[inside], weights=lengths[inside],
+                               minlength=grid_size * grid_size)
+    
+    def get_road_graph(self, lat_min: float, lat_max: float,
+                       lon_min: float, lon_max: float):
+        """OSM drive network (networkx MultiDiGraph) for the bounds, downloaded once per bounds."""
+        ox = osmnx()
+        if ox is None:
+            return None
+        
+        current_bounds = (lon_min, lat_min, lon_max, lat_max)
+        if current_bounds not in self._osm_graph_cache:
+            logger.info("Fetching OSM road network")
+            
+            # OSMnx expects bbox as a single tuple: (left, bottom, right, top)
+            with stage("osm_fetch"):
                 G = ox.graph_from_bbox(
-                    bbox,
+                    current_bounds,
                     network_type='drive',
                     simplify=True
                 )
-                
-                print(f"   ✅ Downloaded road network - {len(G.nodes)} nodes, {len(G.edges)} edges")
-                logger.info(f"OSM network: {len(G.nodes)} nodes, {len(G.edges)} edges")
-                
+            
+            logger.info(f"OSM network: {len(G.nodes)} nodes, {len(G.edges)} edges")
+            self._osm_graph_cache[current_bounds] = G
+        
+        return self._osm_graph_cache[current_bounds]
+    
+    def get_road_edges(self, lat_min: float, lat_max: float,
+                       lon_min: float, lon_max: float):
+        """UTM-projected OSM drive network edges for the bounds."""
+        ox = osmnx()
+        if ox is None:
+            return None
+        
+        current_bounds = (lon_min, lat_min, lon_max, lat_max)
+        if current_bounds not in self._osm_network_cache:
+            G = self.get_road_graph(lat_min, lat_max, lon_min, lon_max)
+            
+            with stage("osm_overlay"):
                 # Convert to GeoDataFrame and project to UTM for accurate length calculations
                 edges = ox.graph_to_gdfs(G, nodes=False, edges=True)
                 
                 # Project to UTM (UTM zone 46N for Dhaka, Bangladesh)
                 # EPSG:32646 is WGS 84 / UTM zone 46N
-                print("   Projecting to UTM for accurate measurements...")
-                edges_utm = edges.to_crs('EPSG:32646')
-                
-                # Cache the projected edges
-                self._osm_network_cache = edges_utm
-                self._osm_cache_bounds = current_bounds
-            else:
-                print("   ✅ Using cached road network")
-                logger.info("Using cached OSM network")
-                edges_utm = self._osm_network_cache
-            
-            # Calculate transport score for each grid cell
-            lat_step = (lat_max - lat_min) / grid_size
-            lon_step = (lon_max - lon_min) / grid_size
+                self._osm_network_cache[current_bounds] = edges.to_crs('EPSG:32646')
+        else:
+            logger.info("Using cached OSM network")
+        
+        return self._osm_network_cache[current_bounds]
+    
+    def read_city_rasters(self, lat_min: float, lat_max: float,
+                          lon_min: float, lon_max: float,
+                          margin_km: float = 10.0,
+                          acquired: Optional[date] = None) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """
+        All rasters needed for a city, cropped to its bounds: NTL (float32) with
+        pixel-center coordinates, and land cover resampled onto the NTL grid padded
+        by ``margin_km`` so distance-to-cropland sees food sources just outside.
+        Falls back to the unaligned MODIS subset when there is no NTL grid to align to.
+        NTL comes from the month starting ``acquired`` when given, else the latest.
+        """
+        rasters: Dict[str, np.ndarray] = {}
+        sources: Dict[str, str] = {}
+        
+        packed = self.read_nighttime_lights_packed(lat_min, lat_max, lon_min, lon_max, acquired)
+        if packed is not None:
+            with stage("scale_mask", nbytes=packed.nbytes):
+                rasters["ntl"] = packed.scaled()
+            rasters["ntl_lat"] = packed.lats
+            rasters["ntl_lon"] = packed.lons
+            sources["ntl"] = packed.source
             
-            transport_scores = {}
+            dlat, _ = pixel_steps(packed.lats, packed.lons)
+            pad = int(np.ceil(margin_km / (dlat * KM_PER_DEGREE)))
+            lc_aligned = self.read_land_cover_aligned(
+                extend_coords(packed.lats, pad), extend_coords(packed.lons, pad)
+            )
+            if lc_aligned is not None:
+                rasters["lc_aligned"] = lc_aligned
+        
+        if "lc_aligned" not in rasters:
+            lc = self.read_land_cover(lat_min, lat_max, lon_min, lon_max)
+            if lc is not None:
+                rasters["lc"] = lc
+        
+        return rasters, sources
+    
+    def read_transport_network(self, lat_min: float, lat_max: float,
+                              lon_min: float, lon_max: float,
+                              grid_size: int = 10) -> Optional[Dict]:
+        """
+        Download and analyze OpenStreetMap road network for transport access.
+        Returns a dict mapping cell_id to transport_score (0-1).
+        """
+        if osmnx() is None:
+            logger.info("OSMnx not available - using estimated transport access")
+            return None
+        
+        try:
+            road_m = self.road_length_cells(lat_min, lat_max, lon_min, lon_max, grid_size)
+            if road_m is None:
+                return None
             
-            for i in range(grid_size):
-                for j in range(grid_size):
-                    cell_id = i * grid_size + j + 1
-                    
-                    cell_min_lat = lat_min + (i * lat_step)
-                    cell_max_lat = cell_min_lat + lat_step
-                    cell_min_lon = lon_min + (j * lon_step)
-                    cell_max_lon = cell_min_lon + lon_step
-                    
-                    # Create bounding box for this cell in lat/lon (EPSG:4326)
-                    cell_box = box(cell_min_lon, cell_min_lat, cell_max_lon, cell_max_lat)
-                    
-                    # Project cell box to UTM to match the edges
-                    cell_gdf = gpd.GeoSeries([cell_box], crs='EPSG:4326')
-                    cell_box_utm = cell_gdf.to_crs('EPSG:32646').iloc[0]
-                    
-                    # Find roads that intersect this cell (now both in UTM)
-                    roads_in_cell = edges_utm[edges_utm.intersects(cell_box_utm)]
-                    
-                    if len(roads_in_cell) > 0:
-                        # Calculate total road length in cell (in meters, already in UTM)
-                        total_length = roads_in_cell.length.sum()
-                        
-                        # Calculate cell area in square meters (from UTM polygon)
-                        cell_area_m2 = cell_box_utm.area
-                        
-                        # Road density: meters of road per square meter of area
-                        road_density = total_length / cell_area_m2
-                        
-                        # Normalize to 0-1 score (higher density = better access)
-                        # Typical urban road density: 0.001 - 0.01 m/m²
-                        transport_score = min(1.0, road_density / 0.008)
-                    else:
-                        transport_score = 0.0
-                    
-                    transport_scores[cell_id] = round(transport_score, 3)
+            # Road density: meters of road per square meter of cell, normalized to a 0-1 score
+            # (typical urban road density: 0.001 - 0.01 m/m²)
+            bounds = {"min_lat": lat_min, "max_lat": lat_max, "min_lon": lon_min, "max_lon": lon_max}
+            scores = metrics_from_sums({"road_m": road_m, "area_m2": cell_areas_m2(bounds, grid_size)})["transport_score"]
+            transport_scores = {k + 1: float(score) for k, score in enumerate(scores)}
             
-            print(f"   ✅ Calculated transport scores for {len(transport_scores)} cells")
             logger.info(f"Transport analysis complete for {len(transport_scores)} cells")
             
             return transport_scores
             
         except Exception as e:
-            print(f"   ⚠️  Error fetching OSM data: {e}")
             logger.error(f"OSM network analysis failed: {e}")
             return None
     
     def calculate_grid_metrics(self, lat_min: float, lat_max: float,
                                lon_min: float, lon_max: float,
-                               grid_size: int = 10) -> Dict:
-        print("\n" + "=" * 80)
-        print("📡 READING NASA SATELLITE DATA")
-        print("=" * 80)
-        
-        ntl_data = self.read_nighttime_lights(lat_min, lat_max, lon_min, lon_max)
-        if ntl_data is not None:
-            print(f"✅ VNP46A3 Nighttime Lights: LOADED")
-            print(f"   Shape: {ntl_data.shape}, Mean: {ntl_data.mean():.2f}")
-        else:
-            print("❌ VNP46A3 Nighttime Lights: FAILED")
+                               grid_size: int = 10,
+                               rasters: Optional[Dict[str, np.ndarray]] = None) -> Dict:
+        """
+        Aggregate NASA rasters into per-cell metrics.
+
+        When ``rasters`` is given (a city cube with ``ntl``/``lc`` entries), those
+        arrays are used instead of re-reading the granules.
+        """
+        if rasters is None:
+            rasters, _ = self.read_city_rasters(lat_min, lat_max, lon_min, lon_max)
+        bounds = {"min_lat": lat_min, "max_lat": lat_max, "min_lon": lon_min, "max_lon": lon_max}
         
-        lc_data = self.read_land_cover(lat_min, lat_max, lon_min, lon_max)
-        if lc_data is not None:
-            print(f"✅ MODIS Land Cover: LOADED")
-            print(f"   Shape: {lc_data.shape}, Unique classes: {len(set(lc_data.flatten()))}")
-        else:
-            print("⚠️  MODIS Land Cover: NOT LOADED (using estimated food access)")
+        ntl_data = rasters.get("ntl")
+        if ntl_data is None:
+            logger.warning("VNP46A3 nighttime lights not loaded")
         
-        transport_data = self.read_transport_network(lat_min, lat_max, lon_min, lon_max, grid_size)
-        if transport_data is not None:
-            print(f"✅ OpenStreetMap Transport Network: LOADED")
-            print(f"   Analyzed {len(transport_data)} grid cells for road density")
-        else:
-            print("⚠️  Transport Network: NOT LOADED (using estimated transport access)")
+        # Distance to nearest cropland per NTL pixel; the unaligned MODIS subset is only
+        # used by cubes built before land cover was resampled onto the NTL grid
+        with stage("food_distance") as span:
+            food_raster = food_distance_km(rasters, bounds)
+            span.nbytes = 0 if food_raster is None else food_raster.nbytes
+        lc_data = rasters.get("lc") if food_raster is None else None
+        if food_raster is None and lc_data is None:
+            logger.info("MODIS land cover not loaded - using estimated food access")
         
-        print("=" * 80 + "\n")
+        try:
+            road_m = self.road_length_cells(lat_min, lat_max, lon_min, lon_max, grid_size)
+        except Exception as e:
+            logger.error(f"OSM network analysis failed: {e}")
+            road_m = None
+        if road_m is None:
+            logger.info("Transport network not loaded - using estimated transport access")
         
-        lat_step = (lat_max - lat_min) / grid_size
-        lon_step = (lon_max - lon_min) / grid_size
+        try:
+            population = get_population(bounds)
+        except Exception as e:
+            logger.error(f"Could not read population raster: {e}")
+            population = None
         
+        # Additive per-cell totals; cells are numbered from the south, rasters are stored north-up
+        with stage("aggregate") as span:
+            sums = {"area_m2": cell_areas_m2(bounds, grid_size)}
+            ntl_lats = rasters.get("ntl_lat")
+            if ntl_data is not None:
+                sums["ntl_sum"], sums["ntl_pixels"] = block_sums(south_up(ntl_data, ntl_lats), grid_size)
+                span.nbytes += ntl_data.nbytes
+            if food_raster is not None:
+                sums["food_sum"], sums["food_pixels"] = block_sums(south_up(food_raster, ntl_lats), grid_size)
+                span.nbytes += food_raster.nbytes
+            elif lc_data is not None:
+                cropland = (lc_data >= 12) & (lc_data <= 14)
+                sums["cropland_pixels"], sums["lc_pixels"] = block_sums(south_up(cropland), grid_size)
+                span.nbytes += lc_data.nbytes
+            if road_m is not None:
+                sums["road_m"] = road_m
+            if population is not None:
+                # Exact per-cell totals from the summed-area table
+                sums["population"] = population.cell_sums(bounds, grid_size)
+            
+            metrics = metrics_from_sums(sums)
         grid_metrics = {}
-        
-        for i in range(grid_size):
-            for j in range(grid_size):
-                cell_id = i * grid_size + j + 1
-                
-                if ntl_data is not None:
-                    ntl_rows = ntl_data.shape[0]
-                    ntl_cols = ntl_data.shape[1]
-                    
-                    row_start = int(i * ntl_rows / grid_size)
-                    row_end = int((i + 1) * ntl_rows / grid_size)
-                    col_start = int(j * ntl_cols / grid_size)
-                    col_end = int((j + 1) * ntl_cols / grid_size)
-                    
-                    cell_ntl = ntl_data[row_start:row_end, col_start:col_end]
-                    avg_ntl = float(np.nanmean(cell_ntl)) if cell_ntl.size > 0 else 0
-                    
-                    housing_pressure = min(1.0, avg_ntl / 100.0)
-                else:
-                    housing_pressure = 0.5
-                
-                if lc_data is not None:
-                    lc_rows = lc_data.shape[0]
-                    lc_cols = lc_data.shape[1]
-                    
-                    row_start = int(i * lc_rows / grid_size)
-                    row_end = int((i + 1) * lc_rows / grid_size)
-                    col_start = int(j * lc_cols / grid_size)
-                    col_end = int((j + 1) * lc_cols / grid_size)
-                    
-                    cell_lc = lc_data[row_start:row_end, col_start:col_end]
-                    
-                    cropland_pixels = np.sum((cell_lc >= 12) & (cell_lc <= 14))
-                    total_pixels = cell_lc.size
-                    cropland_ratio = cropland_pixels / total_pixels if total_pixels > 0 else 0
-                    
-                    food_distance = 8.0 * (1 - cropland_ratio)
-                else:
-                    # Estimate based on housing pressure: urban areas typically farther from food sources
-                    food_distance = 3.0 + (housing_pressure * 4.0)  # 3-7 km range
-                
-                # Get transport score from real OSM data or estimate
-                if transport_data is not None and cell_id in transport_data:
-                    transport_score = transport_data[cell_id]
-                else:
-                    # Estimate: higher infrastructure = better transport
-                    transport_score = 0.5 + (housing_pressure * 0.4)
-                
-                grid_metrics[cell_id] = {
-                    'housing_pressure': round(housing_pressure, 3),
-                    'food_distance_km': round(food_distance, 2),
-                    'transport_score': round(transport_score, 3),
-                    'avg_nighttime_light': round(avg_ntl, 2) if ntl_data is not None else 0
-                }
+        for k in range(grid_size * grid_size):
+            grid_metrics[k + 1] = {
+                'housing_pressure': float(metrics["housing_pressure"][k]),
+                'food_distance_km': float(metrics["food_distance_km"][k]),
+                'transport_score': float(metrics["transport_score"][k]),
+                'avg_nighttime_light': float(metrics["avg_nighttime_light"][k]),
+                'population_density': int(metrics["population_density"][k])
+            }
         
         # Add metadata about what was loaded
         grid_metrics['_metadata'] = {
             'ntl_loaded': ntl_data is not None,
-            'lc_loaded': lc_data is not None,
-            'transport_loaded': transport_data is not None
+            'lc_loaded': food_raster is not None or lc_data is not None,
+            'transport_loaded': road_m is not None,
+            'population_source': population.source if population is not None else None
         }
+        # Totals behind the metrics, for rolling this grid up into coarser ones
+        grid_metrics['_sums'] = {name: sums[name] for name in SUM_FIELDS if name in sums}
         
         return grid_metrics
 
-nasa_reader = NASADataReader()
+@lru_cache(maxsize=None)
+def get_nasa_reader() -> NASADataReader:
+    """The process-wide reader, created on first use rather than at import."""
+    return NASADataReader()
 
@@ -0,0 +1,143 @@
+"""
+Population counts per cell from a local gridded population raster.
+
+Point ``settings.population_file`` at a GeoTIFF of people per pixel in lat/lon
+(GPW v4 "population count" from NASA SEDAC at 30 arc-seconds, or a WorldPop
+count raster at 3 arc-seconds). The city window is read once with rasterio and
+turned into a summed-area table: ``S[i, j]`` is the population south and west
+of pixel corner ``(i, j)``.
+
+People are assumed uniform within a pixel, so the population south-west of
+any point is exactly the bilinear interpolation of ``S`` at its fractional
+pixel coordinates. A rectangle's population is then four lookups whatever its
+size or alignment: cell totals for any grid are exact, cost O(1) per cell, and
+sum to the window total. They travel with the other per-cell totals
+(``sums["population"]``), so rollups, zonal profiles, regions and
+recommendation reach all count the same people.
+
+rasterio is optional: without it (or without a file) population density stays
+the nighttime-lights estimate.
+"""
+import importlib.util
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .config import settings
+from .telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+def rasterio_available() -> bool:
+    """Whether rasterio is installed, without importing it."""
+    return importlib.util.find_spec("rasterio") is not None
+
+class PopulationRaster:
+    """People per pixel over a lat/lon window, with its summed-area table."""
+
+    def __init__(self, counts: np.ndarray, north: float, west: float,
+                 dlat: float, dlon: float, source: str = ""):
+        counts = np.asarray(counts, dtype=np.float64)
+        # Fill and negative values (GPW marks nodata with -3.4e38) hold no people
+        counts = np.where(np.isfinite(counts) & (counts > 0), counts, 0.0)
+        self.height, self.width = counts.shape
+        self.south = north - self.height * dlat
+        self.west = west
+        self.dlat = dlat
+        self.dlon = dlon
+        self.source = source
+        # Row 0 of the table is the southern edge; padded so corner (0, 0) is zero
+        self.sat = np.zeros((self.height + 1, self.width + 1))
+        np.cumsum(np.cumsum(counts[::-1], axis=0), axis=1, out=self.sat[1:, 1:])
+
+    @property
+    def total(self) -> float:
+        return float(self.sat[-1, -1])
+
+    @property
+    def nbytes(self) -> int:
+        return self.sat.nbytes
+
+    def integral(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Population south-west of each (lat, lon): the table bilinearly interpolated."""
+        y = np.clip((np.asarray(lats, dtype=np.float64) - self.south) / self.dlat, 0, self.height)
+        x = np.clip((np.asarray(lons, dtype=np.float64) - self.west) / self.dlon, 0, self.width)
+        i = np.minimum(np.floor(y).astype(np.int64), self.height - 1)
+        j = np.minimum(np.floor(x).astype(np.int64), self.width - 1)
+        fy, fx = y - i, x - j
+        s = self.sat
+        return ((s[i, j] * (1 - fx) + s[i, j + 1] * fx) * (1 - fy)
+                + (s[i + 1, j] * (1 - fx) + s[i + 1, j + 1] * fx) * fy)
+
+    def rect_sums(self, min_lat, max_lat, min_lon, max_lon) -> np.ndarray:
+        """Population inside each rectangle (arrays broadcast), four table lookups apiece."""
+        return (self.integral(max_lat, max_lon) - self.integral(min_lat, max_lon)
+                - self.integral(max_lat, min_lon) + self.integral(min_lat, min_lon))
+
+    def cell_sums(self, bounds: Dict[str, float], grid_size: int) -> np.ndarray:
+        """Population of every opportunity cell, in cell-id order (row-major from the south-west)."""
+        lat_edges = np.linspace(bounds["min_lat"], bounds["max_lat"], grid_size + 1)
+        lon_edges = np.linspace(bounds["min_lon"], bounds["max_lon"], grid_size + 1)
+        corners = self.integral(lat_edges[:, None], lon_edges[None, :])
+        # Shared corners are looked up once; each cell is then a four-term difference
+        cells = corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+        return np.maximum(cells, 0.0).ravel()
+
+def read_population_window(path: str, bounds: Dict[str, float], margin_pixels: int = 1) -> PopulationRaster:
+    """The pixels of a population GeoTIFF covering ``bounds``, read as one window."""
+    import rasterio
+    from rasterio.windows import Window
+    with rasterio.open(path) as src:
+        if src.crs is not None and not src.crs.is_geographic:
+            raise ValueError(f"{os.path.basename(path)} is in {src.crs}; population rasters must be in lat/lon")
+        t = src.transform
+        col0 = int(np.floor((bounds["min_lon"] - t.c) / t.a)) - margin_pixels
+        col1 = int(np.ceil((bounds["max_lon"] - t.c) / t.a)) + margin_pixels
+        row0 = int(np.floor((bounds["max_lat"] - t.f) / t.e)) - margin_pixels
+        row1 = int(np.ceil((bounds["min_lat"] - t.f) / t.e)) + margin_pixels
+        with stage("population_read") as span:
+            # Pixels past the raster's edge read as fill, which counts as nobody
+            data = src.read(1, window=Window(col0, row0, col1 - col0, row1 - row0),
+                            boundless=True, masked=True)
+            span.nbytes = data.nbytes
+        counts = data.filled(0)
+    return PopulationRaster(counts, north=t.f + row0 * t.e, west=t.c + col0 * t.a,
+                            dlat=-t.e, dlon=t.a, source=os.path.basename(path))
+
+@lru_cache(maxsize=8)
+def _load(path: str, mtime_ns: int, size: int, bounds: Tuple[float, ...]) -> PopulationRaster:
+    min_lat, max_lat, min_lon, max_lon = bounds
+    raster = read_population_window(path, {"min_lat": min_lat, "max_lat": max_lat,
+                                           "min_lon": min_lon, "max_lon": max_lon})
+    logger.info(f"Population window from {raster.source}: {raster.height}x{raster.width} pixels, "
+                f"{raster.total:,.0f} people")
+    return raster
+
+def population_version(path: Optional[str] = None) -> Optional[str]:
+    """
+    Identity (path, mtime, size) of the population raster ``get_population`` would
+    read; None when none would be read. Grids computed with it are keyed on it.
+    """
+    path = settings.population_file if path is None else path
+    if not path or not os.path.exists(path) or not rasterio_available():
+        return None
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+def get_population(bounds: Dict[str, float], path: Optional[str] = None) -> Optional[PopulationRaster]:
+    """
+    Population window for ``bounds`` from the configured raster, re-read when the file
+    changes; None when no raster is configured or rasterio is not installed.
+    """
+    path = settings.population_file if path is None else path
+    if not path or not os.path.exists(path):
+        return None
+    if not rasterio_available():
+        logger.warning(f"rasterio not installed - {path} ignored, population density is estimated")
+        return None
+    stat = os.stat(path)
+    key = (bounds["min_lat"], bounds["max_lat"], bounds["min_lon"], bounds["max_lon"])
+    return _load(os.path.abspath(path), stat.st_mtime_ns, stat.st_size, key)
@@ -0,0 +1,151 @@
+"""
+Table-driven recommendation rules evaluated over whole grids.
+
+Each rule is a row of data (metric, comparator, threshold, text, priority).
+A rule table is compiled once into comparison ufuncs. Evaluating it over the
+per-cell property arrays gives a (cells x rules) boolean mask in one
+vectorized pass per rule, packed into a per-cell bitset (bit k = rule k).
+Metrics are compared on the values as served (rounded), so a cell's
+recommendations match what its properties show.
+"""
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import settings
+
+COMPARATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+# Properties rules may test, as named in the GeoJSON cell properties
+RULE_METRICS = (
+    "opportunity_score",
+    "population_density",
+    "food_access_distance_km",
+    "transport_access_score",
+    "housing_pressure_score",
+)
+
+@dataclass(frozen=True)
+class Rule:
+    rule_id: str
+    metric: str
+    comparator: str
+    threshold: float
+    text: str
+    # Lower comes first in a cell's list of recommendations
+    priority: int
+
+    def to_dict(self) -> Dict:
+        return {
+            "rule_id": self.rule_id,
+            "metric": self.metric,
+            "comparator": self.comparator,
+            "threshold": self.threshold,
+            "text": self.text,
+            "priority": self.priority,
+        }
+
+DEFAULT_RULES = (
+    Rule("food_market", "food_access_distance_km", ">", 5.0,
+         "Establish community food markets within 3km radius", 1),
+    Rule("transport_links", "transport_access_score", "<", 0.4,
+         "Improve road connectivity and public transport routes", 2),
+    Rule("affordable_housing", "housing_pressure_score", ">", 0.7,
+         "Develop affordable housing projects to reduce density pressure", 3),
+    Rule("priority_zone", "opportunity_score", "<", 0.4,
+         "Priority zone for integrated development intervention", 4),
+)
+
+class RuleSet:
+    """A validated rule table; ``evaluate`` returns the (cells x rules) hit mask."""
+
+    def __init__(self, rules: Sequence[Rule]):
+        if not rules:
+            raise ValueError("A rule set needs at least one rule")
+        if len(rules) > 64:
+            raise ValueError("At most 64 rules fit in a cell bitset")
+        ids = [r.rule_id for r in rules]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Rule ids must be unique")
+        for rule in rules:
+            if rule.metric not in RULE_METRICS:
+                raise ValueError(f"Rule '{rule.rule_id}': unknown metric '{rule.metric}'. "
+                                 f"Use one of: {', '.join(RULE_METRICS)}")
+            if rule.comparator not in COMPARATORS:
+                raise ValueError(f"Rule '{rule.rule_id}': unknown comparator '{rule.comparator}'. "
+                                 f"Use one of: {', '.join(COMPARATORS)}")
+        self.rules = tuple(rules)
+        self._compiled = [(r.metric, COMPARATORS[r.comparator], float(r.threshold)) for r in self.rules]
+        # Rule positions in priority order (stable for equal priorities)
+        self.priority_order = sorted(range(len(self.rules)), key=lambda k: self.rules[k].priority)
+        n = len(self.rules)
+        self.bitset_dtype = np.uint8 if n <= 8 else np.uint16 if n <= 16 else np.uint32 if n <= 32 else np.uint64
+
+    def evaluate(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Boolean (cells x rules) mask of which rules fire for each cell."""
+        n_cells = len(next(iter(columns.values())))
+        hits = np.empty((n_cells, len(self.rules)), dtype=bool)
+        for k, (metric, compare, threshold) in enumerate(self._compiled):
+            compare(columns[metric], threshold, out=hits[:, k])
+        return hits
+
+    def bitsets(self, hits: np.ndarray) -> np.ndarray:
+        """Per-cell bitset with bit k set when rule k fired."""
+        bits = np.zeros(len(hits), dtype=self.bitset_dtype)
+        for k in range(hits.shape[1]):
+            bits |= hits[:, k].astype(self.bitset_dtype) << self.bitset_dtype(k)
+        return bits
+
+    def texts(self, hit_row: np.ndarray) -> List[str]:
+        """Recommendation texts of one cell's hit row, in priority order."""
+        return [self.rules[k].text for k in self.priority_order if hit_row[k]]
+
+default_rule_set = RuleSet(DEFAULT_RULES)
+
+def load_rules(path: Path) -> RuleSet:
+    """Rule set from a JSON list of {rule_id, metric, comparator, threshold, text, priority} objects."""
+    entries = json.loads(Path(path).read_text())
+    try:
+        rules = [Rule(e["rule_id"], e["metric"], e["comparator"], float(e["threshold"]), e["text"], int(e.get("priority", 0)))
+                 for e in entries]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid rule in {path}: {e}")
+    return RuleSet(rules)
+
+@lru_cache(maxsize=4)
+def _rules_from_file(path: str) -> RuleSet:
+    return load_rules(Path(path))
+
+def get_rule_set() -> RuleSet:
+    """Rules from ``settings.recommendation_rules_file`` if set, else the built-in table."""
+    if settings.recommendation_rules_file:
+        return _rules_from_file(settings.recommendation_rules_file)
+    return default_rule_set
+
+def rule_summary(rule_set: RuleSet, hits: np.ndarray,
+                 population: Optional[np.ndarray] = None) -> Tuple[List[Dict], int]:
+    """
+    Per-rule hit counts and fractions, plus the number of cells with at least one hit;
+    with per-cell ``population``, also the people living in each rule's cells.
+    """
+    counts = hits.sum(axis=0)
+    n_cells = max(len(hits), 1)
+    affected = None if population is None else (population @ hits).tolist()
+    rules = []
+    for bit, (rule, count) in enumerate(zip(rule_set.rules, counts.tolist())):
+        entry = {"bit": bit, **rule.to_dict(), "hits": int(count), "hit_fraction": round(count / n_cells, 4)}
+        if affected is not None:
+            entry["people_affected"] = int(round(affected[bit]))
+        rules.append(entry)
+    return rules, int(hits.any(axis=1).sum())
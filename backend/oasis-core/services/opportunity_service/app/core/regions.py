@@ -0,0 +1,213 @@
+"""
+Connected regions of same-category opportunity cells.
+
+The category grid is labelled in one pass with scipy's image labelling (4- or
+8-connectivity). Per-region areas and area-weighted metrics are bincounts over
+the label array, and each region's dissolved outline is traced from the cell
+edges on its boundary, so no polygon unions are involved.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .features import FeatureGrid, DEFAULT_THRESHOLDS, DEFAULT_WEIGHTS, categorize
+from .zonal import ZONAL_METRICS, cell_areas_km2, zonal_columns
+
+CATEGORIES = ("low", "medium", "high")
+
+# Neighbourhoods for ndimage.label (generate_binary_structure(2, 1) and (2, 2)):
+# 4 = shared edges only, 8 = edges or corners
+CONNECTIVITY = {
+    4: np.array([[0, 1, 0], [1, 1, 1], [0, 1, 0]], dtype=bool),
+    8: np.ones((3, 3), dtype=bool),
+}
+
+def label_regions(features: FeatureGrid, category: str = "low", connectivity: int = 4,
+                  weights: Sequence[float] = DEFAULT_WEIGHTS,
+                  thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> Tuple[np.ndarray, int]:
+    """(grid_size x grid_size) region labels, row 0 = southernmost cells, 0 = not in a region."""
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown category '{category}'. Use one of: {', '.join(CATEGORIES)}")
+    if connectivity not in CONNECTIVITY:
+        raise ValueError("Connectivity must be 4 or 8")
+    from scipy import ndimage
+    g = features.grid_size
+    mask = (categorize(features.score(weights), thresholds) == category).reshape(g, g)
+    labels, count = ndimage.label(mask, structure=CONNECTIVITY[connectivity])
+    return labels, count
+
+def _boundary_edges(labels: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Directed unit edges between each region and the outside, with the region on the
+    left: exteriors run counter-clockwise and holes clockwise (x = column, y = row).
+    """
+    padded = np.pad(labels, 1)
+    inner = padded[1:-1, 1:-1]
+    rows, cols = np.indices(labels.shape)
+    parts = []
+    # (neighbour view, start offset, end offset) for bottom, top, left and right edges
+    for neighbour, (x0, y0), (x1, y1) in (
+        (padded[:-2, 1:-1], (0, 0), (1, 0)),
+        (padded[2:, 1:-1], (1, 1), (0, 1)),
+        (padded[1:-1, :-2], (0, 1), (0, 0)),
+        (padded[1:-1, 2:], (1, 0), (1, 1)),
+    ):
+        on_edge = (inner > 0) & (inner != neighbour)
+        r, c = rows[on_edge], cols[on_edge]
+        parts.append((c + x0, r + y0, c + x1, r + y1, inner[on_edge]))
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+def _successors(sx, sy, ex, ey, lab, side: int) -> np.ndarray:
+    """Next edge of every boundary edge; at pinch corners take the left turn so rings stay simple."""
+    n_vertices = side * side
+    start_key = lab.astype(np.int64) * n_vertices + sy.astype(np.int64) * side + sx
+    end_key = lab.astype(np.int64) * n_vertices + ey.astype(np.int64) * side + ex
+    order = np.argsort(start_key, kind="stable")
+    sorted_keys = start_key[order]
+    lo = np.searchsorted(sorted_keys, end_key, side="left")
+    hi = np.searchsorted(sorted_keys, end_key, side="right")
+
+    first = order[lo]
+    second = order[np.minimum(lo + 1, len(order) - 1)]
+    dx, dy = ex - sx, ey - sy
+    # Left of (dx, dy) is (-dy, dx)
+    first_is_left = ((ex[first] - sx[first]) == -dy) & ((ey[first] - sy[first]) == dx)
+    return np.where((hi - lo > 1) & ~first_is_left, second, first)
+
+def _trace_rings(sx, sy, ex, ey, lab, successor) -> List[Tuple[int, np.ndarray]]:
+    """(label, closed vertex array) of every ring, with collinear vertices removed."""
+    visited = np.zeros(len(sx), dtype=bool)
+    rings = []
+    for start in range(len(sx)):
+        if visited[start]:
+            continue
+        chain = []
+        e = start
+        while not visited[e]:
+            visited[e] = True
+            chain.append(e)
+            e = successor[e]
+        chain = np.asarray(chain)
+        # Keep only vertices where the direction changes
+        dx, dy = ex[chain] - sx[chain], ey[chain] - sy[chain]
+        turn = (dx != np.roll(dx, 1)) | (dy != np.roll(dy, 1))
+        corners = chain[turn]
+        ring = np.column_stack([sx[corners], sy[corners]])
+        rings.append((int(lab[start]), np.vstack([ring, ring[:1]])))
+    return rings
+
+def _signed_area(ring: np.ndarray) -> float:
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+def _contains(ring: np.ndarray, x: float, y: float) -> bool:
+    """Even-odd point-in-ring test."""
+    x0, y0, x1, y1 = ring[:-1, 0], ring[:-1, 1], ring[1:, 0], ring[1:, 1]
+    spans = (y0 > y) != (y1 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return bool(np.count_nonzero(spans & (x < crossing)) % 2)
+
+def region_outlines(labels: np.ndarray) -> Dict[int, List[List[np.ndarray]]]:
+    """Per region label: polygons as [exterior, *holes] in grid units."""
+    if not labels.any():
+        return {}
+    sx, sy, ex, ey, lab = _boundary_edges(labels)
+    side = labels.shape[1] + 1
+    successor = _successors(sx, sy, ex, ey, lab, side)
+    exteriors: Dict[int, List[np.ndarray]] = {}
+    holes: Dict[int, List[np.ndarray]] = {}
+    for region, ring in _trace_rings(sx, sy, ex, ey, lab, successor):
+        (exteriors if _signed_area(ring) > 0 else holes).setdefault(region, []).append(ring)
+
+    polygons = {region: [[ring] for ring in rings] for region, rings in exteriors.items()}
+    for region, region_holes in holes.items():
+        for hole in region_holes:
+            parts = polygons[region]
+            target = 0
+            if len(parts) > 1:
+                # Centre of the outside cell to the right of the hole's first edge
+                (x0, y0), (x1, y1) = hole[0], hole[1]
+                step = np.sign([x1 - x0, y1 - y0])
+                px = x0 + step[0] * 0.5 + step[1] * 0.5
+                py = y0 + step[1] * 0.5 - step[0] * 0.5
+                target = next((k for k, part in enumerate(parts) if _contains(part[0], px, py)), 0)
+            parts[target].append(hole)
+    return polygons
+
+def _to_geojson(polygons: List[List[np.ndarray]], features: FeatureGrid) -> Dict:
+    lat_step, lon_step = features.steps
+    b = features.bounds
+
+    def lonlat(ring: np.ndarray) -> List[List[float]]:
+        lons = b["min_lon"] + ring[:, 0] * lon_step
+        lats = b["min_lat"] + ring[:, 1] * lat_step
+        return np.round(np.column_stack([lons, lats]), 7).tolist()
+
+    coordinates = [[lonlat(ring) for ring in polygon] for polygon in polygons]
+    if len(coordinates) == 1:
+        return {"type": "Polygon", "coordinates": coordinates[0]}
+    return {"type": "MultiPolygon", "coordinates": coordinates}
+
+def find_regions(features: FeatureGrid, category: str = "low", connectivity: int = 4,
+                 min_cells: int = 1, limit: int = 100, include_cells: bool = False) -> Dict:
+    """Connected regions of ``category`` cells, largest first, as a GeoJSON FeatureCollection."""
+    from scipy import ndimage
+    labels, count = label_regions(features, category, connectivity)
+    flat = labels.ravel()
+    n = count + 1
+
+    areas = cell_areas_km2(features, np.arange(features.n_cells))
+    cells = np.bincount(flat, minlength=n)
+    area = np.bincount(flat, weights=areas, minlength=n)
+    columns = zonal_columns(features)
+    means = {name: np.bincount(flat, weights=areas * columns[name], minlength=n) / np.maximum(area, 1e-12)
+             for name in ZONAL_METRICS}
+    index = np.arange(1, n)
+    minima = {name: np.asarray(ndimage.minimum(columns[name].reshape(labels.shape), labels, index)) for name in ZONAL_METRICS}
+    maxima = {name: np.asarray(ndimage.maximum(columns[name].reshape(labels.shape), labels, index)) for name in ZONAL_METRICS}
+    population = np.bincount(flat, weights=features.population, minlength=n)
+
+    kept = index[cells[1:] >= min_cells]
+    kept = kept[np.argsort(-area[kept], kind="stable")][:limit]
+
+    outlines = region_outlines(np.where(np.isin(labels, kept), labels, 0))
+    if include_cells:
+        # Cell indices grouped by label once; group k holds the cells of label k in id order
+        members = np.split(np.argsort(flat, kind="stable"), np.cumsum(cells)[:-1])
+    regions = []
+    for rank, region in enumerate(kept, start=1):
+        properties = {
+            "region_id": rank,
+            "cells": int(cells[region]),
+            "area_km2": round(float(area[region]), 4),
+            "estimated_population": int(round(float(population[region]))),
+            "aggregates": {
+                name: {
+                    "mean": round(float(means[name][region]), 4),
+                    "min": round(float(minima[name][region - 1]), 4),
+                    "max": round(float(maxima[name][region - 1]), 4)
+                }
+                for name in ZONAL_METRICS
+            }
+        }
+        if include_cells:
+            properties["cell_ids"] = (members[region] + 1).tolist()
+        regions.append({
+            "type": "Feature",
+            "id": rank,
+            "properties": properties,
+            "geometry": _to_geojson(outlines[region], features)
+        })
+
+    return {
+        "type": "FeatureCollection",
+        "features": regions,
+        "metadata": {
+            "category": category,
+            "connectivity": connectivity,
+            "total_regions": int(count),
+            "regions_returned": len(regions),
+            "cells_in_category": int(cells[1:].sum())
+        }
+    }
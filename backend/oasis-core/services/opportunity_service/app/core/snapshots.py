@@ -0,0 +1,90 @@
+"""
+Versioned snapshots of served opportunity grids, for delta responses.
+
+Each snapshot holds the per-cell properties exactly as they are served, and
+its version is a hash of their contents. The last few snapshots of every
+(city, grid size) series are kept in a ring buffer. A client that holds
+version ``v`` gets only the cells whose served values differ from ``v``,
+found by comparing the arrays of the two snapshots, plus the ids of cells that
+no longer exist.
+"""
+import hashlib
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from .config import settings
+
+class GridSnapshot:
+    def __init__(self, cell_ids: np.ndarray, columns: Dict[str, np.ndarray],
+                 version: Optional[str] = None, created_at: Optional[str] = None):
+        self.cell_ids = np.asarray(cell_ids, dtype=np.int64)
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        # A version computed earlier (e.g. stored in a bake bundle) is trusted as given
+        self.version = version or self.content_version(self.cell_ids, self.columns)
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat()
+
+    @staticmethod
+    def content_version(cell_ids: np.ndarray, columns: Dict[str, np.ndarray]) -> str:
+        digest = hashlib.sha1(cell_ids.tobytes())
+        for name in sorted(columns):
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(columns[name]).tobytes())
+        return digest.hexdigest()[:16]
+
+    @property
+    def nbytes(self) -> int:
+        return self.cell_ids.nbytes + sum(a.nbytes for a in self.columns.values())
+
+def diff_snapshots(old: GridSnapshot, new: GridSnapshot) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (positions in ``new`` of cells added or changed since ``old``, ids of cells
+    dropped since ``old``).
+    """
+    if np.array_equal(old.cell_ids, new.cell_ids):
+        changed = np.zeros(len(new.cell_ids), dtype=bool)
+        for name, values in new.columns.items():
+            changed |= old.columns[name] != values
+        return np.nonzero(changed)[0], np.empty(0, dtype=np.int64)
+
+    _, old_pos, new_pos = np.intersect1d(old.cell_ids, new.cell_ids, assume_unique=True, return_indices=True)
+    changed = np.ones(len(new.cell_ids), dtype=bool)
+    same = np.ones(len(new_pos), dtype=bool)
+    for name, values in new.columns.items():
+        same &= old.columns[name][old_pos] == values[new_pos]
+    changed[new_pos[same]] = False
+    tombstones = np.setdiff1d(old.cell_ids, new.cell_ids, assume_unique=True)
+    return np.nonzero(changed)[0], tombstones
+
+class SnapshotStore:
+    """Ring buffer of recent snapshots per series."""
+
+    def __init__(self, history: int):
+        self.history = history
+        self._series: Dict[Hashable, Deque[GridSnapshot]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, series: Hashable, snapshot: GridSnapshot) -> GridSnapshot:
+        """Append ``snapshot`` unless it matches the latest one; returns the current snapshot."""
+        with self._lock:
+            ring = self._series.setdefault(series, deque(maxlen=self.history))
+            if ring and ring[-1].version == snapshot.version:
+                return ring[-1]
+            ring.append(snapshot)
+            return snapshot
+
+    def get(self, series: Hashable, version: str) -> Optional[GridSnapshot]:
+        with self._lock:
+            for snapshot in self._series.get(series, ()):
+                if snapshot.version == version:
+                    return snapshot
+        return None
+
+    def versions(self, series: Hashable):
+        with self._lock:
+            return [s.version for s in self._series.get(series, ())]
+
+snapshot_store = SnapshotStore(settings.snapshot_history)
@@ -0,0 +1,153 @@
+"""
+Native-resolution (~500 m) opportunity surface.
+
+The three scoring features are computed for every VNP46A3 pixel of a city cube
+instead of per grid cell: housing pressure from nighttime lights, food access
+from the distance-to-cropland raster, and transport access from a
+rasterized OSM road-length grid. Everything is whole-array numpy, so a surface
+costs a few array passes regardless of how many pixels it holds.
+"""
+import hashlib
+import io
+import json
+import logging
+import struct
+import zlib
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from .cache import LRUCache
+from .config import settings
+from .distance import food_distance_km
+from .features import DEFAULT_WEIGHTS, FOOD_DISTANCE_CUTOFF_KM, ROAD_DENSITY_FULL_SCORE, normalize_weights
+from .grid import M_PER_DEGREE, pixel_coords, pixel_steps
+
+logger = logging.getLogger(__name__)
+
+# Rendered rasters keyed by (data fingerprint, weights, format)
+render_cache = LRUCache(settings.raster_cache_size)
+
+def pixel_areas_m2(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Area of each pixel row (column vector, broadcastable over the raster)."""
+    dlat, dlon = pixel_steps(lats, lons)
+    return ((dlat * M_PER_DEGREE) * (dlon * M_PER_DEGREE * np.cos(np.radians(lats))))[:, None]
+
+def raster_bounds(lats: np.ndarray, lons: np.ndarray) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of the pixel edges."""
+    dlat, dlon = pixel_steps(lats, lons)
+    return (float(lons.min()) - dlon / 2, float(lats.min()) - dlat / 2,
+            float(lons.max()) + dlon / 2, float(lats.max()) + dlat / 2)
+
+class PixelFeatures:
+    """(3, H, W) float32 feature stack aligned with the city's NTL pixel grid."""
+
+    def __init__(self, stack: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                 sources: Dict, fingerprint: str):
+        self.stack = stack
+        self.lats = lats
+        self.lons = lons
+        self.sources = sources
+        self.fingerprint = fingerprint
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.stack.shape[1:]
+
+    @property
+    def nbytes(self) -> int:
+        return self.stack.nbytes
+
+    def surface(self, weights: Sequence[float] = DEFAULT_WEIGHTS) -> np.ndarray:
+        w = normalize_weights(weights).astype(np.float32)
+        return np.tensordot(w, self.stack, axes=1)
+
+def build_pixel_features(city_data) -> PixelFeatures:
+    ntl = city_data.raster("ntl")
+    if ntl is None:
+        raise ValueError(f"No nighttime lights cube for '{city_data.city.key}' - native raster unavailable")
+    lats, lons = pixel_coords(city_data.rasters, city_data.city.bounds)
+
+    housing = np.minimum(np.asarray(ntl, dtype=np.float32) / 100.0, 1.0)
+
+    food_km = food_distance_km(city_data.rasters, city_data.city.bounds)
+    if food_km is None:
+        food_km = 3.0 + housing * 4.0
+    food_access = np.maximum(0.0, 1.0 - food_km / FOOD_DISTANCE_CUTOFF_KM)
+
+    roads = None
+    try:
+        from .nasa_data_reader import get_nasa_reader
+        b = city_data.city.bounds
+        roads = get_nasa_reader().road_length_raster(b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"], lats, lons)
+    except Exception as e:
+        logger.warning(f"Road raster unavailable for '{city_data.city.key}': {e}")
+    if roads is not None:
+        transport = np.minimum(1.0, roads / pixel_areas_m2(lats, lons) / ROAD_DENSITY_FULL_SCORE)
+    else:
+        transport = 0.5 + housing * 0.4
+
+    stack = np.stack([food_access, transport, 1.0 - housing]).astype(np.float32)
+    sources = {"ntl": True, "land_cover": city_data.raster("lc_aligned") is not None, "roads": roads is not None}
+    fingerprint_src = {
+        "city": city_data.city.key,
+        "built_at": city_data.meta.get("built_at"),
+        "sources": city_data.meta.get("sources"),
+        "shapes": city_data.meta.get("shapes"),
+        "loaded": sources
+    }
+    fingerprint = hashlib.sha1(json.dumps(fingerprint_src, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return PixelFeatures(stack, lats, lons, sources, fingerprint)
+
+def get_pixel_features(city_data) -> PixelFeatures:
+    """Pixel feature stack for a resident city, built once and cached on it."""
+    return city_data.derive(("pixels",), lambda: build_pixel_features(city_data))
+
+# Red (low) -> yellow -> green (high), matching the category colours of the map
+_RAMP_STOPS = np.array([0.0, 0.5, 1.0])
+_RAMP_RGB = np.array([[215, 48, 39], [254, 224, 139], [26, 152, 80]], dtype=np.float64)
+
+def colorize(surface: np.ndarray) -> np.ndarray:
+    """RGBA uint8 image of a [0, 1] surface; non-finite pixels are transparent."""
+    valid = np.isfinite(surface)
+    values = np.clip(np.where(valid, surface, 0.0), 0.0, 1.0)
+    rgba = np.empty(surface.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(values, _RAMP_STOPS, _RAMP_RGB[:, channel]).astype(np.uint8)
+    rgba[..., 3] = np.where(valid, 255, 0)
+    return rgba
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    h, w, _ = rgba.shape
+    # Filter type 0 (None) prefixed to every scanline
+    scanlines = np.concatenate([np.zeros((h, 1), dtype=np.uint8), rgba.reshape(h, w * 4)], axis=1)
+    return (b"\x89PNG\r\n\x1a\n"
+            + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0))
+            + _png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6))
+            + _png_chunk(b"IEND", b""))
+
+def encode_npz(surface: np.ndarray, lats: np.ndarray, lons: np.ndarray, weights: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, opportunity=surface.astype(np.float32), lats=lats, lons=lons, weights=weights)
+    return buffer.getvalue()
+
+def render_surface(pixels: PixelFeatures, weights: Sequence[float] = DEFAULT_WEIGHTS,
+                   fmt: str = "png") -> Tuple[bytes, bool]:
+    """Encoded surface for ``weights`` (cached per data fingerprint) and whether it was a cache hit."""
+    w = normalize_weights(weights)
+    key = (pixels.fingerprint, tuple(np.round(w, 6).tolist()), fmt)
+
+    def render() -> bytes:
+        surface = pixels.surface(w)
+        if fmt == "png":
+            # Images are drawn north-up
+            north_up = surface if pixels.lats[0] >= pixels.lats[-1] else surface[::-1]
+            return encode_png(colorize(north_up))
+        if fmt == "npz":
+            return encode_npz(surface, pixels.lats, pixels.lons, w)
+        raise ValueError(f"Unsupported raster format '{fmt}'")
+
+    return render_cache.get_or_create(key, render)
@@ -0,0 +1,166 @@
+"""
+Stage spans and latency histograms for the opportunity pipeline.
+
+Code wraps each pipeline stage (catalog lookup, HDF read, scale/mask, subset,
+aggregate, OSM fetch/overlay, scoring, serialization) in ``stage(name)``. The
+span records its duration and, where the stage sets it, the bytes it handled.
+Every span is added to a process-wide histogram per stage name, served by
+``GET /metrics``. Spans are also appended to the trace of the current request,
+when there is one; the HTTP middleware opens a trace per request and, for
+requests sending ``X-Debug-Timing``, returns it as a ``Server-Timing`` header.
+
+Histogram buckets are fixed (as in Prometheus), so observing is a bisect and an
+increment under a lock, and quantiles are interpolated within a bucket.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Upper bounds (ms) of the duration buckets; one more bucket counts everything slower
+DURATION_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Request header asking for the request's spans in a Server-Timing response header
+DEBUG_HEADER = "X-Debug-Timing"
+
+class Span:
+    """One timed run of a stage; ``nbytes`` is filled in by the stage when it knows it."""
+    __slots__ = ("name", "duration_ms", "nbytes")
+
+    def __init__(self, name: str, nbytes: int = 0):
+        self.name = name
+        self.duration_ms = 0.0
+        self.nbytes = nbytes
+
+class StageHistogram:
+    def __init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.bytes_total = 0
+
+    def observe(self, duration_ms: float, nbytes: int = 0):
+        self.buckets[bisect.bisect_left(DURATION_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.sum_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.bytes_total += nbytes
+
+    def quantile(self, q: float) -> float:
+        """Estimated ``q`` quantile (ms), interpolated linearly inside its bucket."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for k, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = DURATION_BUCKETS_MS[k - 1] if k > 0 else 0.0
+                upper = DURATION_BUCKETS_MS[k] if k < len(DURATION_BUCKETS_MS) else self.max_ms
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max_ms)
+            seen += n
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 3),
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "bytes_total": self.bytes_total,
+            "buckets_ms": dict(zip([str(b) for b in DURATION_BUCKETS_MS] + ["+Inf"], self.buckets)),
+        }
+
+class StageMetrics:
+    """Histograms of every stage seen in this process, keyed by stage name."""
+
+    def __init__(self):
+        self._stages: Dict[str, StageHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, span: Span):
+        with self._lock:
+            histogram = self._stages.get(span.name)
+            if histogram is None:
+                histogram = self._stages[span.name] = StageHistogram()
+            histogram.observe(span.duration_ms, span.nbytes)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: h.to_dict() for name, h in sorted(self._stages.items())}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the stage histograms (durations in seconds)."""
+        lines = [
+            "# HELP opportunity_stage_duration_seconds Duration of opportunity pipeline stages",
+            "# TYPE opportunity_stage_duration_seconds histogram",
+        ]
+        totals = []
+        with self._lock:
+            for name, h in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, n in zip(DURATION_BUCKETS_MS, h.buckets):
+                    cumulative += n
+                    lines.append(f'opportunity_stage_duration_seconds_bucket{{stage="{name}",le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'opportunity_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'opportunity_stage_duration_seconds_sum{{stage="{name}"}} {h.sum_ms / 1000:.6f}')
+                lines.append(f'opportunity_stage_duration_seconds_count{{stage="{name}"}} {h.count}')
+                totals.append(f'opportunity_stage_bytes_total{{stage="{name}"}} {h.bytes_total}')
+        lines += ["# HELP opportunity_stage_bytes_total Bytes handled by opportunity pipeline stages",
+                  "# TYPE opportunity_stage_bytes_total counter"] + totals
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+stage_metrics = StageMetrics()
+
+# Spans of the request being handled; None outside a request
+_trace: contextvars.ContextVar[Optional[List[Span]]] = contextvars.ContextVar("stage_trace", default=None)
+
+@contextmanager
+def stage(name: str, nbytes: int = 0) -> Iterator[Span]:
+    """Time the enclosed block as one span of stage ``name``."""
+    span = Span(name, nbytes)
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span.duration_ms = (time.perf_counter() - start) * 1000
+        stage_metrics.observe(span)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append(span)
+
+def start_trace() -> contextvars.Token:
+    """Collect the spans of the current request (and the tasks it starts) from here on."""
+    return _trace.set([])
+
+def end_trace(token: contextvars.Token) -> List[Span]:
+    spans = _trace.get() or []
+    _trace.reset(token)
+    return spans
+
+def server_timing(spans: List[Span], total_ms: Optional[float] = None) -> str:
+    """``Server-Timing`` header value: one entry per stage, repeated spans summed."""
+    merged: Dict[str, List] = {}
+    for span in spans:
+        entry = merged.setdefault(span.name, [0.0, 0, 0])
+        entry[0] += span.duration_ms
+        entry[1] += span.nbytes
+        entry[2] += 1
+    parts = []
+    for name, (duration_ms, nbytes, count) in merged.items():
+        desc = [f"{count}x"] if count > 1 else []
+        if nbytes:
+            desc.append(f"{nbytes} B")
+        parts.append(f"{name};dur={duration_ms:.3f}" + (f';desc="{", ".join(desc)}"' if desc else ""))
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.3f}")
+    return ", ".join(parts)
@@ -0,0 +1,222 @@
+"""
+Point and polygon zonal aggregation over an opportunity FeatureGrid.
+
+Points resolve to a cell arithmetically. Polygons are rasterized once onto a
+supersampled copy of the cell grid (scanline, even-odd rule, so holes and
+multipolygons work) and reduced to per-cell coverage fractions. Those masks are
+cached by geometry hash, so repeated queries for the same zone are a weighted
+sum over a handful of cells.
+"""
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache import LRUCache
+from .config import settings
+from .features import FeatureGrid, DEFAULT_WEIGHTS, categorize
+from .grid import KM_PER_DEGREE
+
+# Sub-samples per cell side when rasterizing polygons
+SUPERSAMPLE = 8
+
+# Sample rows rasterized together; crossings are held for one band at a time
+BAND_SAMPLE_ROWS = 64
+
+# Per-cell metrics aggregated over a zone
+ZONAL_METRICS = (
+    "opportunity_score",
+    "housing_pressure_score",
+    "transport_access_score",
+    "food_access_distance_km",
+    "avg_nighttime_light",
+    "population_density",
+)
+
+class ZoneMask:
+    """Cells touched by a zone and the fraction of each cell's area inside it."""
+
+    def __init__(self, indices: np.ndarray, coverage: np.ndarray, geometry_hash: str):
+        self.indices = indices
+        self.coverage = coverage
+        self.geometry_hash = geometry_hash
+
+    @property
+    def nbytes(self) -> int:
+        return self.indices.nbytes + self.coverage.nbytes
+
+# Rasterized masks keyed by grid spec and geometry hash
+mask_cache = LRUCache(settings.zone_mask_cache_size)
+
+def geometry_hash(geometry: Dict) -> str:
+    canonical = json.dumps(geometry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+def _grid_key(features: FeatureGrid) -> Tuple:
+    b = features.bounds
+    return (b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"], features.grid_size)
+
+def _rings(geometry: Dict) -> List[np.ndarray]:
+    if geometry.get("type") == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        raise ValueError("Zone geometry must be a GeoJSON Point, Polygon or MultiPolygon")
+    rings = []
+    for polygon in polygons:
+        for ring in polygon:
+            coords = np.asarray(ring, dtype=np.float64)[:, :2]
+            if len(coords) < 3:
+                raise ValueError("Polygon rings need at least 3 positions")
+            rings.append(coords)
+    if not rings:
+        raise ValueError("Polygon has no rings")
+    return rings
+
+def rasterize_polygon(features: FeatureGrid, geometry: Dict, supersample: int = SUPERSAMPLE) -> ZoneMask:
+    """Per-cell coverage fractions of a (Multi)Polygon on the feature grid."""
+    rings = _rings(geometry)
+    h = geometry_hash(geometry)
+
+    all_coords = np.vstack(rings)
+    bbox = (all_coords[:, 0].min(), all_coords[:, 1].min(), all_coords[:, 0].max(), all_coords[:, 1].max())
+    window = features.bbox_window(bbox)
+    if window is None:
+        return ZoneMask(np.empty(0, dtype=np.int64), np.empty(0), h)
+    row_min, row_max, col_min, col_max = window
+    n_rows, n_cols = row_max - row_min + 1, col_max - col_min + 1
+
+    lat_step, lon_step = features.steps
+    ys = features.bounds["min_lat"] + (row_min + (np.arange(n_rows * supersample) + 0.5) / supersample) * lat_step
+    xs = features.bounds["min_lon"] + (col_min + (np.arange(n_cols * supersample) + 0.5) / supersample) * lon_step
+
+    # Every ring edge with the sample rows it crosses: those with ymin <= y < ymax.
+    # Horizontal edges (and closing edges of already-closed rings) cross none
+    starts = np.vstack(rings)
+    ends = np.vstack([np.roll(r, -1, axis=0) for r in rings])
+    x0, y0, x1, y1 = starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1]
+    first = np.searchsorted(ys, np.minimum(y0, y1), side="left")
+    stop = np.searchsorted(ys, np.maximum(y0, y1), side="left")
+    # Edge table sorted by first row, so the edges starting before a band are a prefix
+    order = np.argsort(first, kind="stable")
+    x0, y0, x1, y1, first, stop = (a[order] for a in (x0, y0, x1, y1, first, stop))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (x1 - x0) / (y1 - y0)
+
+    coverage = np.empty((n_rows, n_cols))
+    # Bands of cell rows bound the crossings held at once to (active edges x band rows)
+    band = max(1, BAND_SAMPLE_ROWS // supersample)
+    for band_start in range(0, n_rows, band):
+        band_rows = min(band, n_rows - band_start)
+        lo, hi = band_start * supersample, (band_start + band_rows) * supersample
+        active = np.nonzero(stop[:np.searchsorted(first, hi, side="left")] > lo)[0]
+        row_from = np.maximum(first[active], lo)
+        counts = np.minimum(stop[active], hi) - row_from
+        edge = np.repeat(active, counts)
+        # Sample row of every (edge, row) crossing, edge by edge
+        row = np.repeat(row_from - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        x = x0[edge] + (ys[row] - y0[edge]) * slope[edge]
+        by_row = np.lexsort((x, row))
+        row, x = row[by_row] - lo, x[by_row]
+        bounds = np.searchsorted(row, np.arange(hi - lo + 1))
+
+        inside = np.empty((hi - lo, len(xs)), dtype=bool)
+        for r in range(hi - lo):
+            # Even-odd rule: inside if an odd number of crossings lie left of the sample
+            inside[r] = np.searchsorted(x[bounds[r]:bounds[r + 1]], xs, side="right") % 2 == 1
+        coverage[band_start:band_start + band_rows] = (
+            inside.reshape(band_rows, supersample, n_cols, supersample).mean(axis=(1, 3))
+        )
+
+    rows, cols = np.nonzero(coverage)
+    indices = (rows + row_min) * features.grid_size + (cols + col_min)
+    return ZoneMask(indices.astype(np.int64), coverage[rows, cols], h)
+
+def zone_mask(features: FeatureGrid, geometry: Dict) -> Tuple[ZoneMask, bool]:
+    """Cached rasterization of ``geometry``; the flag tells whether it was a cache hit."""
+    key = _grid_key(features) + (geometry_hash(geometry),)
+    return mask_cache.get_or_create(key, lambda: rasterize_polygon(features, geometry))
+
+def point_to_cell(features: FeatureGrid, lon: float, lat: float) -> Optional[int]:
+    b = features.bounds
+    if not (b["min_lon"] <= lon <= b["max_lon"] and b["min_lat"] <= lat <= b["max_lat"]):
+        return None
+    lat_step, lon_step = features.steps
+    g = features.grid_size
+    row = min(int((lat - b["min_lat"]) / lat_step), g - 1)
+    col = min(int((lon - b["min_lon"]) / lon_step), g - 1)
+    return row * g + col
+
+def cell_areas_km2(features: FeatureGrid, indices: np.ndarray) -> np.ndarray:
+    lat_step, lon_step = features.steps
+    rows = indices // features.grid_size
+    center_lat = features.bounds["min_lat"] + (rows + 0.5) * lat_step
+    return (lat_step * KM_PER_DEGREE) * (lon_step * KM_PER_DEGREE * np.cos(np.radians(center_lat)))
+
+def zonal_columns(features: FeatureGrid) -> Dict[str, np.ndarray]:
+    """Every aggregated per-cell metric, keyed as in ZONAL_METRICS."""
+    return {
+        "opportunity_score": features.score(DEFAULT_WEIGHTS),
+        "housing_pressure_score": features.housing_pressure,
+        "transport_access_score": features.transport_score,
+        "food_access_distance_km": features.food_distance_km,
+        "avg_nighttime_light": features.avg_nighttime_light,
+        "population_density": features.population_density,
+    }
+
+def zonal_stats(features: FeatureGrid, geometry: Dict, include_cells: bool = False) -> Dict:
+    """Area-weighted aggregates of every per-cell metric over a point or (Multi)Polygon."""
+    if geometry.get("type") == "Point":
+        lon, lat = geometry["coordinates"][:2]
+        index = point_to_cell(features, float(lon), float(lat))
+        if index is None:
+            raise ValueError("Point lies outside the city grid")
+        mask, cached = ZoneMask(np.array([index]), np.array([1.0]), geometry_hash(geometry)), False
+    else:
+        mask, cached = zone_mask(features, geometry)
+
+    zone = {
+        "type": geometry["type"],
+        "geometry_hash": mask.geometry_hash,
+        "mask_cached": cached,
+        "cells_touched": int(len(mask.indices))
+    }
+    if len(mask.indices) == 0:
+        zone["area_km2"] = 0.0
+        return {"zone": zone, "aggregates": None}
+
+    idx = mask.indices
+    areas = cell_areas_km2(features, idx) * mask.coverage
+    weights = areas / areas.sum()
+
+    columns = zonal_columns(features)
+    scores = columns["opportunity_score"]
+    aggregates = {}
+    for name in ZONAL_METRICS:
+        values = columns[name][idx]
+        aggregates[name] = {
+            "mean": round(float(weights @ values), 4),
+            "min": round(float(values.min()), 4),
+            "max": round(float(values.max()), 4)
+        }
+
+    categories = categorize(scores[idx])
+    category_share = {c: round(float(weights[categories == c].sum()), 4) for c in ("low", "medium", "high")}
+
+    zone["area_km2"] = round(float(areas.sum()), 4)
+    result = {
+        "zone": zone,
+        "aggregates": aggregates,
+        "category_area_share": category_share,
+        "category": str(categorize(np.array([aggregates["opportunity_score"]["mean"]]))[0]),
+        # Cells count their people in proportion to the share of their area inside the zone
+        "estimated_population": int(round(float(mask.coverage @ features.population[idx])))
+    }
+    if include_cells:
+        result["cells"] = [
+            {"cell_id": int(i) + 1, "coverage": round(float(c), 4)}
+            for i, c in zip(idx, mask.coverage)
+        ]
+    return result
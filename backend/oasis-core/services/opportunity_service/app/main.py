@@ -1,8 +1,18 @@
+# Profile the service's own import (see app/core/importtime.py) before anything heavy loads
+from app.core.importtime import import_profiler
+import_profiler.start()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.opportunity import router as opportunity_router
+from app.api.cities import router as cities_router
+from app.api.metrics import router as metrics_router
 from app.core.config import settings
+from app.core.telemetry import DEBUG_HEADER, end_trace, server_timing, start_trace
 import logging
+import time
+
+import_profiler.stop()
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +26,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(opportunity_router, prefix="/api/v1/dhaka", tags=["opportunity"])
+app.include_router(metrics_router, tags=["metrics"])
+app.include_router(cities_router, prefix="/api/v1", tags=["cities"])
+app.include_router(opportunity_router, prefix="/api/v1/{city}", tags=["opportunity"])
+
+@app.middleware("http")
+async def stage_timing(request, call_next):
+    """Collect the request's stage spans; return them as Server-Timing when X-Debug-Timing is sent."""
+    token = start_trace()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        spans = end_trace(token)
+    if request.headers.get(DEBUG_HEADER):
+        response.headers["Server-Timing"] = server_timing(spans, (time.perf_counter() - start) * 1000)
+    return response
 
 @app.on_event("startup")
 async def startup():
     print("\n" + "=" * 80)
     print(f"🚀 {settings.app_name} Starting...")
     print("=" * 80)
+    report_import_time()
     
     # Check data source availability
     try:
         from app.core.data_processor import NASA_DATA_AVAILABLE
-        from app.core.nasa_data_reader import OSMNX_AVAILABLE
+        from app.core.nasa_data_reader import osmnx_available
         
         if NASA_DATA_AVAILABLE:
             print("✅ NASA Data Reader: AVAILABLE")
@@ -36,7 +62,7 @@ async def startup():
         else:
             print("⚠️  NASA Data Reader: NOT AVAILABLE")
         
-        if OSMNX_AVAILABLE:
+        if osmnx_available():
             print("✅ OSMnx Transport Network: AVAILABLE")
             print("   - OpenStreetMap road data will be downloaded")
         else:
@@ -45,10 +71,45 @@ async def startup():
     except Exception as e:
         print(f"⚠️  Could not check data sources: {e}")
     
+    if settings.use_bake:
+        load_bake_bundle()
+    
+    from app.core.cities import list_cities
+    print(f"🏙️  Cities: {', '.join(c.key for c in list_cities())} (cache budget {settings.city_cache_budget_mb} MB)")
     print("=" * 80)
     print(f"Service ready on port {settings.port}")
     print("=" * 80 + "\n")
 
+def report_import_time():
+    """Print the slowest modules of the service import, cumulative (self) ms."""
+    if settings.import_report_top <= 0:
+        return
+    print(f"⏱️  Service import: {import_profiler.total_s * 1000:.0f} ms")
+    for row in import_profiler.report(settings.import_report_top):
+        print(f"   {row['cumulative_ms']:8.1f} ms  ({row['self_ms']:6.1f} self)  {row['module']}")
+
+def load_bake_bundle():
+    """Memory-map the active bake bundle and make its cities resident before the first request."""
+    from app.core.bake import load_current_bundle
+    from app.core.cities import city_store, get_city
+    
+    start = time.perf_counter()
+    try:
+        bundle = load_current_bundle(settings.bake_dir)
+    except Exception as e:
+        print(f"⚠️  Bake bundle unusable, computing on demand: {e}")
+        return
+    if bundle is None:
+        print("📦 No bake bundle - cities are computed on first request (see bake_bundle.py)")
+        return
+    
+    city_store.bundle = bundle
+    mapped = [key for key in bundle.cities if get_city(key) is not None]
+    for key in mapped:
+        city_store.get(get_city(key))
+    print(f"📦 Bake bundle {bundle.bundle_id}: {', '.join(mapped)} at grid sizes "
+          f"{', '.join(map(str, bundle.manifest['grid_sizes']))} mapped in {(time.perf_counter() - start) * 1000:.0f} ms")
+
 @app.get("/")
 async def root():
     from app.core.data_processor import NASA_DATA_AVAILABLE
@@ -57,8 +118,10 @@ async def root():
         "status": "running",
         "nasa_data_available": NASA_DATA_AVAILABLE,
         "endpoints": [
-            "/api/v1/dhaka/opportunity_index",
-            "/api/v1/dhaka/opportunity_index/cell/{cell_id}",
+            "/api/v1/cities",
+            "/api/v1/{city}/opportunity_index",
+            "/api/v1/{city}/opportunity_index/cell/{cell_id}",
+            "/metrics",
             "/health"
         ]
     }
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Bake the opportunity pipeline for the configured cities into a bundle the service maps at startup."""
+
+import argparse
+import sys
+import time
+
+from app.core.bake import write_bundle
+from app.core.cities import get_city, list_cities
+from app.core.config import settings
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("cities", nargs="*", help=f"Cities to bake (default: all of {', '.join(c.key for c in list_cities())})")
+    parser.add_argument("-g", "--grid-sizes", default=",".join(str(g) for g in settings.bake_grid_sizes),
+                        help="Comma-separated grid sizes (default %(default)s)")
+    parser.add_argument("-o", "--output", default=settings.bake_dir, help="Bake directory (default %(default)s)")
+    parser.add_argument("--no-activate", action="store_true", help="Write the bundle without pointing CURRENT at it")
+    args = parser.parse_args()
+
+    cities = []
+    for key in args.cities or [c.key for c in list_cities()]:
+        city = get_city(key)
+        if city is None:
+            print(f"❌ Unknown city '{key}'")
+            return 1
+        cities.append(city)
+    try:
+        grid_sizes = [int(g) for g in args.grid_sizes.split(",")]
+    except ValueError:
+        print(f"❌ Grid sizes must be integers: {args.grid_sizes}")
+        return 1
+    if any(not 1 <= g <= settings.max_grid_size for g in grid_sizes):
+        print(f"❌ Grid sizes must be between 1 and {settings.max_grid_size}")
+        return 1
+
+    start = time.perf_counter()
+    path = write_bundle(cities, grid_sizes, args.output, activate=not args.no_activate)
+    print(f"✅ Baked {', '.join(c.key for c in cities)} at grid sizes {', '.join(map(str, sorted(set(grid_sizes))))} "
+          f"into {path} in {time.perf_counter() - start:.1f}s")
+    print("   Active: CURRENT unchanged (--no-activate)" if args.no_activate else "   Active: yes (CURRENT updated)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
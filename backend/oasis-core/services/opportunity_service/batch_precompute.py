@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Precompute the opportunity pipeline for every city x grid size x month on a process pool."""
+
+import argparse
+import sys
+
+from app.core.batch import expand_matrix, run_batch
+from app.core.cities import get_city, list_cities
+from app.core.config import settings
+
+def print_unit(entry):
+    mark = {"done": "✅", "skipped": "⏭️ ", "failed": "❌"}[entry["status"]]
+    line = f"{mark} {entry['city']:<12} {entry['month']}  g{entry['grid_size']:<4} {entry['seconds']:8.2f}s"
+    if entry["status"] == "done":
+        stages = "  ".join(f"{name[:-3]} {ms:.0f}ms" for name, ms in entry["stages"].items())
+        line += f"  {stages}  peak {entry['peak_rss_mb']:.0f} MB (pid {entry['pid']})"
+    elif entry["status"] == "failed":
+        line += f"  {entry['error']}"
+    print(line, flush=True)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("cities", nargs="*", help=f"Cities to compute (default: all of {', '.join(c.key for c in list_cities())})")
+    parser.add_argument("-g", "--grid-sizes", default=",".join(str(g) for g in settings.bake_grid_sizes),
+                        help="Comma-separated grid sizes (default %(default)s)")
+    parser.add_argument("-m", "--months", default="all",
+                        help="Comma-separated YYYY-MM months, 'latest', or 'all' catalogued months (default %(default)s)")
+    parser.add_argument("-j", "--workers", type=int, default=settings.batch_workers,
+                        help="Worker processes (default %(default)s: one per CPU)")
+    parser.add_argument("-o", "--output", default=settings.batch_dir, help="Batch directory (default %(default)s)")
+    parser.add_argument("--force", action="store_true", help="Recompute units that are already done")
+    parser.add_argument("--dry-run", action="store_true", help="List the units without running them")
+    args = parser.parse_args()
+
+    cities = []
+    for key in args.cities or [c.key for c in list_cities()]:
+        city = get_city(key)
+        if city is None:
+            print(f"❌ Unknown city '{key}'")
+            return 1
+        cities.append(city)
+    try:
+        grid_sizes = [int(g) for g in args.grid_sizes.split(",")]
+    except ValueError:
+        print(f"❌ Grid sizes must be integers: {args.grid_sizes}")
+        return 1
+    if any(not 1 <= g <= settings.max_grid_size for g in grid_sizes):
+        print(f"❌ Grid sizes must be between 1 and {settings.max_grid_size}")
+        return 1
+
+    try:
+        if args.months == "latest":
+            units = expand_matrix(cities, grid_sizes)
+            latest = {}
+            for unit in units:
+                latest[unit.city] = max(latest.get(unit.city, unit.month), unit.month)
+            units = [u for u in units if u.month == latest[u.city]]
+        else:
+            units = expand_matrix(cities, grid_sizes, None if args.months == "all" else args.months.split(","))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if not units:
+        print("⚠️  No units: no catalogued VNP46A3 granules for these cities and months")
+        return 1
+
+    print(f"📋 {len(units)} units: {len(cities)} cities x {len(set(grid_sizes))} grid sizes x "
+          f"{len({u.month for u in units})} months -> {args.output}")
+    if args.dry_run:
+        for unit in units:
+            print(f"   {unit.key}")
+        return 0
+
+    report = run_batch(units, args.output, workers=args.workers, force=args.force, progress=print_unit)
+    print(f"\n{report['done']} done, {report['skipped']} skipped, {report['failed']} failed "
+          f"in {report['wall_seconds']:.1f}s wall ({report['unit_seconds']:.1f}s of unit time on {report['workers']} workers)")
+    print(f"   Report: {args.output}/reports/{report['run_id']}.json")
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
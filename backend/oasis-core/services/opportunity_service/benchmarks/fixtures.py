@@ -0,0 +1,139 @@
+"""
+Synthetic NASA granules and road network for the opportunity pipeline benchmarks.
+
+- VNP46A3: one 2400x2400 uint16 tile (10 x 10 degrees, 15 arc-seconds) with the
+  HDF-EOS dataset path, lat/lon vectors, scale/offset/fill attributes and gzip
+  chunking of the real product. Radiance is a few Gaussian "city" peaks plus noise.
+- MCD12Q1: 2400x2400 LC_Type1 tiles in HDF4 for every sinusoidal tile the city
+  window (plus the food search margin) touches. Needs pyhdf; skipped otherwise.
+- Roads: a jittered street lattice, delivered as the 25 m road pieces the reader
+  bins into cells and pixels, so transport runs without osmnx or a download.
+"""
+from pathlib import Path
+from typing import Dict, Tuple
+
+import h5py
+import numpy as np
+
+VNP_GRID = "HDFEOS/GRIDS/VIIRS_Grid_DNB_2d/Data Fields"
+TILE_PIXELS = 2400
+TILE_DEGREES = 10.0
+ROADS_FILE = "roads.npz"
+
+def vnp_tile_origin(lat: float, lon: float) -> Tuple[float, float]:
+    """(north edge, west edge) of the 10-degree VNP46A3 tile containing a point."""
+    return float(np.floor(lat / TILE_DEGREES) * TILE_DEGREES + TILE_DEGREES), float(np.floor(lon / TILE_DEGREES) * TILE_DEGREES)
+
+def city_radiance(lats: np.ndarray, lons: np.ndarray, bounds: Dict[str, float], rng: np.random.Generator) -> np.ndarray:
+    """Nighttime radiance (nW/cm²/sr) with bright cores inside the city bounds."""
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing="ij")
+    radiance = rng.gamma(1.5, 1.0, size=lat_grid.shape)
+    for _ in range(6):
+        c_lat = rng.uniform(bounds["min_lat"], bounds["max_lat"])
+        c_lon = rng.uniform(bounds["min_lon"], bounds["max_lon"])
+        spread = rng.uniform(0.01, 0.05)
+        radiance += rng.uniform(40, 120) * np.exp(-((lat_grid - c_lat) ** 2 + (lon_grid - c_lon) ** 2) / (2 * spread ** 2))
+    return radiance
+
+def write_vnp46a3(vnp_dir: Path, bounds: Dict[str, float], seed: int = 0) -> Path:
+    vnp_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    north, west = vnp_tile_origin(bounds["min_lat"], bounds["min_lon"])
+    step = TILE_DEGREES / TILE_PIXELS
+    lats = north - (np.arange(TILE_PIXELS) + 0.5) * step
+    lons = west + (np.arange(TILE_PIXELS) + 0.5) * step
+
+    radiance = city_radiance(lats, lons, bounds, rng)
+    packed = np.clip(np.round(radiance / 0.1), 0, 65534).astype(np.uint16)
+    # Scattered fill pixels, as in cloud-affected composites
+    packed[rng.random(packed.shape) < 0.002] = 65535
+
+    h, v = int((west + 180) // TILE_DEGREES), int((90 - north) // TILE_DEGREES)
+    path = vnp_dir / f"VNP46A3.A2024001.h{h:02d}v{v:02d}.001.2024100000000.h5"
+    with h5py.File(path, "w") as f:
+        group = f.require_group(VNP_GRID)
+        dataset = group.create_dataset("AllAngle_Composite_Snow_Free", data=packed,
+                                       chunks=(240, 240), compression="gzip", compression_opts=4)
+        dataset.attrs["scale_factor"] = np.float32(0.1)
+        dataset.attrs["offset"] = np.float32(0.0)
+        dataset.attrs["_FillValue"] = np.uint16(65535)
+        group.create_dataset("lat", data=lats)
+        group.create_dataset("lon", data=lons)
+    return path
+
+def write_mcd12q1(modis_dir: Path, bounds: Dict[str, float], margin_deg: float = 0.2, seed: int = 0) -> list:
+    """LC_Type1 tiles around the bounds; returns [] when pyhdf is not installed."""
+    try:
+        from pyhdf.SD import SD, SDC
+    except ImportError:
+        return []
+    from app.core.nasa_data_reader import modis_sinusoidal_index
+
+    modis_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    lat = np.linspace(bounds["min_lat"] - margin_deg, bounds["max_lat"] + margin_deg, 50)
+    lon = np.linspace(bounds["min_lon"] - margin_deg, bounds["max_lon"] + margin_deg, 50)
+    lon_grid, lat_grid = np.meshgrid(lon, lat)
+    h, v, _, _ = modis_sinusoidal_index(lat_grid, lon_grid)
+
+    paths = []
+    for tile_h, tile_v in sorted(set(zip(h.ravel().tolist(), v.ravel().tolist()))):
+        # Smooth random field: urban (13) cores, cropland (12/14) around them, some water (17)
+        coarse = rng.random((60, 60))
+        field = np.kron(coarse, np.ones((TILE_PIXELS // 60, TILE_PIXELS // 60)))
+        lc = np.select([field < 0.25, field < 0.55, field < 0.8, field < 0.9], [13, 12, 14, 10], default=17).astype(np.uint8)
+
+        path = modis_dir / f"MCD12Q1.A2024001.h{tile_h:02d}v{tile_v:02d}.061.2025206000000.hdf"
+        hdf = SD(str(path), SDC.WRITE | SDC.CREATE | SDC.TRUNC)
+        sds = hdf.create("LC_Type1", SDC.UINT8, lc.shape)
+        sds[:] = lc
+        sds.endaccess()
+        hdf.end()
+        paths.append(path)
+    return paths
+
+def road_pieces(bounds: Dict[str, float], spacing_m: float = 200.0, piece_m: float = 25.0,
+                seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (mid_lat, mid_lon, length_m) of a street lattice with ``spacing_m`` between
+    streets, split into ``piece_m`` pieces and jittered so streets are not perfectly
+    aligned with cell edges. Piece count grows as 1 / spacing².
+    """
+    rng = np.random.default_rng(seed)
+    m_per_deg_lat = 111320.0
+    m_per_deg_lon = m_per_deg_lat * np.cos(np.radians((bounds["min_lat"] + bounds["max_lat"]) / 2))
+    height_m = (bounds["max_lat"] - bounds["min_lat"]) * m_per_deg_lat
+    width_m = (bounds["max_lon"] - bounds["min_lon"]) * m_per_deg_lon
+
+    mids_lat, mids_lon = [], []
+    # East-west streets: fixed y, pieces along x; north-south streets the other way round
+    for length_m, across_m, horizontal in ((width_m, height_m, True), (height_m, width_m, False)):
+        streets = np.arange(spacing_m / 2, across_m, spacing_m)
+        along = np.arange(piece_m / 2, length_m, piece_m)
+        offset = streets[:, None] + rng.normal(0, spacing_m * 0.05, size=(len(streets), 1))
+        position = np.broadcast_to(along[None, :], (len(streets), len(along)))
+        y, x = (offset, position) if horizontal else (position, offset)
+        y, x = np.broadcast_arrays(y, x)
+        mids_lat.append(bounds["min_lat"] + y.ravel() / m_per_deg_lat)
+        mids_lon.append(bounds["min_lon"] + x.ravel() / m_per_deg_lon)
+
+    mid_lat, mid_lon = np.concatenate(mids_lat), np.concatenate(mids_lon)
+    return mid_lat, mid_lon, np.full(len(mid_lat), piece_m)
+
+def build_fixtures(root: Path, bounds: Dict[str, float], road_spacing_m: float = 200.0, seed: int = 0) -> Dict:
+    """Write granules (VNP46A3/, MODIS/) and road pieces under ``root``; return a description of them."""
+    vnp = write_vnp46a3(root / "VNP46A3", bounds, seed)
+    modis = write_mcd12q1(root / "MODIS", bounds, seed=seed)
+    roads = road_pieces(bounds, road_spacing_m, seed=seed)
+    np.savez(root / ROADS_FILE, mid_lat=roads[0], mid_lon=roads[1], length_m=roads[2])
+    return {
+        "root": str(root),
+        "vnp46a3": vnp.name,
+        "mcd12q1": [p.name for p in modis],
+        "road_spacing_m": road_spacing_m,
+        "road_pieces": int(len(roads[0]))
+    }
+
+def load_roads(root: Path) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    with np.load(root / ROADS_FILE) as roads:
+        return roads["mid_lat"], roads["mid_lon"], roads["length_m"]
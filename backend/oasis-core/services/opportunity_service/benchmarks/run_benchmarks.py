@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Benchmark the opportunity pipeline on synthetic NASA granules and check for regressions.
+
+Every case runs in its own forked process so peak RSS is attributable to it and no
+cache leaks from one case into the next. Results are compared against a JSON
+baseline (benchmarks/baseline.json by default); the exit status is 1 when any case
+is slower or heavier than the baseline by more than the tolerance.
+
+    python benchmarks/run_benchmarks.py                       # compare with the baseline
+    python benchmarks/run_benchmarks.py --update-baseline     # record a new baseline
+    python benchmarks/run_benchmarks.py --grid-sizes 10,100 --repeat 3
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_ROOT))
+
+import numpy as np
+
+from benchmarks.fixtures import build_fixtures, load_roads
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_GRID_SIZES = (10, 50, 100, 250, 500)
+CITY = "dhaka"
+
+# Differences below these are treated as noise whatever the relative change
+MIN_LATENCY_DELTA_MS = 5.0
+MIN_RSS_DELTA_MB = 16.0
+
+def rss_mb() -> float:
+    """Current resident set size of this process."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+def point_reader(root: Path) -> None:
+    """Aim the NASA reader and the city store at the fixtures, with the synthetic roads pre-cached."""
+    from app.core.cities import city_store, get_city
+    from app.core.nasa_data_reader import get_nasa_reader
+    nasa_reader = get_nasa_reader()
+
+    nasa_reader.data_dir = root
+    nasa_reader.vnp_dir = root / "VNP46A3"
+    nasa_reader.modis_dir = root / "MODIS"
+    b = get_city(CITY).bounds
+    nasa_reader._road_segment_cache[(b["min_lon"], b["min_lat"], b["max_lon"], b["max_lat"])] = load_roads(root)
+    city_store.root = root / "cubes"
+
+# Each case: setup() -> (run(), work items per run, unit). setup and a first run() are untimed.
+Case = Tuple[str, Optional[int], Callable[[], Tuple[Callable[[], object], int, str]]]
+
+def case_read_nighttime_lights():
+    from app.core.cities import get_city
+    from app.core.nasa_data_reader import get_nasa_reader
+    nasa_reader = get_nasa_reader()
+    b = get_city(CITY).bounds
+    pixels = nasa_reader.read_nighttime_lights(b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"]).size
+    return lambda: nasa_reader.read_nighttime_lights(b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"]), pixels, "pixels/s"
+
+def case_build_city_cube():
+    from app.core.cities import city_store, get_city
+    city = get_city(CITY)
+
+    def run():
+        city_store.invalidate(city, remove_cube=True)
+        return city_store.get(city)
+    return run, 1, "cubes/s"
+
+def case_calculate_grid_metrics(g: int):
+    from app.core.cities import city_store, get_city
+    from app.core.nasa_data_reader import get_nasa_reader
+    nasa_reader = get_nasa_reader()
+    city_data = city_store.get(get_city(CITY))
+    b = city_data.city.bounds
+    return (lambda: nasa_reader.calculate_grid_metrics(b["min_lat"], b["max_lat"], b["min_lon"], b["max_lon"],
+                                                       grid_size=g, rasters=city_data.rasters),
+            g * g, "cells/s")
+
+def case_make_opportunity_geojson(g: int):
+    from app.core.cities import city_store, get_city
+    from app.core.data_processor import get_feature_grid, make_opportunity_geojson
+    city_data = city_store.get(get_city(CITY))
+    features = get_feature_grid(city_data, g)
+    return lambda: make_opportunity_geojson(city_data.city.bounds, features=features), g * g, "cells/s"
+
+def _api_client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
+
+def case_api_cold(g: int):
+    """City evicted from memory before every request; the cube stays on disk."""
+    from app.core.cities import city_store, get_city
+    from app.core.distance import distance_cache
+    client = _api_client()
+    city = get_city(CITY)
+
+    def run():
+        city_store.invalidate(city)
+        distance_cache.clear()
+        response = client.get(f"/api/v1/{CITY}/opportunity_index", params={"grid_size": g})
+        response.raise_for_status()
+    return run, g * g, "cells/s"
+
+def case_api_warm(g: int):
+    client = _api_client()
+
+    def run():
+        response = client.get(f"/api/v1/{CITY}/opportunity_index", params={"grid_size": g})
+        response.raise_for_status()
+    return run, g * g, "cells/s"
+
+def build_cases(grid_sizes: List[int]) -> List[Case]:
+    cases: List[Case] = [
+        ("build_city_cube", None, case_build_city_cube),
+        ("read_nighttime_lights", None, case_read_nighttime_lights),
+    ]
+    for name, factory in (("calculate_grid_metrics", case_calculate_grid_metrics),
+                          ("make_opportunity_geojson", case_make_opportunity_geojson),
+                          ("api_cold", case_api_cold),
+                          ("api_warm", case_api_warm)):
+        cases.extend((name, g, (lambda f=factory, g=g: f(g))) for g in grid_sizes)
+    return cases
+
+def case_key(name: str, grid_size: Optional[int]) -> str:
+    return name if grid_size is None else f"{name}[g={grid_size}]"
+
+def _child(conn, root: Path, setup, repeat: int, budget_s: float):
+    try:
+        # The pipeline narrates to stdout; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            point_reader(root)
+            run, items, unit = setup()
+            # One untimed run first, so timed runs measure the steady state rather than
+            # cold caches (distance transform, catalog, page cache)
+            run()
+            start_rss = rss_mb()
+            timings = []
+            # Slow cases (large grids through the API) stop early once the time budget is spent
+            while len(timings) < repeat and (not timings or sum(timings) < budget_s * 1000):
+                # Garbage left by the previous run is collected here, not inside the next timing
+                gc.collect()
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+        median = statistics.median(timings)
+        conn.send({
+            "median_ms": round(median, 3),
+            "min_ms": round(min(timings), 3),
+            "max_ms": round(max(timings), 3),
+            "throughput": round(items / (median / 1000), 1) if median > 0 else None,
+            "throughput_unit": unit,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "rss_growth_mb": round(rss_mb() - start_rss, 1),
+            "runs": len(timings)
+        })
+    except BaseException as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+def run_case(root: Path, setup, repeat: int, budget_s: float) -> Dict:
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_child, args=(child, root, setup, repeat, budget_s))
+    process.start()
+    child.close()
+    result = parent.recv() if parent.poll(None) else {"error": "no result"}
+    process.join()
+    return result
+
+def machine_info() -> Dict:
+    import h5py
+    import scipy
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "h5py": h5py.__version__
+    }
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float, rss_tolerance: float) -> List[str]:
+    """Human-readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for key, current in results.items():
+        before = baseline.get(key)
+        if before is None or "error" in before:
+            continue
+        if "error" in current:
+            regressions.append(f"{key}: failed ({current['error']})")
+            continue
+        latency_delta = current["median_ms"] - before["median_ms"]
+        if latency_delta > MIN_LATENCY_DELTA_MS and current["median_ms"] > before["median_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: median {before['median_ms']:.1f} -> {current['median_ms']:.1f} ms "
+                               f"(+{latency_delta / before['median_ms']:.0%})")
+        rss_delta = current["peak_rss_mb"] - before["peak_rss_mb"]
+        if rss_delta > MIN_RSS_DELTA_MB and current["peak_rss_mb"] > before["peak_rss_mb"] * (1 + rss_tolerance):
+            regressions.append(f"{key}: peak RSS {before['peak_rss_mb']:.0f} -> {current['peak_rss_mb']:.0f} MB "
+                               f"(+{rss_delta / before['peak_rss_mb']:.0%})")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grid-sizes", default=",".join(str(g) for g in DEFAULT_GRID_SIZES),
+                        help="Comma-separated grid sizes (default %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (default %(default)s)")
+    parser.add_argument("--budget", type=float, default=15.0,
+                        help="Stop repeating a case after this many seconds of timed runs (default %(default)s)")
+    parser.add_argument("--road-spacing", type=float, default=200.0,
+                        help="Metres between synthetic streets; smaller means a larger network (default %(default)s)")
+    parser.add_argument("--only", help="Run only cases whose name contains this string")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative latency increase (default %(default)s)")
+    parser.add_argument("--rss-tolerance", type=float, default=0.20,
+                        help="Allowed relative peak RSS increase (default %(default)s)")
+    parser.add_argument("--output", type=Path, help="Also write the results JSON here")
+    args = parser.parse_args()
+
+    grid_sizes = [int(g) for g in args.grid_sizes.split(",")]
+    cases = [c for c in build_cases(grid_sizes) if not args.only or args.only in c[0]]
+
+    # Import the service once up front: children inherit it, and import-time notices print only once
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from fastapi.testclient import TestClient  # noqa: F401
+    from app.core.cities import get_city
+    import app.main  # noqa: F401
+
+    with tempfile.TemporaryDirectory(prefix="oasis-bench-") as tmp:
+        root = Path(tmp)
+        print("Generating synthetic fixtures...")
+        start = time.perf_counter()
+        # Generated in a pool worker so the tiles never count towards the parent's (and children's) RSS
+        with multiprocessing.get_context("fork").Pool(1) as pool:
+            fixtures = pool.apply(build_fixtures, (root, get_city(CITY).bounds, args.road_spacing))
+        print(f"  VNP46A3: {fixtures['vnp46a3']}")
+        print(f"  MCD12Q1: {', '.join(fixtures['mcd12q1']) or 'skipped (pyhdf not installed)'}")
+        print(f"  Roads:   {fixtures['road_pieces']:,} pieces at {args.road_spacing:.0f} m spacing")
+        print(f"  ({time.perf_counter() - start:.1f}s)\n")
+
+        print(f"{'case':<36} {'median ms':>11} {'min ms':>10} {'throughput':>22} {'peak RSS':>10}")
+        results = {}
+        for name, g, setup in cases:
+            key = case_key(name, g)
+            result = run_case(root, setup, args.repeat, args.budget)
+            results[key] = result
+            if "error" in result:
+                print(f"{key:<36} ❌ {result['error']}")
+                continue
+            throughput = f"{result['throughput']:,.0f} {result['throughput_unit']}" if result["throughput"] else "-"
+            print(f"{key:<36} {result['median_ms']:>11.1f} {result['min_ms']:>10.1f} {throughput:>22} "
+                  f"{result['peak_rss_mb']:>7.0f} MB")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "machine": machine_info(),
+        "fixtures": {k: v for k, v in fixtures.items() if k != "root"},
+        "repeat": args.repeat,
+        "results": results
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\n✅ Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\n⚠️  No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("machine") != report["machine"]:
+        print("\n⚠️  Baseline was recorded on a different machine or library versions; comparisons are indicative")
+    regressions = compare(results, baseline.get("results", {}), args.tolerance, args.rss_tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+    print(f"\n✅ No regressions against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Export a city's opportunity grid to CSV or GeoParquet without going through the API."""
+
+import argparse
+import sys
+import time
+
+from app.core.cities import get_city, list_cities, city_store
+from app.core.config import settings
+from app.core.data_processor import get_feature_grid
+from app.core.export import EXPORT_FORMATS, stream_export
+from app.core.features import DEFAULT_THRESHOLDS, DEFAULT_WEIGHTS
+
+def parse_floats(value: str, count: int):
+    values = [float(v) for v in value.split(",")]
+    if len(values) != count:
+        raise argparse.ArgumentTypeError(f"expected {count} comma-separated numbers")
+    return values
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("city", help=f"One of: {', '.join(c.key for c in list_cities())}")
+    parser.add_argument("-o", "--output", required=True, help="Output file")
+    parser.add_argument("-f", "--format", choices=EXPORT_FORMATS, help="Defaults to the output extension")
+    parser.add_argument("-g", "--grid-size", type=int, default=settings.default_grid_size)
+    parser.add_argument("--bbox", type=lambda v: parse_floats(v, 4), help="min_lon,min_lat,max_lon,max_lat")
+    parser.add_argument("--weights", type=lambda v: parse_floats(v, 3), default=list(DEFAULT_WEIGHTS),
+                        help="food,transport,housing (default %(default)s)")
+    parser.add_argument("--thresholds", type=lambda v: parse_floats(v, 2), default=list(DEFAULT_THRESHOLDS),
+                        help="low,high category thresholds (default %(default)s)")
+    parser.add_argument("--rows-per-group", type=int, default=settings.export_rows_per_group)
+    args = parser.parse_args()
+
+    city = get_city(args.city)
+    if city is None:
+        print(f"❌ Unknown city '{args.city}'")
+        return 1
+    fmt = args.format or ("parquet" if args.output.endswith((".parquet", ".geoparquet")) else "csv")
+
+    start = time.perf_counter()
+    features = get_feature_grid(city_store.get(city), args.grid_size)
+    print(f"Feature grid {args.grid_size}x{args.grid_size} ready in {time.perf_counter() - start:.2f}s")
+
+    try:
+        chunks = stream_export(features, fmt, args.bbox, args.weights, args.thresholds, args.rows_per_group)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    written = 0
+    with open(args.output, "wb") as out:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    print(f"✅ Wrote {args.output} ({fmt}, {written / 1e6:.1f} MB) in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
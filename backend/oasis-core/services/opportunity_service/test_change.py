@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Test script to verify nighttime-lights change detection on a small synthetic stack."""
+
+import sys
+import warnings
+
+import numpy as np
+
+from app.core.change import MAD_SCALE, ChangeCube, NTLStack, robust_z, rolling_mean
+from app.core.grid import cell_index
+
+print("=" * 60)
+print("Change Cube Test")
+print("=" * 60)
+
+failed = False
+
+def check(name: str, ok: bool, detail: str = ""):
+    global failed
+    print(f"{'✅' if ok else '❌'} {name}" + (f" - {detail}" if detail and not ok else ""))
+    failed |= not ok
+
+def raises(call) -> bool:
+    try:
+        call()
+    except ValueError:
+        return True
+    return False
+
+rng = np.random.default_rng(3)
+months = ["2024-01", "2024-02", "2024-03", "2024-04", "2024-05"]
+grid_size = 6
+# 4x4 pixels per cell, so the boosted blocks below are whole cells
+radiance = rng.uniform(1.0, 40.0, (len(months), 24, 24))
+# A few brightening cells with different strengths, so the order is known
+radiance[3:, 0:4, 0:4] += 30.0
+radiance[3:, 8:12, 12:16] += 20.0
+radiance[3:, 20:24, 4:8] += 10.0
+# Scattered fill pixels, and one cell with no valid pixel at all in March
+radiance[rng.random(radiance.shape) < 0.05] = np.nan
+radiance[2, 4:8, 4:8] = np.nan
+
+cube = ChangeCube(NTLStack(months, radiance, [f"{m}.h5" for m in months]), {
+    "min_lat": 23.7, "max_lat": 23.9, "min_lon": 90.3, "max_lon": 90.5
+}, grid_size, window=3, min_z=2.0)
+
+# Expected values, one cell and one month at a time
+labels = cell_index(radiance.shape[1:], grid_size)
+empty_cell = int(labels[5, 5])
+n_cells = grid_size * grid_size
+with warnings.catch_warnings():
+    # nanmean of the empty cell warns and returns NaN, which is what the cube should hold
+    warnings.simplefilter("ignore", RuntimeWarning)
+    expected = np.array([[np.nanmean(layer[labels == k]) for k in range(n_cells)] for layer in radiance])
+expected_delta = np.full(expected.shape, np.nan)
+expected_delta[1:] = expected[1:] - expected[:-1]
+
+check("Cell radiance is the nanmean of its pixels",
+      np.allclose(cube.radiance, expected, equal_nan=True))
+check("Cell deltas are month-over-month differences of the nanmeans",
+      np.allclose(cube.delta, expected_delta, equal_nan=True))
+check("First month has no delta, change or z-score",
+      all(np.isnan(a[0]).all() for a in (cube.delta, cube.pct_change, cube.z, cube.bright_fraction)))
+check("A cell with no valid pixels has no radiance",
+      np.isnan(cube.radiance[2, empty_cell]) and not np.isnan(cube.radiance[1, empty_cell]))
+check("...and no delta into or out of that month",
+      np.isnan(cube.delta[2, empty_cell]) and np.isnan(cube.delta[3, empty_cell])
+      and not np.isnan(cube.delta[4, empty_cell]))
+check("Fill pixels have no pixel delta", np.all(np.isnan(cube.pixel_delta[1:][np.isnan(radiance[1:])])))
+
+# Rolling mean: NaN until the window is full, then the nanmean of the trailing window
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", RuntimeWarning)
+    expected_rolling = np.full(expected.shape, np.nan)
+    for t in range(2, len(months)):
+        expected_rolling[t] = np.nanmean(expected[t - 2:t + 1], axis=0)
+check("Rolling mean matches a trailing nanmean", np.allclose(cube.rolling_mean, expected_rolling, equal_nan=True))
+check("Rolling mean over the NaN cell uses the months it has",
+      np.isclose(cube.rolling_mean[3, empty_cell], np.mean(expected[[1, 3], empty_cell])))
+check("Rolling mean of a 1-step window is the input",
+      np.allclose(rolling_mean(expected, 1), expected, equal_nan=True))
+
+# Robust z: median and MAD of each month's deltas, NaNs left out
+z = np.full(expected_delta.shape, np.nan)
+for t in range(1, len(months)):
+    row = expected_delta[t][~np.isnan(expected_delta[t])]
+    median = np.median(row)
+    z[t, ~np.isnan(expected_delta[t])] = (row - median) / (np.median(np.abs(row - median)) * MAD_SCALE)
+check("Cell z-scores match per-month median/MAD", np.allclose(cube.z, z, equal_nan=True))
+check("A step with no spread has no z-score", np.isnan(robust_z(np.ones((2, 5)))).all())
+
+# Brightening: largest positive delta first, the three boosted cells on top in April
+t, cells = cube.brightening(k=3, month="2024-04")
+expected_order = np.argsort(-np.nan_to_num(expected_delta[3], nan=-np.inf), kind="stable")[:3]
+check("Brightening cells are ordered by delta", t == 3 and cells.tolist() == expected_order.tolist(),
+      f"got {cells.tolist()}, expected {expected_order.tolist()}")
+boosted = [int(labels[1, 1]), int(labels[9, 13]), int(labels[21, 5])]
+check("...and are the boosted cells", cells.tolist() == boosted,
+      f"got {cells.tolist()}")
+_, all_rising = cube.brightening(k=n_cells, month="2024-04")
+check("Only rising cells are listed", np.all(cube.delta[3, all_rising] > 0)
+      and len(all_rising) == int(np.sum(np.nan_to_num(expected_delta[3]) > 0)))
+_, significant = cube.brightening(k=n_cells, month="2024-04", min_z=2.0)
+check("min_z keeps only cells at or above it", len(significant) > 0 and np.all(cube.z[3, significant] >= 2.0))
+check("Brightening skips the NaN cell", empty_cell not in cube.brightening(k=n_cells, month="2024-03")[1])
+check("Latest month is the default", cube.brightening(k=1)[0] == len(months) - 1)
+check("Bright pixel fractions lie in [0, 1]",
+      np.all((cube.bright_fraction[1:] >= 0) | np.isnan(cube.bright_fraction[1:]))
+      and np.nanmax(cube.bright_fraction) <= 1.0)
+
+# month_index: the first month has no change, unknown months and single-month stacks are errors
+check("First month is rejected", raises(lambda: cube.month_index("2024-01")))
+check("Unknown month is rejected", raises(lambda: cube.month_index("2023-12")))
+check("A month is found by name", cube.month_index("2024-03") == 2)
+single = ChangeCube(NTLStack(months[:1], radiance[:1], ["a.h5"]), cube.bounds, grid_size, window=3, min_z=2.0)
+check("A single-month stack is rejected", raises(lambda: single.month_index(None)))
+
+if failed:
+    sys.exit(1)
+print("\n✅ Change detection is correct")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Test script to verify out-of-core zonal statistics match the in-memory grid.block_sums exactly."""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from app.core.chunked import RasterReader, RasterSource, _reduce_strip, plan_strips, zonal_stats
+from app.core.grid import block_sums, cell_index
+
+failed = False
+
+def check(name: str, ok: bool, detail: str = ""):
+    global failed
+    print(f"{'✅' if ok else '❌'} {name}" + (f" - {detail}" if detail and not ok else ""))
+    failed |= not ok
+
+def max_error(result, expected_sums, expected_counts):
+    return f"max |Δsum| {np.abs(result.sums - expected_sums).max():.3g}, " \
+           f"counts equal {np.array_equal(result.counts, expected_counts)}"
+
+def main():
+    rng = np.random.default_rng(11)
+
+    print("=" * 60)
+    print("In-memory Zonal Stats Test")
+    print("=" * 60)
+
+    # Shapes that do and do not divide evenly into cells, with chunks smaller than one cell,
+    # a few cells wide, and larger than the whole raster
+    for shape, grid_size in (((60, 60), 6), ((37, 53), 7), ((101, 64), 13), ((24, 200), 9)):
+        # Wide dynamic range so any change in summation order shows up in the last bits
+        values = rng.lognormal(0.0, 3.0, shape)
+        expected_sums, expected_counts = block_sums(values, grid_size)
+        for chunk_size in (3, 8, 17, 1000):
+            result = zonal_stats(values, grid_size, chunk_size=chunk_size, workers=1)
+            exact = np.array_equal(result.sums, expected_sums) and np.array_equal(result.counts, expected_counts)
+            check(f"{shape} on {grid_size}x{grid_size}, chunk {chunk_size}: totals equal block_sums exactly",
+                  exact, max_error(result, expected_sums, expected_counts))
+
+    # Strips reduced one at a time cover every cell column once and agree with block_sums
+    values = rng.lognormal(0.0, 3.0, (45, 71))
+    grid_size = 8
+    expected_sums = block_sums(values, grid_size)[0].reshape(grid_size, grid_size)
+    strips = plan_strips(values.shape[1], grid_size, 20)
+    covered = [c for first, last in strips for c in range(first, last)]
+    check("Strips cover each cell column once", covered == list(range(grid_size)), f"got {strips}")
+    reader = RasterReader(None, values)
+    strips_exact = all(
+        np.array_equal(_reduce_strip(reader, grid_size, strip, 20, None)[0], expected_sums[:, strip[0]:strip[1]])
+        for strip in strips
+    )
+    check("Each strip's sums equal its columns of block_sums", strips_exact)
+
+    # Class histograms count every pixel of a known class once
+    classes = [0, 2, 5, 9]
+    labels = rng.choice([0, 1, 2, 5, 9], size=(50, 50)).astype(np.int64)
+    result = zonal_stats(labels, 7, chunk_size=6, classes=classes, workers=1)
+    cells = cell_index(labels.shape, 7).ravel()
+    expected = np.stack([np.bincount(cells[labels.ravel() == c], minlength=49) for c in classes], axis=1)
+    check("Class histogram matches per-class pixel counts", np.array_equal(result.histogram, expected))
+
+    print("\n" + "=" * 60)
+    print("On-disk Zonal Stats Test")
+    print("=" * 60)
+
+    import h5py
+    with tempfile.TemporaryDirectory() as tmp:
+        # A north-up dataset read through a window that is not at its origin
+        stored = rng.lognormal(0.0, 3.0, (90, 120))
+        path = os.path.join(tmp, "tile.h5")
+        with h5py.File(path, "w") as f:
+            f["radiance"] = stored
+        window = (7, 80, 11, 102)
+        source = RasterSource(path, dataset="radiance", window=window, north_up=True)
+        # South-up view of the same window, as the in-memory path would see it
+        south_up = stored[window[0]:window[1], window[2]:window[3]][::-1]
+        grid_size = 12
+        expected_sums, expected_counts = block_sums(south_up, grid_size)
+
+        for chunk_size in (5, 16, 1000):
+            result = zonal_stats(source, grid_size, chunk_size=chunk_size, workers=1)
+            exact = np.array_equal(result.sums, expected_sums) and np.array_equal(result.counts, expected_counts)
+            check(f"North-up HDF5 window, chunk {chunk_size}: totals equal block_sums exactly",
+                  exact, max_error(result, expected_sums, expected_counts))
+
+        result = zonal_stats(source, grid_size, chunk_size=16, workers=2)
+        exact = np.array_equal(result.sums, expected_sums) and np.array_equal(result.counts, expected_counts)
+        check("North-up HDF5 window with workers=2: totals equal block_sums exactly",
+              exact, max_error(result, expected_sums, expected_counts))
+
+        # A south-up .npy read through a memory map
+        npy_path = os.path.join(tmp, "tile.npy")
+        np.save(npy_path, south_up)
+        result = zonal_stats(RasterSource(npy_path, north_up=False), grid_size, chunk_size=9, workers=2)
+        exact = np.array_equal(result.sums, expected_sums) and np.array_equal(result.counts, expected_counts)
+        check("South-up .npy with workers=2: totals equal block_sums exactly",
+              exact, max_error(result, expected_sums, expected_counts))
+
+    try:
+        zonal_stats(values, grid_size, chunk_size=16, workers=2)
+        check("In-memory array with workers=2 is rejected", False, "no error raised")
+    except ValueError:
+        check("In-memory array with workers=2 is rejected", True)
+
+    if failed:
+        sys.exit(1)
+    print("\n✅ Chunked zonal stats match block_sums exactly")
+
+# Worker processes re-import this module under the spawn start method
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Fail if importing the service in a fresh interpreter exceeds the import-time budget."""
+
+import json
+import subprocess
+import sys
+
+from app.core.config import settings
+
+RUNS = 3
+
+# Heavy optional dependencies that must only load on the requests that need them
+DEFERRED_MODULES = (
+    "osmnx", "geopandas", "shapely", "networkx", "pyproj",
+    "h5py", "pyhdf", "pyarrow", "rasterio",
+    "scipy.ndimage", "scipy.sparse", "scipy.spatial", "scipy.special",
+)
+
+CHILD = f"""
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import app.main
+elapsed = (time.perf_counter() - start) * 1000
+from app.core.importtime import import_profiler
+print(json.dumps({{
+    "ms": elapsed,
+    "loaded": [m for m in {DEFERRED_MODULES!r} if m in sys.modules],
+    "slowest": import_profiler.report(10)
+}}))
+"""
+
+print("=" * 60)
+print("Service Import Budget Test")
+print("=" * 60)
+
+results = []
+for run in range(RUNS):
+    out = subprocess.run([sys.executable, "-c", CHILD], capture_output=True, text=True)
+    if out.returncode != 0:
+        print(f"❌ Importing app.main failed:\n{out.stderr}")
+        sys.exit(1)
+    results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+# Best of several runs: the budget is about our imports, not a busy machine
+best = min(results, key=lambda r: r["ms"])
+print(f"\nImport time: {best['ms']:.0f} ms (best of {RUNS}, budget {settings.import_budget_ms:.0f} ms)")
+print("Slowest modules (cumulative ms):")
+for row in best["slowest"]:
+    print(f"  {row['cumulative_ms']:8.1f}  {row['module']}")
+
+failed = False
+if best["loaded"]:
+    print(f"\n❌ Loaded at import, should be deferred: {', '.join(best['loaded'])}")
+    failed = True
+if best["ms"] > settings.import_budget_ms:
+    print(f"\n❌ Service import took {best['ms']:.0f} ms, over the {settings.import_budget_ms:.0f} ms budget")
+    failed = True
+
+if failed:
+    sys.exit(1)
+print("\n✅ Service import is within budget and heavy dependencies are deferred")
@@ -9,7 +9,8 @@ print("NASA Data Reader Test")
 print("=" * 60)
 
 try:
-    from app.core.nasa_data_reader import nasa_reader
+    from app.core.nasa_data_reader import get_nasa_reader
+    nasa_reader = get_nasa_reader()
     print("✅ NASA data reader imported successfully")
 except ImportError as e:
     print(f"❌ Failed to import NASA data reader: {e}")
@@ -21,18 +22,18 @@ print(f"\nData directories:")
 print(f"  MODIS: {nasa_reader.modis_dir}")
 print(f"  VNP46A3: {nasa_reader.vnp_dir}")
 
-modis_files = list(nasa_reader.modis_dir.glob("*.hdf"))
-vnp_files = list(nasa_reader.vnp_dir.glob("*.h5"))
+modis_files = nasa_reader.catalog.granules("MCD12Q1")
+vnp_files = nasa_reader.catalog.granules("VNP46A3")
 
-print(f"\nFiles found:")
+print(f"\nGranules catalogued ({nasa_reader.catalog.path}):")
 print(f"  MODIS files: {len(modis_files)}")
-for f in modis_files:
-    print(f"    - {f.name}")
+for g in modis_files:
+    print(f"    - {g.name} ({g.tile}, {g.acquired}, shape {g.shape})")
 print(f"  VNP46A3 files: {len(vnp_files)}")
-for f in vnp_files[:3]:
-    print(f"    - {f.name}")
+for g in vnp_files[-3:]:
+    print(f"    - {g.name} ({g.tile}, {g.acquired}, scale {g.scale_factor})")
 if len(vnp_files) > 3:
-    print(f"    ... and {len(vnp_files) - 3} more")
+    print(f"    ... and {len(vnp_files) - 3} older")
 
 print("\n" + "=" * 60)
 print("Testing Nighttime Lights Data (VNP46A3)")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test script to verify population cell sums from the summed-area table."""
+
+import sys
+
+import numpy as np
+
+from app.core.population import PopulationRaster
+
+print("=" * 60)
+print("Population Cell Sum Test")
+print("=" * 60)
+
+failed = False
+
+def check(name: str, ok: bool, detail: str = ""):
+    global failed
+    print(f"{'✅' if ok else '❌'} {name}" + (f" - {detail}" if detail and not ok else ""))
+    failed |= not ok
+
+def overlap(edges: np.ndarray, lo: float, step: float, n: int) -> np.ndarray:
+    """(cells x pixels) length of each cell interval inside each pixel, as a fraction of the pixel."""
+    pixel_lo = lo + np.arange(n) * step
+    inside = np.minimum(edges[1:, None], pixel_lo[None, :] + step) - np.maximum(edges[:-1, None], pixel_lo[None, :])
+    return np.clip(inside, 0.0, None) / step
+
+def exact_cell_sums(raster: PopulationRaster, counts_south_up: np.ndarray, bounds, grid_size: int) -> np.ndarray:
+    """Each pixel's people spread evenly over it, summed over its overlap with every cell."""
+    rows = overlap(np.linspace(bounds["min_lat"], bounds["max_lat"], grid_size + 1),
+                   raster.south, raster.dlat, raster.height)
+    cols = overlap(np.linspace(bounds["min_lon"], bounds["max_lon"], grid_size + 1),
+                   raster.west, raster.dlon, raster.width)
+    return (rows @ counts_south_up @ cols.T).ravel()
+
+rng = np.random.default_rng(5)
+# North-up like a GeoTIFF: row 0 is the northern edge
+counts = rng.gamma(2.0, 150.0, (40, 60))
+north, west, dlat, dlon = 24.0, 90.0, 0.01, 0.01
+fill = counts.copy()
+fill[3, 7], fill[20, 41], fill[31, 2] = -3.4e38, np.nan, -1.0
+raster = PopulationRaster(fill, north=north, west=west, dlat=dlat, dlon=dlon)
+counts[3, 7] = counts[20, 41] = counts[31, 2] = 0.0
+south_up = counts[::-1]
+
+check("Fill, NaN and negative pixels hold no people", np.isclose(raster.total, counts.sum()))
+
+# Bounds on pixel edges, 4x3 pixels per cell: cell sums are plain block sums
+grid_size = 8
+row0, col0 = 5, 12
+bounds = {"min_lat": raster.south + row0 * dlat, "max_lat": raster.south + (row0 + 4 * grid_size) * dlat,
+          "min_lon": west + col0 * dlon, "max_lon": west + (col0 + 3 * grid_size) * dlon}
+block = south_up[row0:row0 + 4 * grid_size, col0:col0 + 3 * grid_size]
+expected = block.reshape(grid_size, 4, grid_size, 3).sum(axis=(1, 3)).ravel()
+sums = raster.cell_sums(bounds, grid_size)
+check("Pixel-aligned cell sums equal block sums of the counts", np.allclose(sums, expected, rtol=1e-9),
+      f"max error {np.abs(sums - expected).max():.3g}")
+check("Cell ids run row-major from the south-west",
+      np.isclose(sums[0], south_up[row0:row0 + 4, col0:col0 + 3].sum())
+      and np.isclose(sums[grid_size], south_up[row0 + 4:row0 + 8, col0:col0 + 3].sum()))
+
+# Bounds cutting through pixels: each pixel's people are split by area, none lost or double counted
+for label, bounds in (
+    ("inside the raster", {"min_lat": 23.6537, "max_lat": 23.9312, "min_lon": 90.0473, "max_lon": 90.5219}),
+    ("past the raster's edges", {"min_lat": 23.5, "max_lat": 24.1, "min_lon": 89.9, "max_lon": 90.65}),
+):
+    for grid_size in (7, 13, 50):
+        sums = raster.cell_sums(bounds, grid_size)
+        expected = exact_cell_sums(raster, south_up, bounds, grid_size)
+        total = raster.rect_sums(bounds["min_lat"], bounds["max_lat"], bounds["min_lon"], bounds["max_lon"])
+        check(f"Bounds {label}, {grid_size}x{grid_size}: cells match area-weighted pixel overlaps",
+              np.allclose(sums, expected, rtol=1e-9, atol=1e-6), f"max error {np.abs(sums - expected).max():.3g}")
+        check(f"Bounds {label}, {grid_size}x{grid_size}: cell sums add up to the bounds' total",
+              np.isclose(sums.sum(), total, rtol=1e-12) and np.isclose(total, expected.sum(), rtol=1e-12),
+              f"cells {sums.sum():.6f}, bounds {total:.6f}, exact {expected.sum():.6f}")
+
+check("Bounds around the whole raster hold everyone", np.isclose(sums.sum(), raster.total, rtol=1e-12),
+      f"{sums.sum():.6f} vs {raster.total:.6f}")
+check("Bounds off the raster hold nobody",
+      not raster.cell_sums({"min_lat": 25.0, "max_lat": 25.2, "min_lon": 90.1, "max_lon": 90.3}, 5).any())
+
+if failed:
+    sys.exit(1)
+print("\n✅ Population cell sums are correct")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Test script to verify region outlines (rings, holes, pinch corners) and region cell lists."""
+
+import sys
+
+import numpy as np
+
+from app.core.features import FeatureGrid
+from app.core.regions import (
+    _boundary_edges, _signed_area, _successors, _trace_rings, find_regions, region_outlines
+)
+
+print("=" * 60)
+print("Region Outline Test")
+print("=" * 60)
+
+failed = False
+
+def check(name: str, ok: bool, detail: str = ""):
+    global failed
+    print(f"{'✅' if ok else '❌'} {name}" + (f" - {detail}" if detail and not ok else ""))
+    failed |= not ok
+
+def areas(polygon):
+    return [_signed_area(ring) for ring in polygon]
+
+# Rows are listed north first for readability; label arrays have row 0 in the south
+def grid(rows):
+    return np.array(rows[::-1], dtype=np.int32)
+
+# A 3x3 block with its centre cell missing: one exterior and one hole
+ring_with_hole = grid([
+    [1, 1, 1],
+    [1, 0, 1],
+    [1, 1, 1],
+])
+sx, sy, ex, ey, lab = _boundary_edges(ring_with_hole)
+successor = _successors(sx, sy, ex, ey, lab, ring_with_hole.shape[1] + 1)
+rings = _trace_rings(sx, sy, ex, ey, lab, successor)
+check("Every boundary edge is on exactly one ring", np.array_equal(np.sort(successor), np.arange(len(sx))))
+check("Block with a hole traces two rings", len(rings) == 2, f"got {len(rings)}")
+check("Collinear vertices are dropped", sorted(len(r) for _, r in rings) == [5, 5],
+      f"got {[len(r) for _, r in rings]}")
+outlines = region_outlines(ring_with_hole)
+check("Hole is attached to its exterior", len(outlines[1]) == 1 and areas(outlines[1][0]) == [9.0, -1.0],
+      f"got {[areas(p) for p in outlines[1]]}")
+
+# Two cells of one region touching only at a corner: the pinch must split into two simple rings
+pinch = grid([
+    [0, 1],
+    [1, 0],
+])
+outlines = region_outlines(pinch)
+check("Diagonal pinch gives two unit squares", sorted(areas(p)[0] for p in outlines[1]) == [1.0, 1.0],
+      f"got {[areas(p) for p in outlines[1]]}")
+check("Pinch rings are simple (no repeated vertex)",
+      all(len({tuple(v) for v in p[0][:-1]}) == len(p[0]) - 1 for p in outlines[1]))
+
+# A corner-connected single cell next to a block with a hole: the hole goes to the block
+pinch_and_hole = grid([
+    [0, 1, 1, 1],
+    [0, 1, 0, 1],
+    [0, 1, 1, 1],
+    [1, 0, 0, 0],
+])
+outlines = region_outlines(pinch_and_hole)
+parts = sorted((areas(p) for p in outlines[1]), key=lambda a: a[0])
+check("Hole is assigned to the part that encloses it", parts == [[1.0], [9.0, -1.0]], f"got {parts}")
+
+# Cell lists grouped once per call: one per region, in id order, covering the category exactly
+print("\n" + "=" * 60)
+print("Region Cell List Test")
+print("=" * 60)
+
+rng = np.random.default_rng(7)
+g = 40
+n = g * g
+bounds = {"min_lat": 23.7, "max_lat": 23.9, "min_lon": 90.3, "max_lon": 90.5}
+features = FeatureGrid(
+    bounds, g,
+    housing_pressure=rng.uniform(0.3, 0.95, n),
+    food_distance_km=rng.uniform(0.5, 8.0, n),
+    transport_score=rng.uniform(0.2, 0.9, n),
+    population_density=rng.integers(5000, 30000, n),
+    avg_nighttime_light=np.zeros(n)
+)
+for category in ("low", "medium", "high"):
+    result = find_regions(features, category, connectivity=8, limit=1000, include_cells=True)
+    cells = [set(f["properties"]["cell_ids"]) for f in result["features"]]
+    counts_match = all(len(c) == f["properties"]["cells"] for c, f in zip(cells, result["features"]))
+    ordered = all(f["properties"]["cell_ids"] == sorted(f["properties"]["cell_ids"]) for f in result["features"])
+    disjoint = sum(map(len, cells)) == len(set().union(*cells)) == result["metadata"]["cells_in_category"]
+    check(f"'{category}' cell lists match region sizes and cover the category once",
+          counts_match and disjoint and ordered)
+
+if failed:
+    sys.exit(1)
+print("\n✅ Region outlines and cell lists are correct")
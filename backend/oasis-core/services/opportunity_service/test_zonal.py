@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Test script to verify polygon rasterization against exact cell overlaps computed with shapely."""
+
+import sys
+
+import numpy as np
+from shapely.geometry import box, shape
+
+from app.core.features import FeatureGrid
+from app.core.zonal import SUPERSAMPLE, rasterize_polygon
+
+print("=" * 60)
+print("Polygon Rasterization Test")
+print("=" * 60)
+
+failed = False
+
+def check(name: str, ok: bool, detail: str = ""):
+    global failed
+    print(f"{'✅' if ok else '❌'} {name}" + (f" - {detail}" if detail and not ok else ""))
+    failed |= not ok
+
+g = 20
+n = g * g
+bounds = {"min_lat": 23.7, "max_lat": 23.9, "min_lon": 90.3, "max_lon": 90.5}
+features = FeatureGrid(
+    bounds, g,
+    housing_pressure=np.full(n, 0.5),
+    food_distance_km=np.full(n, 2.0),
+    transport_score=np.full(n, 0.5),
+    population_density=np.full(n, 10000),
+    avg_nighttime_light=np.zeros(n)
+)
+cell_boxes = [box(*features.cell_bounds(i)) for i in range(n)]
+
+# A straight edge misplaces at most half a sample row in each of a cell's sample columns
+TOLERANCE = 1 / (2 * SUPERSAMPLE)
+
+def exact_coverage(geometry) -> np.ndarray:
+    polygon = shape(geometry)
+    return np.array([cell.intersection(polygon).area / cell.area for cell in cell_boxes])
+
+def rasterized_coverage(geometry) -> np.ndarray:
+    mask = rasterize_polygon(features, geometry)
+    coverage = np.zeros(n)
+    coverage[mask.indices] = mask.coverage
+    return coverage
+
+def ring(points):
+    return [list(p) for p in points] + [list(points[0])]
+
+def at(x, y):
+    """Grid-relative position (0..1 across the city) to lon/lat."""
+    return (bounds["min_lon"] + x * (bounds["max_lon"] - bounds["min_lon"]),
+            bounds["min_lat"] + y * (bounds["max_lat"] - bounds["min_lat"]))
+
+# Slanted edges so cells are cut at arbitrary fractions, not on sample lines
+outer = ring([at(0.12, 0.08), at(0.83, 0.17), at(0.91, 0.74), at(0.47, 0.93), at(0.06, 0.61)])
+hole = ring([at(0.38, 0.33), at(0.61, 0.41), at(0.55, 0.66), at(0.33, 0.58)])
+cases = {
+    "Polygon with a hole": {"type": "Polygon", "coordinates": [outer, hole]},
+    "MultiPolygon": {"type": "MultiPolygon", "coordinates": [
+        [ring([at(0.05, 0.05), at(0.31, 0.09), at(0.22, 0.37)])],
+        [ring([at(0.52, 0.55), at(0.97, 0.62), at(0.88, 0.96), at(0.57, 0.89)])],
+    ]},
+    "Polygon past the grid bounds": {"type": "Polygon", "coordinates": [
+        ring([at(-0.3, 0.42), at(0.37, -0.25), at(1.2, 0.51), at(0.71, 1.4)])
+    ]},
+}
+
+for name, geometry in cases.items():
+    exact = exact_coverage(geometry)
+    coverage = rasterized_coverage(geometry)
+    error = np.abs(coverage - exact).max()
+    check(f"{name}: per-cell coverage within {TOLERANCE:.4g} of the exact overlap", error <= TOLERANCE,
+          f"max error {error:.3f}")
+    # Cells wholly inside or outside carry no edge, so sampling must get them exactly
+    interior = (exact == 1.0) | (exact == 0.0)
+    check(f"{name}: cells wholly inside or outside are exact",
+          np.array_equal(coverage[interior], exact[interior]))
+    total_error = abs(coverage.sum() - exact.sum()) / exact.sum()
+    check(f"{name}: total covered area within 1%", total_error <= 0.01, f"off by {total_error:.2%}")
+
+# The hole's cells are excluded, and a zone covering the grid covers every cell once
+geometry = cases["Polygon with a hole"]
+hole_only = shape({"type": "Polygon", "coordinates": [hole]})
+in_hole = np.array([hole_only.contains(cell) for cell in cell_boxes])
+check("Cells inside the hole have no coverage", in_hole.any() and not rasterized_coverage(geometry)[in_hole].any())
+whole = {"type": "Polygon", "coordinates": [ring([at(-1, -1), at(2, -1), at(2, 2), at(-1, 2)])]}
+mask = rasterize_polygon(features, whole)
+check("A zone around the grid covers every cell fully",
+      np.array_equal(np.sort(mask.indices), np.arange(n)) and np.all(mask.coverage == 1.0))
+outside = {"type": "Polygon", "coordinates": [ring([at(1.1, 0.2), at(1.5, 0.2), at(1.3, 0.6)])]}
+check("A zone off the grid covers no cells", len(rasterize_polygon(features, outside).indices) == 0)
+check(f"Coverage fractions are multiples of 1/{SUPERSAMPLE ** 2}",
+      np.allclose(rasterized_coverage(geometry) * SUPERSAMPLE ** 2,
+                  np.round(rasterized_coverage(geometry) * SUPERSAMPLE ** 2)))
+
+if failed:
+    sys.exit(1)
+print("\n✅ Polygon rasterization matches exact cell overlaps")